@@ -9,6 +9,8 @@ extras_require['docs'] = sorted(
         ]
     )
 )
+extras_require['streaming'] = ['ijson'] # streaming of large json files
+extras_require['numexpr'] = ['numexpr'] # multithreaded evaluation of transformations
 version = {}
 with open("src/hepdata_maker/version.py") as fp:
     exec(fp.read(), version)
@@ -3,24 +3,29 @@ from __future__ import division
 from __future__ import print_function
 import numpy as np
 import jsonref      # type: ignore
-from collections import OrderedDict
+from collections import OrderedDict,ChainMap
 from collections.abc import Iterable
 import hepdata_lib  # type: ignore
 import os.path
 import regex as re  # type: ignore
 import scipy.stats, scipy.special  # type: ignore
 from . import variable_loading
+from . import common_subexpressions
+from .construction_cache import BuiltObject,ConstructionCache,copy_built
 from . import useful_functions as ufs
 from . import utils
 from .console import console
 from .logs import logging
 log = logging.getLogger(__name__)
+import rich.markup
 import rich.panel
 import rich.tree
 import validators  # type: ignore
 import jq          # type: ignore
 import time
-from typing import Optional,Any,List,Dict,TypeVar, Type, Literal,Union,Tuple
+import functools
+from numpy.lib.mixins import NDArrayOperatorsMixin
+from typing import Optional,Any,Callable,List,Dict,TypeVar, Type, Literal,Union,Tuple,NamedTuple,Mapping,MutableMapping
 
 def is_name_correct(name:str)->bool:
     """
@@ -31,21 +36,54 @@ def is_name_correct(name:str)->bool:
     else:
         return False
 
+class EvaluationNamespace(dict):
+    """
+    Global names of python expressions of the steering file (transformations, matching conditions).
+
+    It holds modules/functions available in all expressions (np, re, scipy.stats, scipy.special, ufs, nan)
+    and the tables of the submission. One namespace is created per Submission and updated when tables
+    are added or removed, so it is shared (not copied) by all the expressions evaluated.
+    Names of the Table, Variable and Uncertainty scopes are passed to eval as locals,
+    layered on top of each other with collections.ChainMap.
+
+    Args:
+      names: additional names (e.g. tables) known to the expressions
+    """
+    def __init__(self,names:Mapping[str,Any]={}):
+        super().__init__({"np":np,"re":re,"scipy.stats":scipy.stats,"scipy.special":scipy.special,"ufs":ufs,"nan":np.nan})
+        self.update(names)
+
+def get_evaluation_namespace(submission_dict:Mapping[str,Any])->EvaluationNamespace:
+    """
+    Get SUBMISSION_DICT as EvaluationNamespace (it is returned as is if it is one already).
+
+    Args:
+      submission_dict: collections of variables and other known objects
+    """
+    if(isinstance(submission_dict,EvaluationNamespace)):
+        return submission_dict
+    return EvaluationNamespace(submission_dict)
+
 def perform_transformation(transformation:str,
-                           submission_dict:Dict[str,Any],
-                           local_vars:Dict[str,Any])->Iterable:
+                           submission_dict:Mapping[str,Any],
+                           local_vars:Mapping[str,Any],
+                           subexpressions:Optional[common_subexpressions.SubexpressionCache]=None)->Iterable:
     """
     Function executing user-specified transformation of variables/errors loaded
 
     Args:
       transformation: numpy-style transformation returning a 1-D array/ndarray
       submission_dict: collections of variables and other known objects
-        to be used in the transformation
+        to be used in the transformation (preferably EvaluationNamespace, otherwise it is copied to one)
       local_vars: yet another collection of variables known to be used in the transformation
+      subexpressions: evaluator sharing common subexpressions of the table's transformations
     """
+    global_vars=get_evaluation_namespace(submission_dict)
     try:
-        global_vars=utils.merge_dictionaries(submission_dict,{"np":np},{"re":re},{"scipy.stats":scipy.stats},{"scipy.special":scipy.special},{"ufs":ufs},{"nan":np.nan})
-        return eval(transformation,global_vars,local_vars)
+        if(subexpressions is not None):
+            return subexpressions.evaluate(transformation,global_vars,local_vars)
+        # element-wise arithmetic on large arrays is handed to numexpr (if enabled)
+        return common_subexpressions.evaluate_expression(transformation,global_vars,local_vars)
     except Exception as exc:
         log.error(f"Transformation '{transformation}' has failed.")
         log.error(f"Make sure your numpy array data is of the correct type (by specifying 'data-type')!")
@@ -64,6 +102,8 @@ def remove_none_from_uncertainty_array(in_list:Iterable)->np.ndarray:
     Args:
       in_list: list of error values (can be 1 or 2 dim)
     """
+    if(isinstance(in_list,np.ndarray) and in_list.dtype!=object):
+        return in_list # only object arrays can hold None
     not_none_entries=[x for x in in_list if x is not None]
     ndim=1
     if(len(not_none_entries)==0):
@@ -77,6 +117,113 @@ def remove_none_from_uncertainty_array(in_list:Iterable)->np.ndarray:
         replacement= 0 if ndim==1 else [0.0]
         return np.array([x if x is not None else replacement for x in in_list],dtype=not_none.dtype)
 
+# States of objects created lazily (see LazyObject)
+PENDING='pending'
+LOADED='loaded'
+FAILED='failed'
+
+class LazyObject(NDArrayOperatorsMixin):
+    """
+    Placeholder of a Variable/Uncertainty described in the steering file that is not built yet.
+
+    The object is built (input files read, transformations performed) when its values are first needed:
+    numpy operations, indexing, len() or any attribute not known from the steering file
+    (e.g. when another table's transformation uses it). Once built, the placeholder is replaced by the object
+    in the table/variable it belongs to and forwards everything to it.
+    Name, fancy_name, is_visible (and is_independent, units for variables) are known without building it.
+
+    Args:
+      kind: 'variable' or 'uncertainty'
+      steering: steering file snippet of the object
+      build: function (no arguments) creating the object
+      on_load: function called with the placeholder and the object once it is built
+    """
+    def __init__(self,
+                 kind:Literal['variable','uncertainty'],
+                 steering:Dict[str,Any],
+                 build:Callable[[],np.ndarray],
+                 on_load:Optional[Callable[['LazyObject',Any],None]]=None):
+        self.kind=kind
+        self._steering=steering
+        self.name=steering.get('name','var' if kind=='variable' else 'unc')
+        self.fancy_name=steering.get('fancy_name','')
+        self.is_visible=steering.get('is_visible',True)
+        if(kind=='variable'):
+            self.is_independent=steering.get('is_independent',True)
+            self.units=steering.get('units','')
+        self.state=PENDING
+        self.error:Optional[Exception]=None
+        self._build:Optional[Callable[[],np.ndarray]]=build
+        self._on_load=on_load
+        self._value:Optional[np.ndarray]=None
+        self._is_loading=False
+
+    def load(self)->np.ndarray:
+        """
+        Build the object (if not done yet) and return it.
+        The error of a failed build is raised again on each call.
+        """
+        if(self.state==LOADED and self._value is not None):
+            return self._value
+        if(self.state==FAILED):
+            raise self.error # type: ignore
+        if(self._is_loading):
+            raise ValueError(f"The {self.kind} {self.name} depends on itself.")
+        log.debug(f"Loading {self.kind} {self.name}.")
+        self._is_loading=True
+        try:
+            value=self._build() # type: ignore
+            if(self._on_load is not None):
+                self._on_load(self,value)
+        except Exception as exc:
+            self.state=FAILED
+            self.error=exc
+            raise
+        finally:
+            self._is_loading=False
+        self._value=value
+        self.state=LOADED
+        self._build=None # scopes captured by the build function are no longer needed
+        return value
+
+    def __getattr__(self,attribute:str)->Any:
+        # only called for attributes not set on the placeholder itself
+        if(attribute.startswith('__') or attribute in ('_steering','_build','_on_load','_value','_is_loading')):
+            raise AttributeError(attribute)
+        return getattr(self.load(),attribute)
+
+    def __array__(self,dtype:Any=None,copy:Optional[bool]=None)->np.ndarray:
+        return np.asarray(self.load(),dtype=dtype)
+
+    def __array_ufunc__(self,ufunc:np.ufunc,method:str,*inputs:Any,**kwargs:Any)->Any:
+        inputs=tuple(x.load() if isinstance(x,LazyObject) else x for x in inputs)
+        return getattr(ufunc,method)(*inputs,**kwargs)
+
+    def __getitem__(self,key:Any)->Any:
+        return self.load()[key]
+
+    def __len__(self)->int:
+        return len(self.load())
+
+    def __iter__(self)->Iterable:
+        return iter(self.load())
+
+    def __repr__(self)->str:
+        return f"<{self.kind} {self.name} ({self.state})>"
+
+def get_load_state(obj:Any)->str:
+    """
+    Get state of OBJ: 'pending' or 'failed' for placeholders not built (see LazyObject), 'loaded' otherwise.
+    """
+    return obj.state if isinstance(obj,LazyObject) else LOADED
+
+def _copy_loaded(placeholder:LazyObject)->np.ndarray:
+    return copy_built(placeholder.load())
+
+def _placeholder_index(objects:List[Any],placeholder:LazyObject)->int:
+    # identity is used, comparing placeholders with == would build them
+    return next(index for index,obj in enumerate(objects) if obj is placeholder)
+
 ndarray_super_type = TypeVar('ndarray_super_type', bound=np.ndarray)
 class Uncertainty(np.ndarray):
     """
@@ -91,6 +238,9 @@ class Uncertainty(np.ndarray):
         unc=Uncertainty(unc_steering={"name":"my_name","transformations":[1,2,3]})
 
         If unc_steering is given, it takes precedence over other arguments.
+
+        Data of npy/npz files is not copied: an uncertainty read directly from such a file
+        is a read-only view of the memory-mapped file (transformations create new arrays).
         """
 
     def __new__(cls:Type[ndarray_super_type],
@@ -101,8 +251,9 @@ class Uncertainty(np.ndarray):
                 digits:int=5,
                 unc_steering:Optional[Dict[str,Any]]=None,
                 global_variables:Dict[str,Any]={},
-                local_variables:Dict[str,Any]={},
-                data_root:str='./'):
+                local_variables:MutableMapping[str,Any]={},
+                data_root:str='./',
+                subexpressions:Optional[common_subexpressions.SubexpressionCache]=None):
         ## Time the execution
         start=time.time()
 
@@ -125,24 +276,34 @@ class Uncertainty(np.ndarray):
         log.debug(f"   parameters passed {locals()}")
         
         if(unc_steering):
+            global_variables=get_evaluation_namespace(global_variables)
             input_array=[]
+            data_type=getattr(unc_steering,'data_type',None)
+            read_requests=[]
             for in_file in getattr(unc_steering,'in_files',[]):
+                # in_file name can be a glob pattern matching many files
+                for file_path in utils.expand_file_name(utils.resolve_file_name(in_file.name,data_root)):
+                    read_requests.append((file_path,in_file))
+
+            def read_uncertainty_file(request:Tuple[str,Any])->np.ndarray:
+                file_path,in_file=request
                 tmp_values=tmp_values_up=tmp_values_down=np.empty(0)
-                extra_args={k: in_file[k] for k in ('delimiter', 'file_type', 'replace_dict', 'tabular_loc_decode') if hasattr(in_file,k)}
+                # data_type is applied after missing (None) entries are replaced with zeros
+                extra_args={k: in_file[k] for k in ('delimiter', 'file_type', 'replace_dict', 'tabular_loc_decode', 'step_size', 'cut') if hasattr(in_file,k)}
 
                 # if decode is present we have either 2-dim specification of [up,down] or 1-dim symmetric error
                 if( hasattr(in_file, 'decode')):
-                    tmp_values=variable_loading.read_data_file(utils.resolve_file_name(in_file.name,data_root),in_file.decode,**extra_args)
-                    tmp_values=remove_none_from_uncertainty_array(tmp_values)
+                    tmp_values=variable_loading.read_data_file(file_path,in_file.decode,**extra_args)
+                    tmp_values=variable_loading.convert_to_data_type(remove_none_from_uncertainty_array(tmp_values),data_type)
                 # if decode_up is present we have either 2-dim specification of [decode_up,decode_down] or [decode_up,None]
                 if( hasattr(in_file, 'decode_up')):
-                    tmp_values_up=variable_loading.read_data_file(utils.resolve_file_name(in_file.name,data_root),in_file.decode_up,**extra_args)
-                    tmp_values_up=remove_none_from_uncertainty_array(tmp_values_up)
+                    tmp_values_up=variable_loading.read_data_file(file_path,in_file.decode_up,**extra_args)
+                    tmp_values_up=variable_loading.convert_to_data_type(remove_none_from_uncertainty_array(tmp_values_up),data_type)
 
                 # if decode_down is present we have either 2-dim specification of [decode_up,decode_down] or [None,decode_down]
                 if( hasattr(in_file, 'decode_down')):
-                    tmp_values_down=variable_loading.read_data_file(utils.resolve_file_name(in_file.name,data_root),in_file.decode_down,**extra_args)
-                    tmp_values_down=remove_none_from_uncertainty_array(tmp_values_down)
+                    tmp_values_down=variable_loading.read_data_file(file_path,in_file.decode_down,**extra_args)
+                    tmp_values_down=variable_loading.convert_to_data_type(remove_none_from_uncertainty_array(tmp_values_down),data_type)
 
                 if(tmp_values_up.size>0 or tmp_values_down.size>0):
                     if(not tmp_values_down.size>0):
@@ -153,15 +314,14 @@ class Uncertainty(np.ndarray):
 
                 if(not (tmp_values_up.size>0 or tmp_values_down.size>0 or tmp_values.size>0)):
                     raise TypeError("Something went wrong. Could not read errors")
-                
-                if(len(list(input_array))>0): # append to already existing data
-                    input_array=np.concatenate((input_array,tmp_values))
-                else: # overwrite empty array, with the numpy object of the correct dimentionality and dtype
-                    input_array=tmp_values
+                return tmp_values
+
+            if(len(read_requests)>0):
+                # all files are read (in parallel) before being joined with a single copy
+                input_array=variable_loading.concatenate_arrays(variable_loading.read_in_parallel(read_uncertainty_file,read_requests))
 
-            data_type=getattr(unc_steering,'data_type',None)
             if(data_type is not None and data_type!=''):
-                    input_array=np.array(input_array).astype(data_type)
+                    input_array=np.asarray(input_array).astype(data_type,copy=False)
 
             transformations=getattr(unc_steering,'transformations',[])
             if(isinstance(transformations,str)):
@@ -169,7 +329,7 @@ class Uncertainty(np.ndarray):
             if(not isinstance(transformations,Iterable)):
                 raise ValueError(f"Parameter 'transformations needs to be a list (!) of transformations(strings).'")
             for transformation in transformations:
-                input_array=perform_transformation(transformation,global_variables,utils.merge_dictionaries(local_variables,{name:input_array}))
+                input_array=perform_transformation(transformation,global_variables,ChainMap({name:input_array},local_variables),subexpressions)
             log.debug(f"this is what we got for uncertainty {name} after reading data: {input_array}, {type(input_array)}, {np.array(input_array).dtype}")
 
         # Populate underlying numpy_array with 'input_array' and decorate with additional atributes
@@ -230,6 +390,88 @@ class Uncertainty(np.ndarray):
             return out_json
 
 
+class UncertaintyMatrix():
+    """
+    Dense storage of all uncertainties of a variable: one (n_uncertainties, n_points, 2) float array.
+
+    The last axis holds (up, down) of asymmetric uncertainties, symmetric ones use only its first entry
+    (see is_symmetric). Uncertainties of a packed variable are views into the array
+    (see :py:meth:`Variable.pack_uncertainties`), so changes made through them are seen here.
+
+    Args:
+      uncertainties: uncertainties (of float type and equal length) to be stored
+    """
+    def __init__(self,uncertainties:List[Uncertainty]):
+        n_points=len(uncertainties[0]) if len(uncertainties)>0 else 0
+        self.values=np.zeros((len(uncertainties),n_points,2))
+        self.is_symmetric=np.array([unc.is_symmetric for unc in uncertainties],dtype=bool)
+        self.names:Dict[str,int]={}
+        self.views:List[Uncertainty]=[]
+        for index,unc in enumerate(uncertainties):
+            if(unc.dtype.kind!='f'):
+                raise ValueError(f"Only uncertainties of float type can be stored in a matrix; {unc.name} is of type {unc.dtype}.")
+            if(len(unc)!=n_points):
+                raise ValueError(f"Uncertainty {unc.name} has different length ({len(unc)}) than other uncertainties ({n_points}).")
+            if(unc.is_symmetric):
+                self.values[index,:,0]=unc
+                self.values[index,:,1]=unc
+                view=self.values[index,:,0].view(Uncertainty)
+            else:
+                self.values[index]=unc
+                view=self.values[index].view(Uncertainty)
+            for attribute in ('name','fancy_name','is_visible','digits','is_symmetric','_unc_steering'):
+                setattr(view,attribute,getattr(unc,attribute))
+            self.names[unc.name]=index
+            self.views.append(view)
+
+    def __len__(self)->int:
+        return len(self.views)
+
+    def __getitem__(self,name:str)->Uncertainty:
+        return self.views[self.names[name]]
+
+    def components(self)->np.ndarray:
+        """
+        (up, down) components of all uncertainties, (n_uncertainties, n_points, 2) array.
+        Both components of a symmetric uncertainty are its value.
+        """
+        return np.where(self.is_symmetric[:,np.newaxis,np.newaxis],self.values[...,:1],self.values)
+
+    def quadrature_sum(self,visible_only:bool=False)->np.ndarray:
+        """
+        Quadrature sum of the uncertainties, (n_points, 2) array of (up, down) components.
+
+        Args:
+          visible_only: only visible uncertainties are summed
+        """
+        components=self.components()
+        if(visible_only):
+            components=components[[view.is_visible for view in self.views]]
+        return np.sqrt(np.sum(components**2,axis=0))
+
+    def zero_mask(self)->np.ndarray:
+        """
+        Boolean (n_points,) array, True where all the uncertainties are zero.
+        """
+        return ~np.any(self.components()!=0,axis=(0,2))
+
+    def to_lists(self,need_fix:Optional[np.ndarray]=None)->List[List[Any]]:
+        """
+        Values of all uncertainties as lists (as given by Uncertainty.tolist),
+        symmetric and asymmetric ones are converted with one call each.
+
+        Args:
+          need_fix: boolean mask of entries to be emptied (see :py:func:`fix_zero_error`)
+        """
+        symmetric_values=iter(self.values[self.is_symmetric,:,0].tolist())
+        asymmetric_values=iter(self.values[~self.is_symmetric].tolist())
+        lists=[next(symmetric_values) if is_symmetric else next(asymmetric_values) for is_symmetric in self.is_symmetric]
+        if(need_fix is not None):
+            for index in np.flatnonzero(need_fix):
+                for values,is_symmetric in zip(lists,self.is_symmetric):
+                    values[index]='' if is_symmetric else ('','')
+        return lists
+
 class Variable(np.ndarray):
     """
     Variable is 1 or 2 dimentional numpy-array-like list containing information about a single variable.
@@ -250,6 +492,10 @@ class Variable(np.ndarray):
       var=Variable(var_steering={"name":"my_name","transformations":[1,2,3]})
 
     If var_steering is given, it takes precedence over other arguments.
+
+    Data of npy/npz files is not copied: a variable read directly from such a file
+    is a read-only view of the memory-mapped file (transformations create new arrays).
+    Use e.g. var.copy() to get values that can be changed.
     """
     def __new__(cls:Type[ndarray_super_type],
                 input_array:Iterable=[],
@@ -261,8 +507,11 @@ class Variable(np.ndarray):
                 digits:int=5,
                 var_steering:Optional[Dict[str,Any]]=None,
                 global_variables:Dict[str,Any]={},
-                local_variables:Dict[str,Any]={},
-                data_root:str='./'):
+                local_variables:MutableMapping[str,Any]={},
+                data_root:str='./',
+                subexpressions:Optional[common_subexpressions.SubexpressionCache]=None,
+                lazy:bool=False,
+                construction_cache:Optional[ConstructionCache]=None):
 
         ## Time the execution
         start=time.time()
@@ -289,22 +538,27 @@ class Variable(np.ndarray):
 
         ## As the second step we read the steering file to get values for actual variable (and not yet the associated errors)
         if(var_steering):
+            global_variables=get_evaluation_namespace(global_variables)
             input_array=[] # Steering files overrides arguments
             in_files=getattr(var_steering,'in_files',[])
+            data_type=getattr(var_steering,'data_type',None)
+            read_requests=[]
             for in_file in in_files:
-                extra_args={k: in_file[k] for k in ('delimiter', 'file_type', 'replace_dict', 'tabular_loc_decode') if k in in_file}
-                tmp_values=variable_loading.read_data_file(utils.resolve_file_name(in_file.name,data_root),in_file.decode,**extra_args)
-                if(len(list(input_array))>0): # array already filled, just expand
-                    input_array=np.concatenate((input_array,tmp_values))
-                else:
-                    input_array=tmp_values
+                extra_args={k: in_file[k] for k in ('delimiter', 'file_type', 'replace_dict', 'tabular_loc_decode', 'step_size', 'cut') if k in in_file}
+                if(data_type):
+                    extra_args['data_type']=data_type # numeric values are parsed directly to the requested type
+                # in_file name can be a glob pattern matching many files
+                for file_path in utils.expand_file_name(utils.resolve_file_name(in_file.name,data_root)):
+                    read_requests.append((file_path,in_file.decode,extra_args))
+            if(len(read_requests)>0):
+                # all files are read (in parallel) before being joined with a single copy
+                input_array=variable_loading.concatenate_arrays(variable_loading.read_in_parallel(lambda request: variable_loading.read_data_file(request[0],request[1],**request[2]),read_requests))
 
-            data_type=getattr(var_steering,'data_type',None)
             if(data_type is not None and data_type!=''):
-                input_array=np.array(input_array).astype(data_type)
+                input_array=np.asarray(input_array).astype(data_type,copy=False)
             transformations=getattr(var_steering,'transformations',[])
             for transformation in transformations:
-                input_array=perform_transformation(transformation,global_variables,utils.merge_dictionaries(local_variables,{name:input_array}))
+                input_array=perform_transformation(transformation,global_variables,ChainMap({name:input_array},local_variables),subexpressions)
 
         # Populate underlying numpy_array with 'input_array'
         obj = np.asarray(input_array).view(cls)
@@ -343,23 +597,33 @@ class Variable(np.ndarray):
             obj._var_steering=var_steering
             obj.qualifiers=getattr(var_steering,'qualifiers',[])
             errors=getattr(var_steering,'errors',[])
+            # uncertainties already read are visible to the following ones (and to the matching conditions)
+            uncertainty_scope:Dict[str,Any]={}
+            current_local_variables=ChainMap(uncertainty_scope,{name:input_array},local_variables)
+            unc:Union[LazyObject,Uncertainty]
             for error_info in errors:
-                current_local_variables=utils.merge_dictionaries(local_variables,{name:input_array},{var_err.name:var_err for var_err in obj.uncertainties})
-                unc=Uncertainty(unc_steering=error_info,local_variables=current_local_variables,global_variables=global_variables,data_root=data_root)
-                obj.add_uncertainty(unc)
+                if(lazy):
+                    # the uncertainty sees only the ones defined before it, as when built right away
+                    unc_local_variables=ChainMap(dict(uncertainty_scope),{name:input_array},local_variables)
+                    make_uncertainty=functools.partial(Uncertainty,unc_steering=error_info,local_variables=unc_local_variables,global_variables=global_variables,data_root=data_root,subexpressions=subexpressions)
+                    build=functools.partial(build_cached,construction_cache,'uncertainty',error_info,global_variables,unc_local_variables,data_root,make_uncertainty)
+                    unc=LazyObject('uncertainty',error_info,build,on_load=obj._replace_placeholder)
+                    obj._add_placeholder(unc)
+                else:
+                    make_uncertainty=functools.partial(Uncertainty,unc_steering=error_info,local_variables=current_local_variables,global_variables=global_variables,data_root=data_root,subexpressions=subexpressions)
+                    unc=build_cached(construction_cache,'uncertainty',error_info,global_variables,current_local_variables,data_root,make_uncertainty)
+                    obj.add_uncertainty(unc)
+                uncertainty_scope[unc.name]=unc
             if(obj.multiplier):
                 ## TODO: think what we want to do with multipliers consistently
                 obj.qualifiers.append({"multiplier":obj.multiplier})
             
             if hasattr(var_steering, 'regions'):
-                current_local_variables=utils.merge_dictionaries(local_variables,{name:input_array},{var_err.name:var_err for var_err in obj.uncertainties})
-                obj.regions=get_matching_based_variables(var_steering.regions,global_variables,current_local_variables,var_lenght=obj.size) # type: ignore
+                obj.regions=get_matching_based_variables(var_steering.regions,global_variables,current_local_variables,var_lenght=len(obj),subexpressions=subexpressions) # type: ignore
             if hasattr(var_steering, 'grids'):
-                current_local_variables=utils.merge_dictionaries(local_variables,{name:input_array},{var_err.name:var_err for var_err in obj.uncertainties})
-                obj.grids=get_matching_based_variables(var_steering.grids,global_variables,current_local_variables,var_lenght=obj.size) # type: ignore
+                obj.grids=get_matching_based_variables(var_steering.grids,global_variables,current_local_variables,var_lenght=len(obj),subexpressions=subexpressions) # type: ignore
             if hasattr(var_steering, 'signal_names'):
-                current_local_variables=utils.merge_dictionaries(local_variables,{name:input_array},{var_err.name:var_err for var_err in obj.uncertainties})
-                obj.signal_names=get_matching_based_variables(var_steering.signal_names,global_variables,current_local_variables,var_lenght=obj.size) # type: ignore
+                obj.signal_names=get_matching_based_variables(var_steering.signal_names,global_variables,current_local_variables,var_lenght=len(obj),subexpressions=subexpressions) # type: ignore
 
         ## Timing        
         stop=time.time()
@@ -385,6 +649,7 @@ class Variable(np.ndarray):
         self.signal = getattr(obj,'signal',np.array([[]]*len(obj)))
         self.digits = getattr(obj, 'digits', 5)
         self._var_steering=getattr(obj, 'var_steering', None)
+        self._uncertainty_matrix=getattr(obj, '_uncertainty_matrix', None)
     
     def _steering_unc_names(self)->List[str]:
         if(self._var_steering is None or 'errors' not in self._var_steering):
@@ -418,6 +683,60 @@ class Variable(np.ndarray):
     def get_uncertainty_names(self):
         return [unc.name for unc in self.uncertainties]
 
+    def _add_placeholder(self,placeholder:LazyObject)->None:
+        if(placeholder.name in self.__dict__):
+            raise ValueError(f"You try to add uncertainty with name {placeholder.name} to variable {self.name}. This name cannot be used as is already taken, see __dict__: {self.__dict__}.")
+        self.uncertainties.append(placeholder)
+        self.__dict__[placeholder.name]=placeholder
+
+    def _replace_placeholder(self,placeholder:LazyObject,uncertainty:Uncertainty)->None:
+        if(self.size!=len(uncertainty)):
+            raise ValueError(f"Uncertainty {uncertainty.name, (uncertainty.tolist())} has different dimention ({len(uncertainty)}) than the corresponding variable {self.name} ({self.tolist()},{self.size}).")
+        self.uncertainties[_placeholder_index(self.uncertainties,placeholder)]=uncertainty
+        self.__dict__[uncertainty.name]=uncertainty
+
+    def _rebind_placeholders(self)->None:
+        # placeholders copied from another variable (e.g. reused from ConstructionCache) are replaced by ones
+        # updating this variable when built; they take a copy of the object built by the original placeholder
+        for index,unc in enumerate(self.uncertainties):
+            if(isinstance(unc,LazyObject) and getattr(unc._on_load,'__self__',self) is not self):
+                placeholder=LazyObject('uncertainty',unc._steering,functools.partial(_copy_loaded,unc),on_load=self._replace_placeholder)
+                self.uncertainties[index]=placeholder
+                self.__dict__[placeholder.name]=placeholder
+
+    def load_uncertainties(self)->None:
+        """
+        Build all uncertainties of the variable not built yet (see LazyObject).
+        """
+        for unc in list(self.uncertainties):
+            if(isinstance(unc,LazyObject)):
+                unc.load()
+
+    def pack_uncertainties(self)->UncertaintyMatrix:
+        """
+        Store all uncertainties of the variable in one UncertaintyMatrix.
+        The uncertainties are replaced by views into the matrix.
+        ValueError is raised if they cannot be stored that way (e.g. are not of float type).
+        """
+        self.load_uncertainties()
+        matrix=UncertaintyMatrix(self.uncertainties)
+        for index,view in enumerate(matrix.views):
+            self.uncertainties[index]=view
+            self.__dict__[view.name]=view
+        self._uncertainty_matrix=matrix
+        return matrix
+
+    @property
+    def uncertainty_matrix(self)->Optional[UncertaintyMatrix]:
+        """
+        Dense storage of the uncertainties (see pack_uncertainties).
+        None if they were not packed or were changed since.
+        """
+        matrix=self._uncertainty_matrix
+        if(matrix is None or len(matrix)!=len(self.uncertainties) or any(view is not unc for view,unc in zip(matrix.views,self.uncertainties))):
+            return None
+        return matrix
+
     def _add_unc_to_dict_safely(self,uncertainty):
         ## TODO: currently uncertainty can have empty string ('') as a name
         ##       this means that it will not be accesible. Can we do something about it?
@@ -599,7 +918,10 @@ class Table(object):
                 tab_steering:Optional[Dict[str,Any]]=None,
                 global_variables:Dict[str,Any]={},
                 local_variables:Dict[str,Any]={},
-                data_root:str='./'):
+                data_root:str='./',
+                lazy:bool=False,
+                dense_uncertainties:bool=False,
+                construction_cache:Optional[ConstructionCache]=None):
 
         ## Time execution
         start=time.time()
@@ -632,6 +954,7 @@ class Table(object):
         self.images:List[Dict[str,Any]] = []
         # TODO: Unify treatment of images and resources
         self._tab_steering:Optional[Dict[str,Any]]=None
+        self._dense_uncertainties=dense_uncertainties
         if(tab_steering):
             self._tab_steering=tab_steering
             self.images=getattr(tab_steering,'images',[])
@@ -661,11 +984,29 @@ class Table(object):
             if( hasattr(tab_steering, 'keywords')):
                 self.keywords=tab_steering.get('keywords','')
 
+            global_variables=get_evaluation_namespace(global_variables)
+            # subexpressions shared by transformations/matching conditions of the table are evaluated once
+            subexpressions=common_subexpressions.SubexpressionCache(expression for _,kind,expression in get_table_expressions(tab_steering) if kind=='transformation' or kind.endswith('matching'))
             variables=getattr(tab_steering,'variables',[])
             for variable_info in variables:
-                local_variables=utils.merge_dictionaries(self.__dict__)
-                var=Variable(var_steering=variable_info,global_variables=global_variables,local_variables=local_variables,data_root=data_root)
-                self.add_variable(var)
+                # table's own dictionary is the scope of its variables (no copy, variables are added as read)
+                variable_scope=self.__dict__
+                if(lazy):
+                    # the placeholder sees only the variables defined before it, as when built right away
+                    variable_scope=dict(self.__dict__)
+                make_variable=functools.partial(Variable,var_steering=variable_info,global_variables=global_variables,local_variables=variable_scope,data_root=data_root,subexpressions=subexpressions,lazy=lazy,construction_cache=construction_cache)
+                # variables defined the same way in other tables are reused
+                build=functools.partial(build_cached,construction_cache,'variable',variable_info,global_variables,variable_scope,data_root,make_variable)
+                if(lazy):
+                    self._add_placeholder(LazyObject('variable',variable_info,build,on_load=self._replace_placeholder))
+                else:
+                    var=build()
+                    self._pack_uncertainties(var)
+                    self.add_variable(var)
+            if(not lazy):
+                # (placeholders keep the cache until they are built)
+                log.debug(f"Common subexpressions of table {name}: {subexpressions.summary()}")
+                subexpressions.clear()
             self.fancy_name=getattr(tab_steering,'fancy_name',None)
 
         ## Timing
@@ -740,6 +1081,43 @@ class Table(object):
             raise ValueError(f"You try to add variable with name {name} to table {self.name}. This name, however, cannot be used as is already taken, see __dict__:{self.__dict__}.")
         self.__dict__[name]=variable
 
+    def _check_variable_lenght(self,variable:Variable)->None:
+        if(self._variable_lenght!=0):
+            if(self._variable_lenght!=len(variable) and variable.is_visible):
+                raise ValueError(f"Variable {variable.name} ({variable.tolist()}) has different number of parameters ({len(variable)}) than other variables in the table {self.name} ({self._variable_lenght}, as e.g. for {self.variables[0].name}, {self.variables[0].tolist()})")
+        else:
+            if(variable.is_visible):
+                self._variable_lenght=len(variable)
+
+    def _add_placeholder(self,placeholder:LazyObject)->None:
+        if(placeholder.name in self.__dict__):
+            raise ValueError(f"You try to add variable with name {placeholder.name} to table {self.name}. This name, however, cannot be used as is already taken, see __dict__:{self.__dict__}.")
+        self.variables.append(placeholder)
+        self.__dict__[placeholder.name]=placeholder
+
+    def _replace_placeholder(self,placeholder:LazyObject,variable:Variable)->None:
+        self._check_variable_lenght(variable)
+        self.variables[_placeholder_index(self.variables,placeholder)]=variable
+        self.__dict__[variable.name]=variable
+
+    def load_variables(self)->None:
+        """
+        Build all variables (and their uncertainties) of the table not built yet (see LazyObject).
+        """
+        for var in list(self.variables):
+            if(isinstance(var,LazyObject)):
+                var=var.load()
+            var.load_uncertainties()
+            self._pack_uncertainties(var)
+
+    def _pack_uncertainties(self,variable:Variable)->None:
+        if(not self._dense_uncertainties or len(variable.uncertainties)==0 or variable.uncertainty_matrix is not None):
+            return
+        try:
+            variable.pack_uncertainties()
+        except ValueError as exc:
+            log.debug(f"Uncertainties of variable {variable.name} of table {self.name} are kept as list: {exc}")
+
     def add_variable(self, variable:Variable)->None:
         """
         Add a variable to the table.
@@ -751,12 +1129,7 @@ class Table(object):
         """
         if isinstance(variable, Variable):
             log.debug(f"Adding variable {variable.name} to the table {self.name}")
-            if(self._variable_lenght!=0):
-                if(self._variable_lenght!=len(variable) and variable.is_visible):
-                    raise ValueError(f"Variable {variable.name} ({variable.tolist()}) has different number of parameters ({len(variable)}) than other variables in the table {self.name} ({self._variable_lenght}, as e.g. for {self.variables[0].name}, {self.variables[0].tolist()})")
-            else:
-                if(variable.is_visible):
-                    self._variable_lenght=len(variable)
+            self._check_variable_lenght(variable)
             self.variables.append(variable)
             self._add_var_to_dict_safely(variable)
             self._update_var_steering(variable)
@@ -858,43 +1231,72 @@ class Table(object):
                 output_json['variables'].append(variable.steering_file_snippet())
             return output_json
         
-def fix_zero_error(variable:Variable)->List[np.ndarray]:
+def fix_zero_error(variable:Variable)->np.ndarray:
     """
-    This function replaces null errors with '' for the cases when variable is zero
+    Find entries of VARIABLE that are zero and have all their uncertainties equal to zero.
+    Errors of these entries are to be written as empty ('').
+
+    All uncertainties are stacked into one (N, n_components) array, so the mask
+    is obtained in a single reduction. Non-numeric variables or uncertainties never need the fix.
 
     Args:
       variable: variable (of type Variable) to go through
 
     Returns:
-      list of numpy arrays with updated error values
+      boolean numpy array with True for entries needing the fix
     """
-    tmp_need_zero_error_fix=(variable==np.zeros_like(variable))
-    tmp_need_zero_error_fix=np.array([tmp_need_zero_error_fix,tmp_need_zero_error_fix]).T # translating to the (2,N) shape of errors
-    tmp_need_zero_error_fix_sym=np.zeros_like(tmp_need_zero_error_fix)
-    for error in variable.uncertainties:
-        if(error.is_symmetric): # error is 1D np array. We need to expand it to 2D
-            tmp_error=np.array([error,error]).T
-        else: # error is already 2D
-            tmp_error=error
-        tmp_need_zero_error_fix=tmp_need_zero_error_fix&(tmp_error==np.zeros_like(tmp_need_zero_error_fix))
-    need_zero_error_fix=tmp_need_zero_error_fix
-    
-    fixed_errors=[]
+    values=np.asarray(variable)
+    size=len(values)
+    if(values.dtype.kind not in 'biuf'):
+        return np.zeros(size,dtype=bool)
+    is_zero=(values==0).reshape(size,-1).all(axis=1) # binned variables: both edges
+    if(not is_zero.any() or len(variable.uncertainties)==0):
+        return is_zero
+    matrix=variable.uncertainty_matrix
+    if(matrix is not None):
+        return is_zero&matrix.zero_mask()
+    try:
+        # symmetric uncertainties give one column, asymmetric ones two (up, down)
+        errors=np.column_stack([np.asarray(error,dtype=float).reshape(size,-1) for error in variable.uncertainties])
+    except (TypeError,ValueError):
+        return np.zeros(size,dtype=bool)
+    return is_zero&~errors.any(axis=1)
 
-    # For assymetric case if one error is present we do not need to apply fix ( thus logical and for up-down pairs):
-    need_zero_error_fix=np.repeat(np.logical_and.reduce(need_zero_error_fix,axis=1)[:,np.newaxis], 2, axis=1)
-    
-    for index,error in enumerate(variable.uncertainties):
-        if(error.is_symmetric):
-            fixed_errors.append(np.where(np.logical_and.reduce(need_zero_error_fix,axis=1),np.full_like(error,'',dtype=str),error))
-        else:
-            fixed_errors.append(np.where(need_zero_error_fix,np.full_like(error,['',''],dtype=str),error))
-    return fixed_errors
+def fixed_zero_error_values(uncertainty:Uncertainty,need_fix:np.ndarray)->List[Any]:
+    """
+    Values of UNCERTAINTY as list, with entries selected by NEED_FIX (see :py:func:`fix_zero_error`) set to empty.
+
+    Args:
+      uncertainty: uncertainty to be written
+      need_fix: boolean mask of entries to be emptied
+    """
+    values=uncertainty.tolist()
+    empty='' if uncertainty.is_symmetric else ('','')
+    for index in np.flatnonzero(need_fix):
+        values[index]=empty
+    return values
+
+class MatchingResult(NamedTuple):
+    """
+    Categorical result of :py:func:`get_matching_based_variables`.
+
+    Attributes:
+      codes: integer array, for each entry index of its label in 'labels' (-1 if nothing matches)
+      labels: values of the matching definitions
+    """
+    codes:np.ndarray
+    labels:List[Any]
+
+    def to_labels(self)->np.ndarray:
+        """Get object array with the label of each entry (None if nothing matches)."""
+        label_table=np.array(list(self.labels)+[None],dtype=object)
+        return label_table[self.codes] # code -1 picks the trailing None
 
 def get_matching_based_variables(match_definitions:List[Dict[Literal['name', 'matching'],Any]],
                                  global_dict=None,
                                  local_dict=None,
-                                 var_lenght=0):
+                                 var_lenght=0,
+                                 subexpressions:Optional[common_subexpressions.SubexpressionCache]=None)->MatchingResult:
     """
     Function to construct an array with values depending on the condition provided by user
 
@@ -906,7 +1308,11 @@ def get_matching_based_variables(match_definitions:List[Dict[Literal['name', 'ma
       For ``MET=[50 ,150,250]`` and ``mt2=[300,400,500]``,
       when provided with argument
       ``matching_definitions=[{name:"SRB","matching":["np.logical_and(MET>100,mt2<450)"]}]``
-      will give output of ``[None,SRB, None]``.
+      will give output with ``codes=[-1,0,-1]`` and ``labels=["SRB"]``
+      (``to_labels()`` gives ``[None,SRB,None]``).
+
+    All conditions are evaluated into one boolean matrix (definitions x entries),
+    each entry gets the first definition it matches.
 
     Args:
       match_definitions: list of dictionaries defining matching conditions and
@@ -915,7 +1321,7 @@ def get_matching_based_variables(match_definitions:List[Dict[Literal['name', 'ma
         Each dictionary has to have field 'name' (value of variable when condition is met)
         and 'matching' -- list of cuts and indices for which the condition is met.
 
-        Conditions are concacanated to each other.
+        An entry matches the definition if any of its conditions is met.
 
         In the example above ``matching_definitions=[{name:"SRB","matching":["np.logical_and(MET>100,mt2<450)"]}``
         is equivalent to  ``matching_definitions=[{name:"SRB","matching":[1]}`` (index specifying position that matches)
@@ -923,34 +1329,173 @@ def get_matching_based_variables(match_definitions:List[Dict[Literal['name', 'ma
       submission_dict: collections of variables and other known objects to be used in the transformation
       local_vars: yet another collection of variables known to be used in the transformation
       var_lenght: lenght of the corresponding variable/table (in case index is is chosen for matching specification)
+      subexpressions: evaluator sharing common subexpressions of the table's expressions
     """
-    result=None
+    global_dict=get_evaluation_namespace(global_dict if global_dict is not None else {})
+    local_dict=local_dict if local_dict is not None else {}
+    evaluate=subexpressions.evaluate if subexpressions is not None else common_subexpressions.evaluate_expression
+    labels=[]
     for specification in match_definitions:
-        var=specification.get('name',None)
-        if(var is None):
+        label=specification.get('name',None)
+        if(label is None):
             raise ValueError(f"matching_definitions have to have name for each specification.")
-        cuts=specification.get('matching',[])
-        for cut in cuts:
-            if(type(cut)==str):
-                cutOutput=np.where(eval(cut,global_dict,local_dict),var,None)
-                ToAppend=cutOutput.reshape(len(cutOutput),1)
-                if(not result):
-                    result=ToAppend
-                else:
-                    result=np.concatenate((result,ToAppend),axis=1)
-            elif(type(cut)==int):
-                if(cut>=len(cuts)):
-                    raise RuntimeError("lenght of cut table smaller than required index.")
-                else:
-                    ToAppend=np.array([[None]]*len(var_lenght))
-                    ToAppend[cut]=var
-                if(not result):
-                    result=ToAppend
-                else:
-                    result=np.concatenate((result,ToAppend),axis=1)
+        labels.append(label)
+    masks=np.zeros((len(labels),var_lenght),dtype=bool)
+    for index,specification in enumerate(match_definitions):
+        for cut in specification.get('matching',[]):
+            if(isinstance(cut,str)):
+                cut_mask=np.asarray(evaluate(cut,global_dict,local_dict),dtype=bool)
+                if(cut_mask.ndim>1 or (cut_mask.ndim==1 and cut_mask.size!=var_lenght)):
+                    raise ValueError(f"Matching condition '{cut}' gives {cut_mask.shape} values while the variable has {var_lenght} entries.")
+                masks[index]|=cut_mask
+            elif(isinstance(cut,int) and not isinstance(cut,bool)):
+                if(cut<0 or cut>=var_lenght):
+                    raise ValueError(f"Matching index {cut} of '{labels[index]}' is out of range for the variable with {var_lenght} entries.")
+                masks[index,cut]=True
             else:
                 raise TypeError("Variable cutDefinitions has improper content.")
-    return result
+    # first matching definition wins, -1 for entries matching nothing
+    codes=np.where(masks.any(axis=0),masks.argmax(axis=0),-1) if len(labels)>0 else np.full(var_lenght,-1)
+    return MatchingResult(codes.astype(np.min_scalar_type(-max(len(labels),1))),labels)
+
+def get_table_expressions(table_info:Dict[str,Any])->List[Tuple[str,str,str]]:
+    """
+    List all python expressions of a table steering information:
+    transformations, matching conditions, decodes of .tex files, 'tabular_loc_decode' and 'cut'.
+
+    Args:
+      table_info: steering information of the table
+
+    Returns:
+      list of (location, kind, expression), e.g. ("table 'tab', variable 'var'", 'transformation', 'var*2');
+      kind is one of 'transformation', 'regions/grids/signal_names matching', 'decode', 'decode_up', 'decode_down',
+      'tabular_loc_decode' and 'cut'
+    """
+    expressions:List[Tuple[str,str,str]]=[]
+    table_name=table_info.get('name','')
+    for variable_info in table_info.get('variables',[]):
+        variable_name=variable_info.get('name','')
+        steerings=[(f"table '{table_name}', variable '{variable_name}'",variable_info)]
+        steerings+=[(f"table '{table_name}', variable '{variable_name}', error '{error_info.get('name','')}'",error_info) for error_info in variable_info.get('errors',[])]
+        for where,steering in steerings:
+            expressions+=[(where,kind,expression) for kind,expression in get_steering_expressions(steering)]
+    return expressions
+
+def get_steering_expressions(steering:Dict[str,Any])->List[Tuple[str,str]]:
+    """
+    List python expressions of a single variable/uncertainty steering information
+    (expressions of the variable's errors are not included).
+    See :py:func:`get_table_expressions` for kinds of the expressions.
+
+    Args:
+      steering: steering information of the variable/uncertainty
+
+    Returns:
+      list of (kind, expression)
+    """
+    expressions:List[Tuple[str,str]]=[('transformation',transformation) for transformation in steering.get('transformations',[])]
+    for info_name in ('regions','grids','signal_names'):
+        for specification in steering.get(info_name,[]):
+            expressions+=[(f"{info_name} matching",cut) for cut in specification.get('matching',[]) if isinstance(cut,str)]
+    for in_file in steering.get('in_files',[]):
+        file_type=variable_loading.get_file_type(in_file.get('name',''),in_file.get('file_type',None))
+        for key in ('tabular_loc_decode','cut'):
+            if(key in in_file):
+                expressions.append((key,in_file[key]))
+        if(file_type=='tex'):
+            expressions+=[(decode_name,in_file[decode_name]) for decode_name in ('decode','decode_up','decode_down') if decode_name in in_file]
+    return expressions
+
+def build_cached(construction_cache:Optional[ConstructionCache],
+                 kind:Literal['variable','uncertainty'],
+                 steering:Dict[str,Any],
+                 global_variables:Dict[str,Any],
+                 local_variables:Mapping[str,Any],
+                 data_root:str,
+                 build:Callable[[],BuiltObject])->BuiltObject:
+    """
+    Build Variable/Uncertainty described by STEERING with BUILD, unless one built from the same definition
+    (with the same input files and referenced objects) is found in CONSTRUCTION_CACHE.
+
+    Args:
+      construction_cache: cache to use; if None, the object is just built
+      kind: 'variable' or 'uncertainty'
+      steering: steering file snippet of the object
+      global_variables: global names known to its expressions
+      local_variables: local names known to its expressions
+      data_root: location of the input files
+      build: function (no arguments) building the object
+    """
+    if(construction_cache is None):
+        return build()
+    steerings=[steering]+(list(steering.get('errors',[])) if kind=='variable' else [])
+    # expressions evaluated with the steering file names (decodes and cuts use names of the input file)
+    expressions=[expression for snippet in steerings for expression_kind,expression in get_steering_expressions(snippet)
+                 if isinstance(expression,str) and (expression_kind=='transformation' or expression_kind.endswith('matching'))]
+    file_paths=[file_path for snippet in steerings for in_file in snippet.get('in_files',[])
+                for file_path in utils.expand_file_name(utils.resolve_file_name(in_file['name'],data_root))]
+    defined_names=[snippet.get('name','') for snippet in steerings]
+    key=construction_cache.key(kind,steering,expressions,file_paths,global_variables,local_variables,defined_names)
+    obj=construction_cache.get_or_build(key,build)
+    if(isinstance(obj,Variable)):
+        obj._rebind_placeholders()
+    return obj
+
+def check_steering_expressions(tables_info:List[Dict[str,Any]])->None:
+    """
+    Compile all python expressions of the steering file tables
+    (transformations, matching conditions, decodes of .tex files, 'tabular_loc_decode' and 'cut'),
+    so syntax errors are reported when the steering file is loaded, not in the middle of table construction.
+    The compiled expressions are cached (see :py:func:`hepdata_maker.utils.compile_expression`) and reused later.
+
+    Args:
+      tables_info: list of table steering information (e.g. config['tables'])
+
+    Raises:
+      SyntaxError: listing all expressions that cannot be compiled
+    """
+    problems=[]
+    for table_info in tables_info:
+        for where,kind,expression in get_table_expressions(table_info):
+            try:
+                utils.compile_expression(expression)
+            except SyntaxError as exc:
+                problems.append(f"  {where}, {kind}: '{expression}' ({exc.msg})")
+    if(problems):
+        raise SyntaxError("Steering file contains invalid python expressions:\n"+"\n".join(problems))
+
+def plan_table_reads(tables_info:List[Dict[str,Any]],
+                     data_root:str='./',
+                     selected_table_names:List[Tuple[str,bool]]=[])->variable_loading.ReadPlan:
+    """
+    Collect all data-file reads (of variables and their uncertainties)
+    requested in the steering file tables into one read plan.
+
+    Args:
+      tables_info: list of table steering information (e.g. config['tables'])
+      data_root: location of the data files (for relative paths)
+      selected_table_names: names of the tables to be loaded. If empty, all are considered.
+    """
+    read_plan=variable_loading.ReadPlan()
+    selected_names=[pair[0] for pair in selected_table_names]
+    for table_info in tables_info:
+        if(not table_info.get('should_be_processed',True)):
+            continue
+        if(len(selected_names)>0 and table_info.get('name',None) not in selected_names):
+            continue
+        for variable_info in table_info.get('variables',[]):
+            steerings=[variable_info]+list(variable_info.get('errors',[]))
+            for steering in steerings:
+                for in_file in steering.get('in_files',[]):
+                    extra_args={k: in_file[k] for k in variable_loading.READ_EXTRA_ARGS if k in in_file}
+                    # uncertainties apply data_type only after their missing entries are replaced (see Uncertainty)
+                    if(steering is variable_info and steering.get('data_type',None)):
+                        extra_args['data_type']=steering['data_type']
+                    for file_path in utils.expand_file_name(utils.resolve_file_name(in_file['name'],data_root)):
+                        for decode_name in ('decode','decode_up','decode_down'):
+                            if(decode_name in in_file):
+                                read_plan.add_request(file_path,in_file[decode_name],**extra_args)
+    return read_plan
 
 def get_name(obj:Union[Uncertainty,Variable,Table],
              use_fancy_names:bool)->str:
@@ -982,6 +1527,16 @@ class Submission():
         self.record_ids:List[str]=[]
         self.data_license:Dict[str,Any]={}
         self.generate_table_of_content=False
+        self._namespace=EvaluationNamespace()
+        self.construction_cache=ConstructionCache()
+
+    @property
+    def namespace(self)->EvaluationNamespace:
+        """
+        Names known to the steering file expressions (tables of the submission, np, ufs, ...).
+        It is kept up to date as tables are added/removed.
+        """
+        return self._namespace
 
     def get_table_names(self)->List[str]:
         return [tab.name for tab in self.tables]
@@ -1055,7 +1610,9 @@ class Submission():
         
     def load_table_config(self,
                           data_root: str='./',
-                          selected_table_names:List[Tuple[str,bool]]=[])->None:
+                          selected_table_names:List[Tuple[str,bool]]=[],
+                          lazy:bool=False,
+                          dense_uncertainties:bool=False)->None:
         """
         Function to populate information in Submission from
         already read steering file (see also 'read_table_config').
@@ -1063,6 +1620,9 @@ class Submission():
         Args:
           config_file_path: path to the steering_file that should be used
           selected_table_names: names of the tables to be loaded. If empty, all are loaded.
+          lazy: variables and uncertainties are only placeholders (see LazyObject),
+            their data is read when first needed
+          dense_uncertainties: uncertainties of each variable are stored in one UncertaintyMatrix (when possible)
         """
         if(self._has_loaded):
             log.warning("You have already loaded information from a(nother?) steering file. If any table names will be loaded again (without prior explicite deletions) expect errors being raised!")
@@ -1076,21 +1636,29 @@ class Submission():
                 res=Resource(res_steering=resource_info)
                 self.add_resource(res)
         if('tables' in self.config):
-            for table_info in [utils.objdict(x) for x in self.config['tables']]:
-                global_variables=utils.merge_dictionaries(self.__dict__,{"np":np},{"re":re},{"scipy.stats":scipy.stats},{"scipy.special":scipy.special},{"ufs":ufs})
-                table_name=table_info.get('name',None)
-                if(table_name is None):
-                    raise ValueError("In {self.config} table needs to have a name specified!")
-                should_be_processed=getattr(table_info,'should_be_processed',True)
-                if(not should_be_processed):
-                    log.warning(rf"table {table_name} has 'should_be_processed' flag set to False. Skipping.")
-                    continue
-                if(len(selected_table_names)>0 and (table_name not in [pair[0] for pair in selected_table_names])):
-                    log.debug(f"skipping loading table {table_name} as not present in selected_table_names: {selected_table_names}")
-                    continue
-                console.rule(f"table {table_name}")
-                table=Table(tab_steering=table_info,global_variables=global_variables,data_root=data_root)
-                self.add_table(table)
+            # Read all the data needed, file by file, before the tables are constructed
+            read_plan=plan_table_reads(self.config['tables'],data_root,selected_table_names)
+            if(not lazy):
+                # (placeholders read their data on their own, when needed)
+                read_plan.prefetch()
+                read_plan.execute()
+            with read_plan:
+                for table_info in [utils.objdict(x) for x in self.config['tables']]:
+                    table_name=table_info.get('name',None)
+                    if(table_name is None):
+                        raise ValueError("In {self.config} table needs to have a name specified!")
+                    should_be_processed=getattr(table_info,'should_be_processed',True)
+                    if(not should_be_processed):
+                        log.warning(rf"table {table_name} has 'should_be_processed' flag set to False. Skipping.")
+                        continue
+                    if(len(selected_table_names)>0 and (table_name not in [pair[0] for pair in selected_table_names])):
+                        log.debug(f"skipping loading table {table_name} as not present in selected_table_names: {selected_table_names}")
+                        continue
+                    console.rule(f"table {table_name}")
+                    table=Table(tab_steering=table_info,global_variables=self.namespace,data_root=data_root,lazy=lazy,dense_uncertainties=dense_uncertainties,construction_cache=self.construction_cache)
+                    self.add_table(table)
+            log.debug(read_plan.summary())
+            log.info(self.construction_cache.summary())
         self.comment=self.config.get('comment',"")
         self.record_ids=self.config.get('record_ids',[])
         self.data_license=self.config.get('data_license',{})
@@ -1113,6 +1681,7 @@ class Submission():
         for resource in self.resources:
             hepdata_submission.add_additional_resource(resource.description,utils.resolve_file_name(resource.location,data_root),resource.copy_file)
         for table in self.tables:
+            table.load_variables()
             table_name=get_name(table,use_fancy_names)
 
             hepdata_table = hepdata_lib.Table(table_name)
@@ -1133,17 +1702,16 @@ class Submission():
                     hepdata_variable=hepdata_lib.Variable(variable_name, is_independent=variable.is_independent, is_binned=variable.is_binned, units=variable.units)
                     hepdata_variable.values=variable.tolist()
                     hepdata_variable.digits=variable.digits
-                    #
-                    #HACK: Mind fixed_zero_variable is list of ndarray instead of Uncertenties/Variable... need to be fixed (TODO)
-                    #
-                    fixed_zero_variable=fix_zero_error(variable)
-                    #
+                    need_zero_error_fix=fix_zero_error(variable)
+                    matrix=variable.uncertainty_matrix
+                    # packed uncertainties are converted all at once
+                    uncertainty_values=matrix.to_lists(need_zero_error_fix) if matrix is not None else None
                     for index,unc in enumerate(variable.uncertainties):
                         #print(type(unc),variable.uncertainties[index])
                         if(unc.is_visible):
                             unc_name=get_name(unc,use_fancy_names)
                             hepdata_unc = hepdata_lib.Uncertainty(None if unc_name=='' else unc_name, is_symmetric=unc.is_symmetric)
-                            hepdata_unc.values=fixed_zero_variable[index].tolist()
+                            hepdata_unc.values=uncertainty_values[index] if uncertainty_values is not None else fixed_zero_error_values(unc,need_zero_error_fix)
                             #hepdata_unc.digits=unc.digits -- not supported by hepdata_lib
                             hepdata_variable.add_uncertainty(hepdata_unc)
                     if(len(variable.qualifiers)!=0):
@@ -1162,6 +1730,7 @@ class Submission():
         if(name in self.__dict__):
             raise ValueError(f"You try to add table with name '{name}'. This name, however, cannot be used as is already taken, see __dict__:{self.__dict__}.")
         self.__dict__[name]=table
+        self._namespace[name]=table
 
     def insert_table(self,index:int, table:Table)->None:
         """
@@ -1221,6 +1790,7 @@ class Submission():
                 if(not new_tab.name in self.__dict__):
                     log.warning(f"The table {new_tab.name} to be updated was not found in __dict__ of submission object however it should be there... You probably use the code not as it was intended to be used!")
                 self.__dict__[new_tab.name]=new_tab # here we do not use _add_tab_to_dict_safely as the table name should already be in __dict__ (or not be there at all)
+                self._namespace[new_tab.name]=new_tab
         if(no_matching):
             log.warning(f"You tried to update table {new_tab.name}, but no table of such name found in the table! Simply adding the table instead.")
             self.add_table(new_tab)
@@ -1243,6 +1813,7 @@ class Submission():
                 # we continue nonetheless
             else:
                 self.__dict__.pop(table_name)
+            self._namespace.pop(table_name,None)
             del self.tables[self.table_index(table_name)]
 
     def insert_resource(self,index:int, resource:Resource)->None:
@@ -1293,6 +1864,8 @@ class Submission():
     def config(self, config:Dict[str,Any])->None:
         # Check schema of the submission steering file:
         utils.check_schema(config,'steering_file.json')
+        # Python expressions are compiled now, so errors in them are reported right away
+        check_steering_expressions(config.get('tables',[]))
         self._config=config
         
     @property
@@ -1304,6 +1877,7 @@ class Submission():
         # Remove names of the tables already present in the instance's dict:
         for old_table in self.tables:
             self.__dict__.pop(old_table.name)
+            self._namespace.pop(old_table.name,None)
         # Check that new tables are of correct type and update the instance's dict
         for table in tables:
             if not isinstance(table, Table):
@@ -1377,11 +1951,38 @@ def add_rich_var_tree_from_table(table:Table,
         baseTreeLabel=str(baseTree.label).split()[0]+'.' if len(str(baseTree.label))>0 else ''
         for var in table.variables:
             spec_var_tree=rich.tree.Tree(baseTreeLabel+str(var.name)+" (var)")
-            spec_var_tree=add_rich_error_tree_from_var(var,spec_var_tree)
+            if(isinstance(var,Variable)): # uncertainties of placeholders are not known yet
+                spec_var_tree=add_rich_error_tree_from_var(var,spec_var_tree)
             baseTree.add(spec_var_tree)
     return baseTree
 
-def rich_highlight_dict_objects(dictionary:Dict[str,Any],
+_STATE_STYLES={PENDING:'yellow',LOADED:'green',FAILED:'bold red'}
+
+def add_rich_state_tree_from_table(table:Table,
+                                   baseTree:Optional[rich.tree.Tree]=None) -> rich.tree.Tree:
+    """
+    Function to attach state (pending/loaded/failed, see LazyObject) of all variables
+    and uncertainties of a Table object to rich.tree.
+    Uncertainties of variables not built yet are not known, thus not shown.
+    """
+    if(not isinstance(table,Table)):
+        raise ValueError(f"arugument 'table' needs to be of type Submission.Table")
+    if(baseTree is None):
+        baseTree=rich.tree.Tree(table.name)
+    def label(obj:Any,kind:str)->str:
+        state=get_load_state(obj)
+        text=f"{obj.name} ({kind}): [{_STATE_STYLES[state]}]{state}[/]"
+        if(state==FAILED):
+            text+=f" ({type(obj.error).__name__}: {rich.markup.escape(str(obj.error))})"
+        return text
+    for var in table.variables:
+        var_tree=baseTree.add(label(var,'var'))
+        if(not isinstance(var,LazyObject)):
+            for unc in var.uncertainties:
+                var_tree.add(label(unc,'err'))
+    return baseTree
+
+def rich_highlight_dict_objects(dictionary:Mapping[str,Any],
                                              title:str='')->None:
     """
     Highlight Tables, Variables and Uncertainties that can be found in dictionary (with recursive search)
@@ -1392,7 +1993,7 @@ def rich_highlight_dict_objects(dictionary:Dict[str,Any],
       title: title for the rich.panel printing the information
     """
     log.debug("Inside 'rich_highlight_dict_objects' function")
-    if(not isinstance(dictionary,dict)):
+    if(not isinstance(dictionary,Mapping)):
         raise ValueError("Object provided to function {__name__} should be dictionary, while it is {type(dictionary)}. Full object for reference: {dictionary}")
     if(not isinstance(title,str)):
         raise ValueError("Title provided to function {__name__} should be string, while it is {type(title)}. Full object for reference: {title}")
@@ -7,8 +7,8 @@
 
 from hepdata_validator.submission_file_validator import SubmissionFileValidator # type: ignore 
 from hepdata_validator.data_file_validator import DataFileValidator             # type: ignore
-from yaml import CSafeLoader as Loader # type: ignore
 import yaml # type: ignore
+Loader=getattr(yaml,'CSafeLoader',yaml.SafeLoader) # libyaml if available
 import json
 from .logs import logging
 import os.path
@@ -1,5 +1,6 @@
 import click
-from .Submission import Submission,rich_highlight_dict_objects,decode_variable_from_hepdata,perform_transformation
+from .Submission import Submission,rich_highlight_dict_objects,decode_variable_from_hepdata,perform_transformation,EvaluationNamespace
+from .Submission import LazyObject,add_rich_state_tree_from_table
 from .Submission import Variable
 from .Submission import Table
 from .logs import logging
@@ -7,6 +8,10 @@ from .console import console
 from . import utils
 from . import checks
 from . import variable_loading
+from . import disk_cache
+from . import root_file_pool
+from . import reader_cache
+from . import vectorised_eval
 from . import useful_functions as ufs
 from .version import __version__
 from .variable_loading import check_if_file_exists_and_readable
@@ -15,11 +20,13 @@ from collections.abc import Iterable
 import numpy as np
 import rich.columns 
 import rich.table 
+import rich.tree
 import rich.panel
 import collections
 import re 
 import scipy.stats, scipy.special  # type: ignore
 import json
+import tracemalloc
 import jsonref # type: ignore
 import os.path
 from typing import List,Optional,Dict,Any,Tuple
@@ -31,12 +38,94 @@ from typing import List,Optional,Dict,Any,Tuple
               type=click.Choice(list(logging._levelToName.values()),
                                 case_sensitive=False),
               default="INFO",help="set log level.")
-def hepdata_maker(log_level):
+@click.option('--cache-dir',
+              type=click.Path(file_okay=False),
+              default=None,
+              envvar='HEPDATA_MAKER_CACHE_DIR',
+              help="""Directory for the persistent cache of parsed input files.
+              Unchanged input files are then not re-parsed in subsequent runs.
+              The directory can be shared by several processes.
+
+              Can be also set with HEPDATA_MAKER_CACHE_DIR environment variable.
+              By default no persistent cache is used.
+              """)
+@click.option('--reader-cache-budget',
+              type=click.FloatRange(min=0),
+              default=None,
+              metavar='MEGABYTES',
+              envvar='HEPDATA_MAKER_READER_CACHE_BUDGET',
+              help=f"""Memory budget of the cache of parsed input files.
+              Least recently used files are dropped from the cache when it is exceeded.
+
+              Can be also set with HEPDATA_MAKER_READER_CACHE_BUDGET environment variable.
+              Default: {reader_cache.DEFAULT_BUDGET_MB:.0f} MB.
+              """)
+@click.option('--prefetch-threads',
+              type=click.IntRange(min=0),
+              default=variable_loading.PREFETCH_THREADS,
+              show_default=True,
+              help="""Number of threads reading input files of the steering file
+              before tables are created (0 disables the prefetching).""")
+@click.option('--prefetch-processes',
+              type=click.IntRange(min=0),
+              default=variable_loading.PREFETCH_PROCESSES,
+              show_default=True,
+              help="""Number of processes parsing yaml and tex input files
+              during the prefetching (0: parsing is done by the threads).""")
+@click.option('--stream-json-above',
+              type=click.FloatRange(min=0),
+              default=None,
+              metavar='MEGABYTES',
+              help="""Read json files larger than MEGABYTES in the streaming mode
+              (requires 'ijson' package). Values of simple decodes (e.g. '.[].xsec')
+              are then extracted without loading the whole file into memory.
+
+              By default json files are always read as a whole.
+              """)
+@click.option('--numexpr-above',
+              type=click.IntRange(min=0),
+              default=None,
+              metavar='ELEMENTS',
+              help="""Evaluate element-wise transformations (arithmetic, comparisons, np.where, np.sqrt, ...)
+              of arrays with at least ELEMENTS entries with numexpr (requires 'numexpr' package),
+              in one multithreaded pass without temporary arrays.
+              Other transformations are evaluated with python's eval.
+
+              By default all transformations are evaluated with eval.
+              """)
+@click.option('--numexpr-threads',
+              type=click.IntRange(min=1),
+              default=None,
+              help="""Number of threads used by numexpr (see --numexpr-above).""")
+@click.option('--trace-memory',
+              is_flag=True,
+              default=False,
+              help="""Report peak memory used by python objects at the end of the command
+              (traced with tracemalloc, which slows down the execution).""")
+@click.pass_context
+def hepdata_maker(ctx,log_level,cache_dir,reader_cache_budget,prefetch_threads,prefetch_processes,stream_json_above,numexpr_above,numexpr_threads,trace_memory):
     """hepdata_maker base CLI entry"""
     from .logs import set_default_logger
     set_default_logger(log_level)
     log = logging.getLogger(__name__)
     log.debug(f"Log-level is {log_level}")
+    if(cache_dir):
+        cache=disk_cache.enable_disk_cache(cache_dir)
+        ctx.call_on_close(lambda: log.info(cache.summary()))
+    ctx.call_on_close(root_file_pool.ROOT_FILE_POOL.close_all)
+    if(reader_cache_budget is not None):
+        reader_cache.READER_CACHE.set_budget(int(reader_cache_budget*2**20))
+    ctx.call_on_close(lambda: log.debug(reader_cache.READER_CACHE.summary()))
+    variable_loading.configure_prefetch(prefetch_threads,prefetch_processes)
+    ctx.call_on_close(variable_loading.shutdown_prefetch_processes)
+    if(stream_json_above is not None):
+        variable_loading.enable_json_streaming(int(stream_json_above*2**20))
+    if(numexpr_above is not None):
+        vectorised_eval.enable_vectorised_evaluation(numexpr_above,numexpr_threads)
+        ctx.call_on_close(lambda: log.debug(vectorised_eval.evaluation_summary()))
+    if(trace_memory):
+        tracemalloc.start()
+        ctx.call_on_close(lambda: log.info(f"Peak memory used by python objects: {tracemalloc.get_traced_memory()[1]/2**20:.1f} MiB"))
 
 # Global logging object can only be created after debug level is set above
 log = logging.getLogger(__name__)
@@ -68,7 +157,12 @@ log = logging.getLogger(__name__)
               help="""Force 'fancy-names' to be used for tables,
               variables and uncertainties.
               """)
-def create_submission(steering_file,data_root,output_dir,use_fancy_names):
+@click.option('--dense-uncertainties',
+              is_flag=True,
+              help="""Store all (float) uncertainties of a variable in one array,
+              so they are processed together when writing the submission.
+              """)
+def create_submission(steering_file,data_root,output_dir,use_fancy_names,dense_uncertainties):
     """
     Create HEPdata submission files using STEERING_FILE.
 
@@ -80,7 +174,7 @@ def create_submission(steering_file,data_root,output_dir,use_fancy_names):
     console.print(f"Loading submission information based on {steering_file}")
     submission=Submission()
     submission.read_table_config(steering_file)
-    submission.load_table_config(data_root)
+    submission.load_table_config(data_root,dense_uncertainties=dense_uncertainties)
     # TODO require user to confirm overwriting output_dir if it already exist
     with console.status("Creating hepdata files (this might take a while)..."):
         submission.create_hepdata_record(data_root,output_dir,use_fancy_names)
@@ -107,17 +201,19 @@ def check_schema(steering_file):
 def submission_for_selected_tables(steering_file:str,
                                    data_root:str,
                                    load_all_tables:bool,
-                                   requested_tables:List[Tuple[str,bool]])->Submission:
+                                   requested_tables:List[Tuple[str,bool]],
+                                   lazy:bool=False)->Submission:
     """
     Create Submission object from STEERING_FILE loading all or only selected tables.
+    With LAZY, variables are read only when needed (see Submission.LazyObject).
     """
     console.print(f"Loading requested tables based on {steering_file}")
     submission=Submission()
     submission.read_table_config(steering_file)
     if(load_all_tables):
-        submission.load_table_config(data_root)
+        submission.load_table_config(data_root,lazy=lazy)
     else:
-        submission.load_table_config(data_root,selected_table_names=requested_tables)
+        submission.load_table_config(data_root,selected_table_names=requested_tables,lazy=lazy)
 
     return submission
 
@@ -139,7 +235,7 @@ def submission_for_selected_tables(steering_file:str,
               """)
 @click.option('--load-all-tables/--load-only-selected','-a/-o',
               help="""Choose whether to load all tables specified in the steering file
-              or only the selected ones.
+              or only the selected ones (and the tables they depend on).
               """,
               default=True)
 @click.option('--indices', '-i',
@@ -150,7 +246,13 @@ def submission_for_selected_tables(steering_file:str,
               type=str,
               help="Specify names of the tables to print out.",
               multiple=True)
-def check_table(steering_file,data_root,load_all_tables,indices,names):
+@click.option('--lazy/--eager',
+              help="""With '--lazy', variables and uncertainties are read only when needed
+              (printed or used by a transformation). State of each of them
+              (pending, loaded or failed) is printed at the end.
+              """,
+              default=False)
+def check_table(steering_file,data_root,load_all_tables,indices,names,lazy):
     """
     Print out informations stored in selected tables from STEERING_FILE.
     You can specify tables by names or location in the steering file.
@@ -160,13 +262,13 @@ def check_table(steering_file,data_root,load_all_tables,indices,names):
 
     By default all tables from the steering file are being loaded
     (more specifically those with 'should_be_loaded'=True).
-    This is because your selected tables can depend on the variables
-    from other tables too. If this is not the case you can use
-    '--load-only-selected' flag to speed up execution.
+    Use '--load-only-selected' flag to speed up execution: only the selected tables
+    and the tables used by their transformations (found automatically) are loaded then.
     """
     console.rule("check_table",characters="=")
-    requested_tables=utils.get_requested_table_list(steering_file,load_all_tables,indices,names)
-    submission=submission_for_selected_tables(steering_file,data_root,load_all_tables,requested_tables)
+    requested_tables=utils.get_requested_table_list(steering_file,load_all_tables,indices,names,include_dependencies=False)
+    tables_to_load=utils.get_requested_table_list(steering_file,load_all_tables,indices,names)
+    submission=submission_for_selected_tables(steering_file,data_root,load_all_tables,tables_to_load,lazy)
     console.print(f"Printing requested tables:")
     print(requested_tables,submission.tables)
     for table in submission.tables:
@@ -196,7 +298,14 @@ def check_table(steering_file,data_root,load_all_tables,indices,names):
             rich_table=rich.table.Table()
             not_visible_variable_names=[]
             visible_variables=[]
-            for var in table.variables:
+            for var in list(table.variables):
+                if(isinstance(var,LazyObject) and var.is_visible):
+                    try:
+                        var=var.load()
+                        var.load_uncertainties()
+                    except Exception as exc:
+                        log.error(f"Variable {var.name} of table {table.name} could not be loaded: {exc}")
+                        continue
                 if(not var.is_visible):
                     # If variable is not visible
                     # (used as temporary one for example)
@@ -230,6 +339,11 @@ def check_table(steering_file,data_root,load_all_tables,indices,names):
                 variable_tables.append(var_table)
             rich_table.add_row(*variable_tables)
             console.print("visible values:",rich_table)
+    if(lazy):
+        state_tree=rich.tree.Tree("[bold]State of variables and uncertainties:")
+        for table in submission.tables:
+            add_rich_state_tree_from_table(table,state_tree.add(table.name))
+        console.print(state_tree)
 
 ## hepdata_maker check_variable
 @hepdata_maker.command()
@@ -237,7 +351,7 @@ def check_table(steering_file,data_root,load_all_tables,indices,names):
               type=click.Path(exists=False),
               help="Path to the data file to be used for decoding.")
 @click.option('--file-type',
-              type=click.Choice(['json', 'yaml','csv','root','tex'],
+              type=click.Choice(['json', 'yaml','csv','root','tex','npy','npz'],
                                 case_sensitive=False),
               help="""Specify the file type of the data file
               (if cannot be guessed from file extention).
@@ -254,6 +368,8 @@ def check_table(steering_file,data_root,load_all_tables,indices,names):
                 - :py:func:`hepdata_maker.variable_loading.get_array_from_yaml`
                 - :py:func:`hepdata_maker.variable_loading.get_array_from_csv`
                 - :py:func:`hepdata_maker.variable_loading.get_array_from_tex`
+                - :py:func:`hepdata_maker.variable_loading.get_array_from_npy`
+                - :py:func:`hepdata_maker.variable_loading.get_array_from_npz`
               """)
 @click.option('--data-type','-t',
               type=str,
@@ -292,6 +408,16 @@ def check_table(steering_file,data_root,load_all_tables,indices,names):
               https://docs.python.org/3/howto/regex.html#the-backslash-plague
               for the need of multiple backslashes.
               """)
+@click.option('--step-size',
+              type=str,
+              default=None,
+              help="""Only used when reading TTree/RNTuple from ROOT files.
+              Number of entries (e.g. 10000) or memory size (e.g. '50 MB') read at once.""")
+@click.option('--cut',
+              type=str,
+              default=None,
+              help="""Only used when reading TTree/RNTuple from ROOT files.
+              Expression selecting the entries to be read, e.g. 'njet>=2'.""")
 @click.option('--transformation','-x','transformations',
               type=str,
               multiple=True,
@@ -325,7 +451,7 @@ def check_table(steering_file,data_root,load_all_tables,indices,names):
 @click.option('--load-all-tables/--load-only-selected', '-a/-o',
               default=True,
               help="""Choose whether to load all tables specified
-              in the steering file or only the selected ones.
+              in the steering file or only the selected ones (and the tables they depend on).
               """)
 @click.option('--indices', '-i',
               type=int,
@@ -335,7 +461,7 @@ def check_table(steering_file,data_root,load_all_tables,indices,names):
               type=str,
               multiple=True,
               help="Specify names of the tables to load from the steering_file.")
-def check_variable(in_file,data_root,file_type,decode,data_type,tabular_loc_decode,delimiter,replace_dict,transformations,steering_file,load_all_tables,indices,names):
+def check_variable(in_file,data_root,file_type,decode,data_type,tabular_loc_decode,delimiter,replace_dict,step_size,cut,transformations,steering_file,load_all_tables,indices,names):
     """
     Create variable (1-D numpy array) based on information provided.
 
@@ -352,7 +478,8 @@ def check_variable(in_file,data_root,file_type,decode,data_type,tabular_loc_deco
     if(in_file):
         console.print(f"Since [bold]data_root[/bold] is {data_root}, the following location is to be read {utils.resolve_file_name(in_file,data_root)}")
         curr_locals=locals()
-        extra_args={k: curr_locals[k] for k in ['delimiter', 'file_type', 'replace_dict', 'tabular_loc_decode'] if k in curr_locals}
+        extra_args={k: curr_locals[k] for k in ['delimiter', 'file_type', 'replace_dict', 'tabular_loc_decode', 'step_size', 'cut'] if k in curr_locals}
+        extra_args['step_size']=variable_loading.parse_step_size(step_size) # number of entries or memory size
     #logging.root.level='debug'
     current_loaded_module_log_level=variable_loading.log.level
     variable_loading.log.setLevel(logging.DEBUG)
@@ -371,12 +498,12 @@ def check_variable(in_file,data_root,file_type,decode,data_type,tabular_loc_deco
     # Let's get transformations now!
     ## First, for complecated transformations other tables might be necessary, thus loading steering_file if provided
     submission=None
-    submission_dict={}
+    submission_dict=EvaluationNamespace()
     if(steering_file):
         log.debug(f"Steering file {steering_file} has been provided and is being read.")
         requested_tables=utils.get_requested_table_list(steering_file,load_all_tables,indices,names)
         submission=submission_for_selected_tables(steering_file,data_root,load_all_tables,requested_tables)
-        submission_dict=submission.__dict__
+        submission_dict=submission.namespace
 
     console.rule("data_type")
     var_table_datatype=rich.table.Table(show_header=False,box=rich.box.SQUARE)
@@ -384,7 +511,7 @@ def check_variable(in_file,data_root,file_type,decode,data_type,tabular_loc_deco
         console.print(f"data_type has been specified ({data_type}) and is being enforced.")
         if(data_type!='' and tmp_values is not None):
             try:
-                tmp_values=tmp_values.astype(data_type)
+                tmp_values=variable_loading.convert_to_data_type(tmp_values,data_type).astype(data_type,copy=False)
             except Exception as exc:
                 log.error(f"Translation of variable to specific data_type has failed. You wanted '{data_type}' on {tmp_values}")
                 raise exc
@@ -638,7 +765,6 @@ def create_steering_file(output,directory,only_steering_files,force):
     """
     import glob
     import os.path
-    from hepdata_lib import RootFileReader # type: ignore
     import csv
     from .Submission import is_name_correct
     from collections import OrderedDict
@@ -689,7 +815,7 @@ def create_steering_file(output,directory,only_steering_files,force):
         selected_associated_files={}
         if(associated_files):
             for associated_path in associated_files:
-                if(check_if_file_exists_and_readable(associated_path)):
+                if(check_if_file_exists_and_readable(associated_path,sniff=True)): # files are parsed (once) only when used below
                     file_type=associated_path.split(".")[-1].lower()
                     selected_associated_files[file_type]=associated_path
                 else:
@@ -731,23 +857,25 @@ def create_steering_file(output,directory,only_steering_files,force):
             av_items=variable_loading.get_list_of_objects_in_root_file(file_path)
             av_item_names_no_cycle=[name.split(';')[0] for name in av_items]
             suitable_object=None
-            rreader=RootFileReader(file_path) # this should not fail as the file was checked before
-            for obj_name in av_items:
-                item_classname=av_items[obj_name]
-                loaded_object_hepdata_lib=None
-                try:
-                    if( "TH1" in item_classname):
-                        loaded_object_hepdata_lib=rreader.read_hist_1d(obj_name)
-                    elif( "TH2" in item_classname):
-                        loaded_object_hepdata_lib=rreader.read_hist_2d(obj_name)
-                    elif("RooHist" in item_classname or "TGraph" in item_classname):
-                        loaded_object_hepdata_lib=rreader.read_graph(obj_name)
-                except Exception:
-                    log.debug(f" failed to read object {obj_name} inside root file {file_path}. Skipping the object")
-                    continue
-                if(loaded_object_hepdata_lib and "x" in loaded_object_hepdata_lib.keys()):
-                    suitable_object=obj_name
-                    break;
+            # the file is held in the pool (not evicted) while its reader is used
+            with root_file_pool.ROOT_FILE_POOL.open(file_path) as root_file, root_file_pool.PYROOT_LOCK:
+                rreader=root_file.reader # this should not fail as the file was checked before
+                for obj_name in av_items:
+                    item_classname=av_items[obj_name]
+                    loaded_object_hepdata_lib=None
+                    try:
+                        if( "TH1" in item_classname):
+                            loaded_object_hepdata_lib=rreader.read_hist_1d(obj_name)
+                        elif( "TH2" in item_classname):
+                            loaded_object_hepdata_lib=rreader.read_hist_2d(obj_name)
+                        elif("RooHist" in item_classname or "TGraph" in item_classname):
+                            loaded_object_hepdata_lib=rreader.read_graph(obj_name)
+                    except Exception:
+                        log.debug(f" failed to read object {obj_name} inside root file {file_path}. Skipping the object")
+                        continue
+                    if(loaded_object_hepdata_lib and "x" in loaded_object_hepdata_lib.keys()):
+                        suitable_object=obj_name
+                        break;
             if(suitable_object is not None):
                 in_file=f'{selected_associated_files["root"]}:{suitable_object}'
                 variables.append({"in_file":in_file,"decode":"x","name":"variable_x","is_independent":True})
@@ -0,0 +1,279 @@
+"""
+Common-subexpression elimination across the expressions of a table.
+
+Transformations and matching conditions of a table often share parts,
+e.g. ``VAR*lumi_scale`` or ``np.abs(nominal-up)`` used by several uncertainties.
+:py:class:`SubexpressionCache` parses all expressions of a table, finds the subtrees
+appearing more than once and evaluates each of them only once per table build.
+
+A shared subtree is reused only if all the names it refers to resolve to the very same objects,
+so expressions evaluated in different scopes (e.g. VAR of two variables) are never mixed up.
+Parts of comprehensions, lambdas and conditional expressions are not considered
+(they are evaluated in their own scope or not at all), neither are subscript slices
+nor subtrees calling functions not known to be pure (see :py:data:`PURE_FUNCTIONS`).
+Results that are views of a shared value are copied, so no two expressions share a buffer.
+"""
+from .logs import logging
+log = logging.getLogger(__name__)
+import ast
+import builtins
+import copy
+import numpy as np
+from collections import ChainMap,Counter
+from types import CodeType
+from typing import Any,Dict,Iterable,List,Mapping,MutableMapping,Optional,Tuple,cast
+from . import vectorised_eval
+from .utils import compile_expression
+
+# Nodes with own scope or lazily evaluated parts; subtrees inside them are not shared
+_OPAQUE_NODES=(ast.Lambda,ast.ListComp,ast.SetComp,ast.DictComp,ast.GeneratorExp,ast.IfExp,ast.BoolOp,ast.NamedExpr)
+_NAME_PREFIX='_cse'
+
+# numpy functions (np.<name>) modifying their arguments or returning uninitialised data
+IMPURE_NUMPY_FUNCTIONS=frozenset({'copyto','put','place','putmask','put_along_axis','fill_diagonal','empty','empty_like'})
+# builtins and array methods without side effects
+PURE_FUNCTIONS=frozenset({'abs','len','min','max','sum','round','float','int','bool','list','tuple'})
+PURE_METHODS=frozenset({'reshape','astype','sum','mean','std','var','min','max','prod','cumsum','cumprod',
+                        'flatten','ravel','transpose','swapaxes','squeeze','copy','round','clip','tolist',
+                        'any','all','argmin','argmax','nonzero','dot','conj','real','imag'})
+
+def evaluate_expression(source:str,
+                        global_vars:Dict[str,Any],
+                        local_vars:Mapping[str,Any])->Any:
+    """
+    Evaluate python expression SOURCE, with numexpr if enabled and possible
+    (see :py:func:`hepdata_maker.vectorised_eval.try_vectorised_evaluation`), with eval otherwise.
+
+    Args:
+      source: python expression
+      global_vars: global names known to the expression
+      local_vars: local names known to the expression
+    """
+    is_vectorised,result=vectorised_eval.try_vectorised_evaluation(source,global_vars,local_vars)
+    if(is_vectorised):
+        return result
+    return eval(compile_expression(source),global_vars,local_vars)
+
+def _compile_node(node:ast.AST)->Tuple[Optional[str],CodeType]:
+    # rewritten expressions are compiled from their trees; their source (needed by numexpr)
+    # is only available with ast.unparse (python>=3.9), otherwise they are evaluated with eval
+    assert isinstance(node,ast.expr)
+    code=compile(ast.fix_missing_locations(ast.Expression(body=node)),'<expression>','eval')
+    source=ast.unparse(node) if hasattr(ast,'unparse') else None
+    return (source,code)
+
+def _evaluate_compiled(compiled:Tuple[Optional[str],CodeType],
+                       global_vars:Dict[str,Any],
+                       local_vars:Mapping[str,Any])->Any:
+    source,code=compiled
+    if(source is not None):
+        return evaluate_expression(source,global_vars,local_vars)
+    return eval(code,global_vars,local_vars)
+
+def _scoped(scope:Dict[str,Any],local_vars:Mapping[str,Any])->ChainMap:
+    # shared values in front of the local names; lookups only, local_vars is never written to
+    return ChainMap(scope,cast(MutableMapping[str,Any],local_vars))
+
+def _candidate_nodes(node:ast.AST)->Iterable[ast.AST]:
+    # all nodes that could be evaluated on their own (opaque nodes are candidates, their content is not)
+    yield node
+    if(isinstance(node,_OPAQUE_NODES)):
+        return
+    if(isinstance(node,ast.Subscript)):
+        # slices (e.g. '(:, 0)') are not expressions on their own
+        yield from _candidate_nodes(node.value)
+        return
+    for child in ast.iter_child_nodes(node):
+        if(isinstance(child,ast.expr)):
+            yield from _candidate_nodes(child)
+        else:
+            # e.g. keywords
+            for grandchild in ast.iter_child_nodes(child):
+                if(isinstance(grandchild,ast.expr)):
+                    yield from _candidate_nodes(grandchild)
+
+def _is_pure_call(node:ast.Call)->bool:
+    if(any(keyword.arg=='out' for keyword in node.keywords)):
+        return False
+    function=node.func
+    if(isinstance(function,ast.Name)):
+        return function.id in PURE_FUNCTIONS
+    if(isinstance(function,ast.Attribute)):
+        if(isinstance(function.value,ast.Name) and function.value.id=='np'):
+            return function.attr not in IMPURE_NUMPY_FUNCTIONS # np.random.* etc. are not matched
+        return function.attr in PURE_METHODS
+    return False
+
+def _is_shareable(node:ast.AST)->bool:
+    # names, attribute look-ups (e.g. np.abs, table.var) and constants are not worth sharing,
+    # starred arguments and slices cannot be evaluated alone, impure calls must be evaluated each time
+    top=node
+    while(isinstance(top,ast.Attribute)):
+        top=top.value
+    if(isinstance(top,(ast.Name,ast.Constant,ast.Starred,ast.Slice))):
+        return False
+    for child in ast.walk(node):
+        if(isinstance(child,ast.Slice)):
+            return False
+        if(isinstance(child,ast.Call) and not _is_pure_call(child)):
+            return False
+    return True
+
+def _node_count(node:ast.AST)->int:
+    return sum(1 for child in ast.walk(node) if isinstance(child,ast.expr))
+
+class _Rewriter(ast.NodeTransformer):
+    def __init__(self,shared:Dict[str,str]):
+        self.shared=shared
+        self.replaced:List[str]=[] # keys of the replaced subtrees
+
+    def generic_visit(self,node:ast.AST)->ast.AST:
+        key=ast.dump(node)
+        if(key in self.shared):
+            self.replaced.append(key)
+            return ast.copy_location(ast.Name(id=self.shared[key],ctx=ast.Load()),node)
+        if(isinstance(node,_OPAQUE_NODES)):
+            return node
+        return super().generic_visit(node)
+
+class SubexpressionCache():
+    """
+    Evaluator of the expressions of one table sharing results of common subexpressions.
+
+    Args:
+      expressions: all expressions (transformations, matching conditions) of the table;
+        repeated expressions are to be listed as many times as they are used
+    """
+    def __init__(self,expressions:Iterable[str]):
+        expressions=list(expressions)
+        occurrences=Counter(expressions)
+        trees:Dict[str,ast.Expression]={}
+        counts:Counter=Counter()
+        nodes:Dict[str,ast.AST]={}
+        for source in expressions:
+            if(source in trees):
+                tree=trees[source]
+            else:
+                try:
+                    tree=ast.parse(source.strip(),mode='eval')
+                except SyntaxError:
+                    continue # reported by check_steering_expressions
+                trees[source]=tree
+            for node in _candidate_nodes(tree.body):
+                if(_is_shareable(node)):
+                    key=ast.dump(node)
+                    counts[key]+=1
+                    nodes.setdefault(key,node)
+        # every subtree used at least twice gets a name
+        self.shared:Dict[str,str]={key:f"{_NAME_PREFIX}{index}" for index,key in enumerate(key for key,count in counts.items() if count>1)}
+        self._shared_sources:Dict[str,Tuple[Optional[str],CodeType]]={}  # name --> compiled expression (with inner shared subtrees replaced)
+        self._shared_names:Dict[str,Tuple[str,...]]={} # name --> inner shared subtree names it needs
+        self._free_names:Dict[str,Tuple[str,...]]={} # name --> names the value depends on
+        self._rewritten:Dict[str,Tuple[Tuple[Optional[str],CodeType],Tuple[str,...],Optional[str]]]={} # source --> (rewritten expression, shared names needed, name if the whole expression is shared)
+        self._values:Dict[Tuple[Any,...],Tuple[Tuple[Any,...],Any]]={}
+        self.evaluations=0
+        self.reuses=0
+        self.nodes_removed=0
+        for key,name in self.shared.items():
+            # the shared subtree itself may contain smaller shared subtrees
+            rewriter=_Rewriter({inner_key:inner_name for inner_key,inner_name in self.shared.items() if inner_key!=key})
+            body=rewriter.generic_visit(_copy_node(nodes[key]))
+            self._shared_sources[name]=_compile_node(body)
+            self._shared_names[name]=tuple(self.shared[inner_key] for inner_key in rewriter.replaced)
+            self._free_names[name]=tuple(sorted({node.id for node in ast.walk(body) if isinstance(node,ast.Name)}))
+        replaced_nodes=0
+        used_shared=set()
+        for source,tree in trees.items():
+            rewriter=_Rewriter(self.shared)
+            body=rewriter.visit(_copy_node(tree.body))
+            whole=body.id if isinstance(body,ast.Name) and len(rewriter.replaced)>0 else None
+            self._rewritten[source]=(_compile_node(body),tuple(self.shared[key] for key in rewriter.replaced),whole)
+            for key in rewriter.replaced:
+                replaced_nodes+=occurrences[source]*(_node_count(nodes[key])-1) # replaced by a single name
+                used_shared.add(key)
+        # each shared subtree used is still evaluated once
+        self.nodes_removed=replaced_nodes-sum(_node_count(nodes[key])-1 for key in used_shared)
+
+    def __len__(self)->int:
+        return len(self.shared)
+
+    def _resolve_free_names(self,names:Tuple[str,...],
+                            global_vars:Dict[str,Any],
+                            local_vars:Mapping[str,Any])->Optional[Tuple[Any,...]]:
+        values=[]
+        for name in names:
+            if(name in local_vars):
+                values.append(local_vars[name])
+            elif(name in global_vars):
+                values.append(global_vars[name])
+            elif(hasattr(builtins,name)):
+                values.append(getattr(builtins,name))
+            else:
+                return None # unknown name, evaluation will fail anyway
+        return tuple(values)
+
+    def _shared_value(self,name:str,
+                      global_vars:Dict[str,Any],
+                      local_vars:Mapping[str,Any],
+                      scope:Dict[str,Any])->Any:
+        for inner_name in self._shared_names[name]:
+            if(inner_name not in scope):
+                scope[inner_name]=self._shared_value(inner_name,global_vars,local_vars,scope)
+        compiled=self._shared_sources[name]
+        scoped_locals=_scoped(scope,local_vars)
+        objects=self._resolve_free_names(self._free_names[name],global_vars,scoped_locals)
+        if(objects is None):
+            return _evaluate_compiled(compiled,global_vars,scoped_locals)
+        # objects are kept in the entry, thus their ids cannot be reused while the entry exists
+        key=(name,)+tuple(id(obj) for obj in objects)
+        entry=self._values.get(key)
+        if(entry is not None and all(a is b for a,b in zip(entry[0],objects))):
+            self.reuses+=1
+            return entry[1]
+        value=_evaluate_compiled(compiled,global_vars,scoped_locals)
+        self.evaluations+=1
+        self._values[key]=(objects,value)
+        return value
+
+    def evaluate(self,source:str,
+                 global_vars:Dict[str,Any],
+                 local_vars:Mapping[str,Any])->Any:
+        """
+        Evaluate expression SOURCE, reusing values of its shared subexpressions.
+
+        Args:
+          source: python expression (one of the table expressions, others are evaluated as usual)
+          global_vars: global names known to the expression
+          local_vars: local names known to the expression
+        """
+        rewritten=self._rewritten.get(source)
+        if(rewritten is None or len(rewritten[1])==0):
+            return evaluate_expression(source,global_vars,local_vars)
+        compiled,names,whole=rewritten
+        scope:Dict[str,Any]={}
+        for name in names:
+            if(name not in scope):
+                scope[name]=self._shared_value(name,global_vars,local_vars,scope)
+        if(whole is not None):
+            # the whole expression is shared, its users must not share the result
+            value=scope[whole]
+        else:
+            value=_evaluate_compiled(compiled,global_vars,_scoped(scope,local_vars))
+        if(isinstance(value,np.ndarray) and any(isinstance(shared,np.ndarray) and np.may_share_memory(value,shared) for shared in scope.values())):
+            # e.g. a slice of a shared array
+            value=value.copy()
+        return value
+
+    def clear(self)->None:
+        """
+        Drop the values computed (e.g. once the table is built).
+        """
+        self._values.clear()
+
+    def summary(self)->str:
+        """Human readable statistics of the elimination."""
+        return f"{len(self)} shared subexpressions, {self.nodes_removed} expression-tree nodes removed, {self.evaluations} evaluated, {self.reuses} reused."
+
+def _copy_node(node:ast.AST)->ast.AST:
+    # NodeTransformer modifies the tree in place, the parsed trees are kept untouched
+    return copy.deepcopy(node)
@@ -0,0 +1,191 @@
+"""
+Memoised construction of Variables and Uncertainties from steering file snippets.
+
+Steering files often ``$ref`` the same definition into many tables (e.g. a shared mass axis
+or a common luminosity uncertainty). Objects built from identical definitions are computed only once,
+each user gets its own copy, so changing one of them does not change the others.
+The cache key is a canonical hash of the resolved steering snippet, fingerprints (path, modification time, size)
+of its input files and the objects its expressions refer to by name.
+
+Referenced objects built through the cache are identified by their own key, others by their identity
+(they are kept alive by the cache, so their ids are not reused). Definitions referring to names that cannot
+be resolved or to input files that do not exist are not cached (their construction reports the problem).
+"""
+from .logs import logging
+log = logging.getLogger(__name__)
+import builtins
+import hashlib
+import json
+import os
+import numpy as np
+from typing import Any,Callable,Dict,Iterable,List,Mapping,Optional,Tuple,TypeVar
+from . import utils
+from .reader_cache import file_signature
+
+# Variable/Uncertainty (defined in Submission, which uses this module)
+BuiltObject=TypeVar('BuiltObject',bound=np.ndarray)
+
+def canonical_steering(steering:Any)->str:
+    """
+    Canonical json representation of (jsonref-resolved) STEERING snippet, with sorted keys.
+    """
+    def canonical(obj:Any)->Any:
+        if(isinstance(obj,Mapping)):
+            return {str(key):canonical(value) for key,value in obj.items()}
+        if(isinstance(obj,(list,tuple))):
+            return [canonical(value) for value in obj]
+        return obj
+    return json.dumps(canonical(steering),sort_keys=True,default=repr)
+
+def _copy_steering(steering:Any)->Any:
+    # copy of (jsonref-resolved) steering file snippet, keeping objdicts
+    if(isinstance(steering,Mapping)):
+        items={key:_copy_steering(value) for key,value in steering.items()}
+        if(isinstance(steering,utils.objdict)):
+            return utils.objdict(items)
+        return type(steering)(items) if isinstance(steering,dict) else items
+    if(isinstance(steering,(list,tuple))):
+        return [_copy_steering(value) for value in steering]
+    return steering
+
+def copy_built(obj:BuiltObject)->BuiltObject:
+    """
+    Independent copy of OBJ (e.g. Variable): its data, steering file snippet, qualifiers
+    and uncertainties (built ones, placeholders are kept) are copied.
+    Uncertainties stored densely are copied out of the matrix (the copy is not packed).
+    """
+    clone=obj.copy()
+    clone.__dict__.update(obj.__dict__)
+    copied={}
+    uncertainties=clone.__dict__.get('_uncertainties')
+    if(isinstance(uncertainties,list)):
+        for unc in uncertainties:
+            if(isinstance(unc,np.ndarray)):
+                copied[id(unc)]=copy_built(unc)
+        clone.__dict__['_uncertainties']=[copied.get(id(unc),unc) for unc in uncertainties]
+    if(clone.__dict__.get('_uncertainty_matrix') is not None):
+        clone.__dict__['_uncertainty_matrix']=None
+    for attribute,value in clone.__dict__.items():
+        if(id(value) in copied):
+            clone.__dict__[attribute]=copied[id(value)]
+        elif(isinstance(value,np.ndarray)):
+            clone.__dict__[attribute]=value.copy() # e.g. region
+        elif(attribute in ('_var_steering','_unc_steering','qualifiers')):
+            clone.__dict__[attribute]=_copy_steering(value)
+    return clone
+
+class ConstructionCache():
+    """
+    Cache of Variables/Uncertainties built from steering file snippets.
+    """
+    def __init__(self):
+        # key --> (referenced objects, built object)
+        # digest --> (objects referenced by identity, Variable/Uncertainty built)
+        self._entries:Dict[str,Tuple[Tuple[Any,...],Any]]={}
+        self.hits=0
+        self.misses=0
+        self.uncached=0
+
+    def key(self,
+            kind:str,
+            steering:Mapping[str,Any],
+            expressions:Iterable[str],
+            file_paths:Iterable[str],
+            global_vars:Mapping[str,Any],
+            local_vars:Mapping[str,Any],
+            defined_names:Iterable[str]=())->Optional[Tuple[str,Tuple[Any,...]]]:
+        """
+        Compute the cache key of a definition.
+
+        Args:
+          kind: kind of the object (e.g. 'variable')
+          steering: steering file snippet of the object
+          expressions: python expressions evaluated in the scope of GLOBAL_VARS and LOCAL_VARS
+          file_paths: input files read (glob patterns already expanded)
+          global_vars: global names known to the expressions
+          local_vars: local names known to the expressions
+          defined_names: names defined by the object itself (e.g. its name and names of its uncertainties)
+
+        Returns:
+          (key, objects referenced by identity) or None if the definition cannot be cached
+        """
+        fingerprints=[]
+        for file_path in sorted(set(file_paths)):
+            if(not os.path.isfile(file_path)):
+                return None
+            fingerprints.append((os.path.abspath(file_path),)+file_signature(file_path))
+        names=set()
+        for expression in expressions:
+            try:
+                names|=utils.get_expression_names(expression)
+            except SyntaxError:
+                return None
+        names-=set(defined_names)
+        tokens=[]
+        objects=[]
+        for name in sorted(names):
+            if(name in local_vars):
+                obj=local_vars[name]
+            elif(name in global_vars):
+                obj=global_vars[name]
+            elif(hasattr(builtins,name)):
+                continue
+            else:
+                return None
+            try:
+                construction_key=getattr(obj,'_construction_key',None)
+            except Exception:
+                return None # e.g. a placeholder that failed to build
+            if(construction_key is not None):
+                tokens.append((name,construction_key))
+            else:
+                tokens.append((name,id(obj)))
+                objects.append(obj)
+        digest=hashlib.sha256(json.dumps([kind,canonical_steering(steering),fingerprints,tokens],default=repr).encode()).hexdigest()
+        return (digest,tuple(objects))
+
+    def get_or_build(self,
+                     key:Optional[Tuple[str,Tuple[Any,...]]],
+                     build:Callable[[],BuiltObject])->BuiltObject:
+        """
+        Get object of KEY (see :py:meth:`key`) from the cache or build it with BUILD.
+        The cache keeps its own copy of the object built, users get independent copies of it (see :py:func:`copy_built`).
+
+        Args:
+          key: cache key; if None the object is built and not cached
+          build: function (no arguments) building the object
+        """
+        if(key is None):
+            self.uncached+=1
+            return build()
+        digest,objects=key
+        entry=self._entries.get(digest)
+        if(entry is not None and all(a is b for a,b in zip(entry[0],objects))):
+            self.hits+=1
+            log.debug(f"Reusing {entry[1].name} built from the same definition.")
+            return copy_built(entry[1])
+        self.misses+=1
+        obj=build()
+        setattr(obj,'_construction_key',digest) # Variable/Uncertainty, not known to np.ndarray
+        self._entries[digest]=(objects,copy_built(obj))
+        return obj
+
+    def __len__(self)->int:
+        return len(self._entries)
+
+    def clear(self)->None:
+        """
+        Remove all entries from the cache.
+        """
+        self._entries.clear()
+
+    def stats(self)->Dict[str,int]:
+        """Get cache usage statistics."""
+        return {"hits":self.hits,
+                "misses":self.misses,
+                "uncached":self.uncached,
+                "entries":len(self)}
+
+    def summary(self)->str:
+        """Human readable usage statistics."""
+        return f"Construction cache: {self.hits} hits, {self.misses} misses, {self.uncached} not cacheable, {len(self)} entries."
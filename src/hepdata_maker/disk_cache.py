@@ -0,0 +1,187 @@
+"""
+Persistent, content-addressed cache of parsed input files.
+
+Entries are keyed by the absolute path, size, modification time and
+content hash of the input file (plus any extra information the caller
+considers relevant, e.g. file type), so a changed file is never served
+from the cache. Entries are written atomically (temporary file + rename),
+therefore several processes can safely share one cache directory.
+
+The cache is opt-in; use :py:func:`enable_disk_cache` (or ``--cache-dir``
+option of the ``hepdata_maker`` command) to activate it.
+"""
+from .logs import logging
+log = logging.getLogger(__name__)
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import Any,Callable,Dict,Optional,Tuple,Union
+
+# Bump when format of the cached objects changes (invalidates old entries).
+CACHE_FORMAT_VERSION=1
+
+# Types of input files for which parsed content can be stored on disk.
+# ROOT files are read lazily through open file handles and TexSoup objects cannot be pickled
+# (parsed tex tables are cached instead, see variable_loading.get_table_from_tex).
+CACHEABLE_FILE_TYPES=('yaml','json','csv')
+
+# Content hashes are expensive for large files, remember them per (path,size,mtime) within a process
+_CONTENT_HASH_MEMO:Dict[Tuple[str,int,int],str]={}
+
+def file_fingerprint(file_path:Union[str,os.PathLike])->Tuple[str,int,int,str]:
+    """
+    Get (absolute path, size, modification time [ns], content hash) of a file.
+
+    Args:
+      file_path: path to the file
+    """
+    abs_path=os.path.abspath(file_path)
+    stat=os.stat(abs_path)
+    memo_key=(abs_path,stat.st_size,stat.st_mtime_ns)
+    content_hash=_CONTENT_HASH_MEMO.get(memo_key)
+    if(content_hash is None):
+        hasher=hashlib.blake2b(digest_size=20)
+        with open(abs_path,'rb') as stream:
+            for chunk in iter(lambda: stream.read(1<<20),b''):
+                hasher.update(chunk)
+        content_hash=hasher.hexdigest()
+        _CONTENT_HASH_MEMO[memo_key]=content_hash
+    return (abs_path,stat.st_size,stat.st_mtime_ns,content_hash)
+
+class DiskCache():
+    """
+    Directory based store of pickled objects derived from input files.
+
+    Args:
+      cache_dir: directory where the cache entries are stored (created if needed)
+    """
+    def __init__(self,cache_dir:Union[str,os.PathLike]):
+        self.cache_dir=os.path.abspath(cache_dir)
+        os.makedirs(self.cache_dir,exist_ok=True)
+        self.hits=0
+        self.misses=0
+        self.writes=0
+        self.errors=0
+
+    def key(self,file_path:Union[str,os.PathLike],*extra:Any)->str:
+        """
+        Get the cache key for an object derived from FILE_PATH.
+        EXTRA can be anything with a stable repr (e.g. file type, decode).
+        """
+        key_source=repr((CACHE_FORMAT_VERSION,file_fingerprint(file_path),extra))
+        return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+
+    def _entry_path(self,key:str)->str:
+        return os.path.join(self.cache_dir,key[:2],key+'.pkl')
+
+    def get(self,key:str)->Tuple[bool,Any]:
+        """
+        Look up KEY in the cache.
+
+        Returns:
+          (found, value) pair; value is None if not found.
+        """
+        entry_path=self._entry_path(key)
+        try:
+            with open(entry_path,'rb') as stream:
+                value=pickle.load(stream)
+        except FileNotFoundError:
+            self.misses+=1
+            return (False,None)
+        except Exception as exc:
+            # Truncated or otherwise broken entry, treat as miss; it will be overwritten
+            log.debug(f"Unreadable disk cache entry {entry_path} ({exc}), ignoring it.")
+            self.errors+=1
+            self.misses+=1
+            return (False,None)
+        self.hits+=1
+        return (True,value)
+
+    def put(self,key:str,value:Any)->None:
+        """
+        Store VALUE under KEY. The entry appears atomically,
+        concurrent readers see either nothing or the complete entry.
+        """
+        entry_path=self._entry_path(key)
+        entry_dir=os.path.dirname(entry_path)
+        try:
+            os.makedirs(entry_dir,exist_ok=True)
+            fd,tmp_path=tempfile.mkstemp(dir=entry_dir,prefix='.tmp-',suffix='.pkl')
+            try:
+                with os.fdopen(fd,'wb') as stream:
+                    pickle.dump(value,stream,protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path,entry_path)
+            except BaseException:
+                if(os.path.exists(tmp_path)):
+                    os.remove(tmp_path)
+                raise
+            self.writes+=1
+        except Exception as exc:
+            # The cache is an optimisation only, failing to write must not stop the processing
+            log.debug(f"Could not write disk cache entry {entry_path}: {exc}")
+            self.errors+=1
+
+    def get_or_load(self,
+                    file_path:Union[str,os.PathLike],
+                    loader:Callable[[],Any],
+                    *extra:Any)->Any:
+        """
+        Return object derived from FILE_PATH either from the cache or
+        by calling LOADER (and storing its result).
+
+        Args:
+          file_path: input file the object is derived from
+          loader: function (no arguments) creating the object
+          extra: additional information distinguishing objects derived from the same file
+        """
+        key=self.key(file_path,*extra)
+        found,value=self.get(key)
+        if(found):
+            log.debug(f"Disk cache hit for {file_path} {extra}.")
+            return value
+        value=loader()
+        self.put(key,value)
+        return value
+
+    @property
+    def hit_rate(self)->float:
+        """Fraction of look-ups served from the cache."""
+        total=self.hits+self.misses
+        return self.hits/total if total>0 else 0.
+
+    def stats(self)->Dict[str,Any]:
+        """Get cache usage statistics."""
+        return {"hits":self.hits,
+                "misses":self.misses,
+                "writes":self.writes,
+                "errors":self.errors,
+                "hit_rate":self.hit_rate}
+
+    def summary(self)->str:
+        """Human readable usage statistics."""
+        return f"Disk cache {self.cache_dir}: {self.hits} hits, {self.misses} misses ({100*self.hit_rate:.1f}% hit rate), {self.writes} entries written."
+
+_ACTIVE_DISK_CACHE:Optional[DiskCache]=None
+
+def enable_disk_cache(cache_dir:Union[str,os.PathLike])->DiskCache:
+    """
+    Activate the disk cache in CACHE_DIR for all subsequent file reads.
+    """
+    global _ACTIVE_DISK_CACHE
+    _ACTIVE_DISK_CACHE=DiskCache(cache_dir)
+    log.debug(f"Disk cache enabled in {_ACTIVE_DISK_CACHE.cache_dir}.")
+    return _ACTIVE_DISK_CACHE
+
+def disable_disk_cache()->None:
+    """
+    Deactivate the disk cache (entries already written are kept).
+    """
+    global _ACTIVE_DISK_CACHE
+    _ACTIVE_DISK_CACHE=None
+
+def get_disk_cache()->Optional[DiskCache]:
+    """
+    Get the active disk cache (None if disabled).
+    """
+    return _ACTIVE_DISK_CACHE
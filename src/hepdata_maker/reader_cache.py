@@ -0,0 +1,270 @@
+"""
+In-memory cache of objects read from input files.
+
+Entries are bounded by an estimated memory budget (in bytes) rather than by their number,
+least recently used entries are evicted first. Each entry remembers modification time and size
+of the file it was read from and is discarded when the file changes on disk.
+
+The budget can be set with ``--reader-cache-budget`` option of the ``hepdata_maker`` command
+or HEPDATA_MAKER_READER_CACHE_BUDGET environment variable (both in megabytes).
+"""
+from .logs import logging
+log = logging.getLogger(__name__)
+from collections import OrderedDict
+import functools
+import os
+import sys
+import threading
+import typing
+import numpy as np
+from typing import Any,Callable,Dict,Hashable,NamedTuple,Optional,Protocol,Tuple,Union,cast
+
+DEFAULT_BUDGET_MB=2048.
+
+class CacheInfo(NamedTuple):
+    """Usage statistics of functions cached with :py:func:`cached` (same fields as functools.lru_cache)."""
+    hits:int
+    misses:int
+    maxsize:Optional[int]
+    currsize:int
+
+def estimate_size(obj:Any)->int:
+    """
+    Estimate memory [bytes] taken by OBJ, including objects it refers to.
+    numpy arrays count their data buffers, memory-mapped arrays only their overhead
+    (their data lives in the page cache of the operating system).
+
+    Args:
+      obj: object to be measured
+    """
+    size=0
+    seen=set()
+    to_visit=[obj]
+    while(to_visit):
+        item=to_visit.pop()
+        if(id(item) in seen):
+            continue
+        seen.add(id(item))
+        size+=sys.getsizeof(item)
+        if(isinstance(item,np.ndarray)):
+            if(item.base is not None):
+                to_visit.append(item.base) # views share the data of their base
+            elif(not isinstance(item,np.memmap)):
+                size+=item.nbytes
+            if(item.dtype.hasobject):
+                to_visit.extend(item.ravel().tolist())
+        elif(isinstance(item,(str,bytes,bytearray,int,float,bool,type(None)))):
+            pass
+        elif(isinstance(item,dict)):
+            to_visit.extend(item.keys())
+            to_visit.extend(item.values())
+        elif(isinstance(item,(list,tuple,set,frozenset))):
+            to_visit.extend(item)
+        elif(hasattr(item,'__dict__') and not isinstance(item,type)):
+            to_visit.append(vars(item))
+    return size
+
+def file_signature(file_path:Union[str,os.PathLike])->Tuple[int,int]:
+    """
+    Get (modification time [ns], size) of FILE_PATH.
+    """
+    stat=os.stat(file_path)
+    return (stat.st_mtime_ns,stat.st_size)
+
+class ReaderCache():
+    """
+    Memory-budgeted, least recently used cache of objects read from files.
+
+    Args:
+      budget: maximal estimated memory [bytes] used by the cached objects
+    """
+    def __init__(self,budget:int=int(DEFAULT_BUDGET_MB*2**20)):
+        self.budget=budget
+        # key --> (file signature, value, size)
+        self._entries:typing.OrderedDict[Tuple[Hashable,...],Tuple[Tuple[int,int],Any,int]]=OrderedDict()
+        self._lock=threading.RLock()
+        self.resident_bytes=0
+        self.hits=0
+        self.misses=0
+        self.evictions=0
+        self.invalidations=0
+        self._namespace_counts:Dict[str,Dict[str,int]]={}
+
+    def set_budget(self,budget:int)->None:
+        """
+        Change the memory budget [bytes]; entries exceeding the new budget are evicted.
+        """
+        with self._lock:
+            self.budget=budget
+            self._evict()
+
+    def _count(self,namespace:str,counter:str)->None:
+        counts=self._namespace_counts.setdefault(namespace,{"hits":0,"misses":0})
+        counts[counter]+=1
+
+    def get_or_load(self,
+                    namespace:str,
+                    file_path:Union[str,os.PathLike],
+                    extra:Tuple[Hashable,...],
+                    loader:Callable[[],Any],
+                    size:Optional[int]=None)->Any:
+        """
+        Get object read from FILE_PATH from the cache, or load it with LOADER and cache it.
+
+        Args:
+          namespace: name of the object kind (e.g. name of the function reading it)
+          file_path: file the object is read from
+          extra: additional (hashable) information identifying the object
+          loader: function (no arguments) reading the object
+          size: memory taken by the object [bytes], estimated if not given
+        """
+        key=(namespace,os.path.abspath(file_path))+tuple(extra)
+        signature=file_signature(file_path)
+        with self._lock:
+            entry=self._entries.get(key)
+            if(entry is not None):
+                if(entry[0]==signature):
+                    self.hits+=1
+                    self._count(namespace,"hits")
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                log.debug(f"File {file_path} changed on disk, dropping its cached {namespace}.")
+                self._remove(key)
+                self.invalidations+=1
+            self.misses+=1
+            self._count(namespace,"misses")
+        # loading happens outside of the lock, so other threads can use the cache meanwhile
+        value=loader()
+        self.put(namespace,file_path,extra,value,signature=signature,size=size)
+        return value
+
+    def put(self,
+            namespace:str,
+            file_path:Union[str,os.PathLike],
+            extra:Tuple[Hashable,...],
+            value:Any,
+            signature:Optional[Tuple[int,int]]=None,
+            size:Optional[int]=None)->None:
+        """
+        Store VALUE read from FILE_PATH (e.g. by another process) in the cache.
+        See :py:meth:`get_or_load` for the arguments.
+
+        Args:
+          signature: :py:func:`file_signature` of FILE_PATH taken before reading it;
+            the current one is used if not given
+        """
+        key=(namespace,os.path.abspath(file_path))+tuple(extra)
+        if(signature is None):
+            signature=file_signature(file_path)
+        if(size is None):
+            size=estimate_size(value)
+        if(size>self.budget):
+            log.debug(f"{namespace} of {file_path} ({size/2**20:.1f} MB) is larger than the reader cache budget, it is not cached.")
+            return
+        with self._lock:
+            if(key in self._entries):
+                self._remove(key)
+            self._entries[key]=(signature,value,size)
+            self.resident_bytes+=size
+            self._evict()
+
+    def __contains__(self,key:Tuple[Any,...])->bool:
+        """
+        Check whether (namespace, file_path, *extra) is cached (and up to date).
+        """
+        namespace,file_path,*extra=key
+        with self._lock:
+            entry=self._entries.get((namespace,os.path.abspath(file_path))+tuple(extra))
+        return entry is not None and entry[0]==file_signature(file_path)
+
+    def _remove(self,key:Tuple[Hashable,...])->None:
+        _,_,size=self._entries.pop(key)
+        self.resident_bytes-=size
+
+    def _evict(self)->None:
+        while(self.resident_bytes>self.budget and self._entries):
+            key=next(iter(self._entries))
+            log.debug(f"Evicting {key[0]} of {key[1]} from the reader cache.")
+            self._remove(key)
+            self.evictions+=1
+
+    def clear(self,namespace:Optional[str]=None)->None:
+        """
+        Remove all entries (of NAMESPACE if given) from the cache.
+        """
+        with self._lock:
+            for key in list(self._entries.keys()):
+                if(namespace is None or key[0]==namespace):
+                    self._remove(key)
+            if(namespace is None):
+                self._namespace_counts.clear()
+            else:
+                self._namespace_counts.pop(namespace,None)
+
+    def cache_info(self,namespace:str)->CacheInfo:
+        """
+        Get usage statistics of NAMESPACE.
+        """
+        with self._lock:
+            counts=self._namespace_counts.get(namespace,{"hits":0,"misses":0})
+            currsize=sum(1 for key in self._entries if key[0]==namespace)
+            return CacheInfo(counts["hits"],counts["misses"],None,currsize)
+
+    def __len__(self)->int:
+        return len(self._entries)
+
+    def stats(self)->Dict[str,int]:
+        """Get cache usage statistics."""
+        return {"hits":self.hits,
+                "misses":self.misses,
+                "evictions":self.evictions,
+                "invalidations":self.invalidations,
+                "entries":len(self),
+                "resident_bytes":self.resident_bytes,
+                "budget":self.budget}
+
+    def summary(self)->str:
+        """Human readable usage statistics."""
+        return f"Reader cache: {self.hits} hits, {self.misses} misses, {self.evictions} evictions, {self.invalidations} invalidations, {len(self)} entries using {self.resident_bytes/2**20:.1f} of {self.budget/2**20:.0f} MB."
+
+def _budget_from_environment()->int:
+    budget_mb=os.environ.get('HEPDATA_MAKER_READER_CACHE_BUDGET')
+    if(budget_mb):
+        try:
+            return int(float(budget_mb)*2**20)
+        except ValueError:
+            log.warning(f"Could not understand HEPDATA_MAKER_READER_CACHE_BUDGET={budget_mb} (megabytes expected), using default of {DEFAULT_BUDGET_MB} MB.")
+    return int(DEFAULT_BUDGET_MB*2**20)
+
+# Cache used by all the functions reading input files
+READER_CACHE=ReaderCache(_budget_from_environment())
+
+class CachedFunction(Protocol):
+    """Function decorated with :py:func:`cached`."""
+    cache_info:Callable[[],CacheInfo]
+    cache_clear:Callable[[],None]
+    cache_key:Callable[...,Tuple[Any,...]]
+    cache_namespace:str
+    def __call__(self,file_path:Union[str,os.PathLike],*args:Any,**kwargs:Any)->Any: ...
+
+def cached(function:Callable)->CachedFunction:
+    """
+    Decorator caching results of FUNCTION in :py:data:`READER_CACHE`.
+    The first argument of FUNCTION has to be the path of the file read, other arguments need to be hashable.
+    Like with functools.lru_cache, `cache_info` and `cache_clear` are available on the decorated function.
+    In addition, `cache_key(file_path,*args)` gives the key of the cache entry for the given arguments
+    (see :py:meth:`ReaderCache.__contains__` and :py:meth:`ReaderCache.put`).
+    """
+    namespace=function.__qualname__
+    def cache_key(file_path:Union[str,os.PathLike],*args:Any,**kwargs:Any)->Tuple[Any,...]:
+        return (namespace,file_path)+args+tuple(sorted(kwargs.items()))
+    @functools.wraps(function)
+    def wrapper(file_path:Union[str,os.PathLike],*args:Any,**kwargs:Any)->Any:
+        extra=args+tuple(sorted(kwargs.items()))
+        return READER_CACHE.get_or_load(namespace,file_path,extra,lambda: function(file_path,*args,**kwargs))
+    cached_function=cast(CachedFunction,wrapper)
+    cached_function.cache_info=lambda: READER_CACHE.cache_info(namespace)
+    cached_function.cache_clear=lambda: READER_CACHE.clear(namespace)
+    cached_function.cache_key=cache_key
+    cached_function.cache_namespace=namespace
+    return cached_function
@@ -0,0 +1,221 @@
+"""
+Pool of open ROOT files.
+
+All functions reading ROOT files (object listing, class look-up and data reading)
+take the files from one bounded pool, so each file is opened once
+and the handles are closed when evicted from the pool (or explicitly).
+
+.. note:: uproot and hepdata_lib.RootFileReader (PyROOT) cannot share a file handle.
+   The pool keeps both handles of a file in one entry and opens each of them only when needed.
+
+.. note:: PyROOT is not thread-safe: all uses of RootFileReader (opening, reading, closing)
+   need to hold :py:data:`PYROOT_LOCK`. Files are read by several threads
+   (see :py:func:`hepdata_maker.variable_loading.read_in_parallel`).
+"""
+from .logs import logging
+log = logging.getLogger(__name__)
+import uproot # type: ignore
+from hepdata_lib import RootFileReader # type: ignore
+from collections import OrderedDict
+from contextlib import contextmanager
+import os
+import threading
+import typing
+from typing import Any,Dict,Iterator,Optional,Tuple,Union
+from .reader_cache import file_signature
+
+# Lock serialising all PyROOT (hepdata_lib.RootFileReader) calls
+PYROOT_LOCK=threading.RLock()
+
+class RootFileHandle():
+    """
+    Entry of the RootFilePool: handles to a single ROOT file.
+    The handles are opened on first use.
+    """
+    def __init__(self,file_path:str,pool:'RootFilePool',key:Tuple[str,int,int]):
+        self.file_path=file_path
+        self.key=key # (absolute path, modification time [ns], size) of the file when the entry was created
+        self.refcount=0
+        self._pool=pool
+        self._uproot_file:Any=None
+        self._reader:Any=None
+        self._lock=threading.Lock() # guards opening/closing of the uproot file
+
+    @property
+    def uproot_file(self)->Any:
+        """File opened with uproot.open."""
+        with self._lock:
+            if(self._uproot_file is None):
+                log.debug(f"Opening ROOT file {self.file_path} with uproot.")
+                self._uproot_file=uproot.open(self.file_path)
+                self._pool.opens+=1
+            return self._uproot_file
+
+    @property
+    def reader(self)->Any:
+        """
+        hepdata_lib.RootFileReader of the file.
+        Calls to the reader need to hold :py:data:`PYROOT_LOCK`.
+        """
+        with PYROOT_LOCK:
+            if(self._reader is None):
+                log.debug(f"Opening ROOT file {self.file_path} with hepdata_lib.RootFileReader.")
+                self._reader=RootFileReader(self.file_path)
+                self._pool.opens+=1
+            return self._reader
+
+    @property
+    def is_open(self)->bool:
+        return self._uproot_file is not None or self._reader is not None
+
+    def close(self)->None:
+        """Close all handles of the file."""
+        with self._lock:
+            if(self._uproot_file is not None):
+                try:
+                    self._uproot_file.close()
+                except Exception as exc:
+                    log.debug(f"Closing uproot file {self.file_path} failed: {exc}")
+                self._uproot_file=None
+        with PYROOT_LOCK:
+            if(self._reader is not None):
+                try:
+                    self._reader.tfile.Close()
+                except Exception as exc:
+                    log.debug(f"Closing RootFileReader of {self.file_path} failed: {exc}")
+                self._reader=None
+
+class RootFilePool():
+    """
+    Bounded, reference-counted pool of open ROOT files.
+
+    Files in use (acquired and not yet released) are never evicted,
+    thus the pool can temporarily hold more than 'max_open_files' files.
+    Entries are keyed by the path, modification time and size of the file:
+    a file changed on disk gets a new entry, the old one is closed once it is not used.
+
+    Args:
+      max_open_files: number of files kept open
+    """
+    def __init__(self,max_open_files:int=16):
+        if(max_open_files<1):
+            raise ValueError(f"RootFilePool needs to be able to keep at least one file open (requested max_open_files={max_open_files}).")
+        self.max_open_files=max_open_files
+        self._entries:typing.OrderedDict[Tuple[str,int,int],RootFileHandle]=OrderedDict()
+        self._lock=threading.RLock()
+        self.opens=0
+        self.hits=0
+        self.misses=0
+        self.evictions=0
+
+    @staticmethod
+    def _key(file_path:Union[str,os.PathLike])->Tuple[str,int,int]:
+        return (os.path.abspath(file_path),)+file_signature(file_path)
+
+    def _is_stale(self,entry:RootFileHandle)->bool:
+        # the file changed (or disappeared) since the entry was created
+        try:
+            return self._key(entry.file_path)!=entry.key
+        except OSError:
+            return True
+
+    def _remove(self,entry:RootFileHandle)->None:
+        entry.close()
+        del self._entries[entry.key]
+
+    def acquire(self,file_path:Union[str,os.PathLike])->RootFileHandle:
+        """
+        Get the handle of FILE_PATH and mark it as used.
+        Each acquire needs to be followed by :py:meth:`release`.
+        """
+        key=self._key(file_path)
+        with self._lock:
+            entry=self._entries.get(key)
+            if(entry is None):
+                self.misses+=1
+                for old_entry in [old_entry for old_entry in self._entries.values() if old_entry.key[0]==key[0] and old_entry.refcount==0]:
+                    log.debug(f"ROOT file {file_path} changed on disk, closing its old handles.")
+                    self._remove(old_entry)
+                entry=RootFileHandle(str(file_path),self,key)
+                self._entries[key]=entry
+            else:
+                self.hits+=1
+                self._entries.move_to_end(key)
+            entry.refcount+=1
+            self._evict()
+            return entry
+
+    def release(self,file_path:Union[str,os.PathLike,RootFileHandle])->None:
+        """
+        Mark the handle of FILE_PATH (or the handle FILE_PATH itself) as not used (by one user).
+        """
+        with self._lock:
+            if(isinstance(file_path,RootFileHandle)):
+                entry:Optional[RootFileHandle]=file_path
+            else:
+                # the most recent entry of the file in use (the file may have changed since it was acquired)
+                path=os.path.abspath(file_path)
+                entry=next((entry for entry in reversed(self._entries.values()) if entry.key[0]==path and entry.refcount>0),None)
+            if(entry is None or entry.refcount==0 or self._entries.get(entry.key) is not entry):
+                log.warning(f"Releasing ROOT file {file_path} that was not acquired.")
+                return
+            entry.refcount-=1
+            if(entry.refcount==0 and self._is_stale(entry)):
+                self._remove(entry)
+            self._evict()
+
+    @contextmanager
+    def open(self,file_path:Union[str,os.PathLike])->Iterator[RootFileHandle]:
+        """
+        Context manager acquiring (and at exit releasing) FILE_PATH.
+        """
+        entry=self.acquire(file_path)
+        try:
+            yield entry
+        finally:
+            self.release(entry)
+
+    def _evict(self)->None:
+        # least recently used, not used at the moment files are closed first
+        for key in list(self._entries.keys()):
+            if(len(self._entries)<=self.max_open_files):
+                break
+            entry=self._entries[key]
+            if(entry.refcount==0):
+                log.debug(f"Evicting ROOT file {entry.file_path} from the pool.")
+                self._remove(entry)
+                self.evictions+=1
+
+    def close(self,file_path:Union[str,os.PathLike])->None:
+        """
+        Close FILE_PATH and remove it from the pool.
+        """
+        path=os.path.abspath(file_path)
+        with self._lock:
+            for entry in [entry for entry in self._entries.values() if entry.key[0]==path]:
+                if(entry.refcount>0):
+                    log.warning(f"Closing ROOT file {file_path} that is still in use ({entry.refcount} users).")
+                self._remove(entry)
+
+    def close_all(self)->None:
+        """
+        Close all files in the pool.
+        """
+        with self._lock:
+            for entry in list(self._entries.values()):
+                if(entry.key in self._entries):
+                    self.close(entry.file_path)
+
+    def __len__(self)->int:
+        return len(self._entries)
+
+    def stats(self)->Dict[str,int]:
+        """Get pool usage statistics."""
+        return {"opens":self.opens,
+                "hits":self.hits,
+                "misses":self.misses,
+                "evictions":self.evictions,
+                "open_files":len(self)}
+
+# Pool used by all the functions reading ROOT files
+ROOT_FILE_POOL=RootFilePool()
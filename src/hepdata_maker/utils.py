@@ -5,14 +5,25 @@ import pkg_resources # type: ignore
 from pathlib import Path
 from collections import OrderedDict
 from collections.abc import Mapping,Iterable
-from typing import Dict,Any,Optional,Union,List,Tuple
+from typing import Dict,Any,Optional,Union,List,Tuple,Set
+from types import CodeType
+import ast
+import builtins
+import functools
 import os
+import glob
+import re
 import validators    # type: ignore
+from .logs import logging
+log = logging.getLogger(__name__)
 
 SCHEMA_CACHE:Dict[str,Any]= {}
 SCHEMA_BASE = "schemas"
 SCHEMA_VERSION = '0.0.0'
 
+# Names known to all steering file expressions (see Submission.EvaluationNamespace)
+EVALUATION_NAMES=('np','re','ufs','nan')
+
 def merge_dictionaries(*args: Dict[Any,Any]) -> Dict[Any,Any]:
     """
     This is easily done in python 3.9 with dict1|dict2, however for 3.8- we need this.
@@ -83,6 +94,42 @@ def resolve_file_name(file_name:Union[str,os.PathLike],
     else:
         return os.path.join(root_dir,file_name)
 
+def natural_sort_key(text:str)->List[Union[str,int]]:
+    """
+    Key for sorting strings with numbers compared by their value,
+    e.g. 'mass_200' comes before 'mass_1000'.
+    """
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)',text)]
+
+def expand_file_name(file_name:str)->List[str]:
+    """
+    Expand glob pattern (e.g. 'limits/mass_*.json') in FILE_NAME into the list of matching files.
+    The files are sorted in natural order (see :py:func:`natural_sort_key`).
+    For ROOT files only the file part (before ':') is expanded, the object path is kept for all files.
+
+    FILE_NAME is returned unchanged (as a single element list) if it is not a pattern
+    or if nothing matches it, so that a missing file is reported when it is read.
+    """
+    file_part,separator,object_part=str(file_name).partition(":")
+    if(not glob.has_magic(file_part)):
+        return [file_name]
+    matches=sorted(glob.glob(file_part),key=natural_sort_key)
+    if(len(matches)==0):
+        return [file_name]
+    return [match+separator+object_part for match in matches]
+
+@functools.lru_cache(maxsize=None)
+def compile_expression(source:str)->CodeType:
+    """
+    Compile SOURCE (python expression from the steering file, e.g. a transformation) for eval.
+    Code objects are cached by the source text, thus each expression is parsed only once;
+    ``compile_expression.cache_info()`` tells how often a compiled expression was reused.
+
+    Args:
+      source: python expression
+    """
+    return compile(source,'<expression>','eval')
+
 class objdict(OrderedDict):
     """
     Ordered dictionary with keys accesible as object attributes.
@@ -109,28 +156,136 @@ class objdict(OrderedDict):
     def to_dict(self):
         return dict(self)
     
+def load_steering_file(config_file_path:Union[str,os.PathLike])->Dict[str,Any]:
+    """
+    Read steering file (with jsonrefs resolved), without further checks.
+    """
+    with open(config_file_path, 'r') as stream:
+        return jsonref.load(stream,base_uri="file://"+os.path.abspath(os.path.dirname(config_file_path))+"/",object_pairs_hook=OrderedDict)
+
 def get_available_tables(config_file_path:Union[str,os.PathLike]):
     """
     Get names and 'should_be_processed' fields for all tables
     withing a steering_file
     """
     result=[]
-    with open(config_file_path, 'r') as stream:
-        config_loaded = jsonref.load(stream,base_uri="file://"+os.path.abspath(os.path.dirname(config_file_path))+"/",object_pairs_hook=OrderedDict)
+    config_loaded=load_steering_file(config_file_path)
     for table_info in config_loaded['tables']:
         result.append((table_info['name'],table_info.get('should_be_processed',True)))
     return result
 
+def get_expression_names(expression:str)->Set[str]:
+    """
+    Get names (free variables) used by python EXPRESSION.
+    Names bound inside the expression (by comprehensions and lambdas) are not included.
+
+    Args:
+      expression: python expression, e.g. a transformation
+    """
+    tree=ast.parse(expression.strip(),mode='eval')
+    used:Set[str]=set()
+    bound:Set[str]=set()
+    for node in ast.walk(tree):
+        if(isinstance(node,ast.Name)):
+            (used if isinstance(node.ctx,ast.Load) else bound).add(node.id)
+        elif(isinstance(node,ast.arg)):
+            bound.add(node.arg)
+    return used-bound
+
+def get_table_dependencies(tables_info:List[Dict[str,Any]])->Dict[str,List[str]]:
+    """
+    Find tables used by transformations and matching conditions of each table
+    (e.g. 'table1.var1*2' in a variable of 'table2' makes 'table2' depend on 'table1').
+    Names are extracted statically, no data is read.
+    Unknown names (neither a table, a variable of the same table, an uncertainty of
+    the same variable nor a known module/function) are reported with a warning
+    and otherwise ignored: they could be provided by the caller (e.g. as local variables).
+
+    Args:
+      tables_info: list of table steering information (e.g. config['tables'])
+
+    Returns:
+      dictionary: table name --> names of tables it uses (directly)
+    """
+    table_names=[table_info.get('name','') for table_info in tables_info]
+    dependencies:Dict[str,List[str]]={}
+    problems=[]
+    for table_info in tables_info:
+        table_name=table_info.get('name','')
+        variables=table_info.get('variables',[])
+        variable_names={variable_info.get('name','') for variable_info in variables}
+        table_dependencies=[]
+        for variable_info in variables:
+            errors=variable_info.get('errors',[])
+            # names known inside the variable (and its uncertainties), tables are searched last
+            local_names=variable_names|{error_info.get('name','') for error_info in errors}
+            expressions=[]
+            for steering in [variable_info]+list(errors):
+                expressions+=steering.get('transformations',[])
+                for info_name in ('regions','grids','signal_names'):
+                    for specification in steering.get(info_name,[]):
+                        expressions+=[cut for cut in specification.get('matching',[]) if isinstance(cut,str)]
+            for expression in expressions:
+                try:
+                    names=get_expression_names(expression)
+                except SyntaxError:
+                    continue # reported by Submission.check_steering_expressions
+                for name in sorted(names):
+                    if(name in local_names or name in EVALUATION_NAMES or hasattr(builtins,name)):
+                        continue
+                    if(name in table_names):
+                        if(name!=table_name and name not in table_dependencies):
+                            table_dependencies.append(name)
+                    else:
+                        problems.append(f"  table '{table_name}', variable '{variable_info.get('name','')}': unknown name '{name}' in '{expression}'")
+        dependencies[table_name]=table_dependencies
+    if(problems):
+        log.warning("Steering file expressions use unknown names:\n"+"\n".join(problems))
+    return dependencies
+
+def resolve_table_dependencies(dependencies:Dict[str,List[str]],
+                               table_names:List[str])->List[str]:
+    """
+    Get TABLE_NAMES together with all the tables they (transitively) depend on.
+    Dependencies come before the tables using them.
+
+    Args:
+      dependencies: table dependency graph (see :py:func:`get_table_dependencies`)
+      table_names: names of the requested tables
+
+    Raises:
+      ValueError: if tables depend on each other (cycle in the dependency graph)
+    """
+    result:List[str]=[]
+    visiting:List[str]=[] # path of the depth-first search
+    def visit(name:str)->None:
+        if(name in result):
+            return
+        if(name in visiting):
+            cycle=visiting[visiting.index(name):]+[name]
+            raise ValueError(f"Tables depend on each other: {' -> '.join(cycle)}")
+        visiting.append(name)
+        for dependency in dependencies.get(name,[]):
+            visit(dependency)
+        visiting.pop()
+        result.append(name)
+    for name in table_names:
+        visit(name)
+    return result
+
 def get_requested_table_list(steering_file:str,
                              load_all_tables:bool,
                              indices:List[int],
-                             names:List[str])->List[Tuple[str,bool]]:
+                             names:List[str],
+                             include_dependencies:bool=True)->List[Tuple[str,bool]]:
     """
-    Get names of tables inside a steering_file with matching position/names
+    Get names of tables inside a steering_file with matching position/names.
+    With INCLUDE_DEPENDENCIES, tables used by the transformations of the requested tables
+    (see :py:func:`get_table_dependencies`) are added.
     """
     available_tables=get_available_tables(steering_file)
     if(load_all_tables):
-        return available_tables
+        return available_tables # all tables are loaded anyway, no need to look for dependencies
     if(len(indices)==0 and len(names)==0):
         raise TypeError(f"You need to provide the name/index of the table you want to print. Choose from: (name,index)={[(tuple[0],index) for index,tuple in enumerate(available_tables)]}")
     if(len(indices)>0 and (max(indices)>len(available_tables) or min(indices)<0)):
@@ -152,4 +307,13 @@ def get_requested_table_list(steering_file:str,
                 if(av_name==name and (not should_be_processed)):
                     raise ValueError(f"You requested table with name: {name} however flag 'should_be_processed' is set to False.")
             requested_tables.append((name,True))
+    if(include_dependencies):
+        dependencies=get_table_dependencies(load_steering_file(steering_file)['tables'])
+        requested_names=[name for name,_ in requested_tables]
+        for name in resolve_table_dependencies(dependencies,requested_names):
+            if(name in requested_names):
+                continue
+            if(not dict(available_tables)[name]):
+                raise ValueError(f"Requested tables depend on table {name} however its flag 'should_be_processed' is set to False.")
+            requested_tables.append((name,True))
     return requested_tables
@@ -1,10 +1,13 @@
 from .logs import logging
 log = logging.getLogger(__name__)
 from . import useful_functions as ufs
-from .utils import merge_dictionaries
+from .utils import merge_dictionaries, compile_expression
+from . import disk_cache
+from .reader_cache import CacheInfo, cached, file_signature, READER_CACHE
 import jq     # type: ignore
 import uproot # type: ignore
 from hepdata_lib import RootFileReader # type: ignore
+from .root_file_pool import ROOT_FILE_POOL,PYROOT_LOCK
 import csv
 import yaml   # type: ignore
 import json
@@ -13,13 +16,26 @@ import numpy as np
 import regex as re # type: ignore
 import scipy.stats,scipy.special # type: ignore
 from collections import OrderedDict
-from collections.abc import Iterable
-from typing import Union,Dict,List,Any,Literal,Callable,TextIO
+from collections.abc import Iterable,Mapping
+from typing import Union,Dict,List,Any,Literal,Callable,TextIO,Optional,Tuple
 import os
 import functools
 import io
-
-def check_if_file_exists_and_readable(file_path:str)->bool:
+import itertools
+import concurrent.futures
+import struct
+import tracemalloc
+import zipfile
+try:
+    import ijson # type: ignore
+except ImportError: # optional, needed only for streaming of json files
+    ijson=None
+
+# Number of bytes read from the beginning of a file when sniffing its type
+SNIFF_BYTES=1024
+
+def check_if_file_exists_and_readable(file_path:str,
+                                      sniff:bool=False)->bool:
     """
     Verify that FILE_PATH is readable file.
     Following data formats are allowed:
@@ -29,46 +45,81 @@ def check_if_file_exists_and_readable(file_path:str)->bool:
       - root
       - csv
       - tex
+      - npy
+      - npz
       - txt --> used as table title!
+
+    Args:
+      file_path: path to the file
+      sniff: if True, only the beginning of the file is checked (see :py:func:`sniff_file`),
+        otherwise the file is fully parsed. The parsed content is kept in the reader cache,
+        thus a later read of the file does not parse it again.
     """
     # TODO: Adding file_type argument for ambiguous cases
     if(not os.path.exists(file_path)):
         return False
     file_type=file_path.split(".")[-1].lower()
-    with open(file_path, 'r') as stream:
-        if(file_type=='json'):
-            try:
-                json.load(stream,object_pairs_hook=OrderedDict)
-            except ValueError as e:
-                return False
-        elif(file_type=='yaml'):
-            try:
-                yaml.safe_load(stream)
-            except ValueError as e:
-                return False
-        elif(file_type=="csv"):
-            try:
-                csv.DictReader(stream)
-            except ValueError as e:
-                return False
-        elif(file_type=='root'):
-            try:
-                uproot.open(file_path) # yes, it is file_path here
-            except ValueError as exc:
-                return False
-        elif(file_type=='txt'):
-            return True # formatting of text file is not checked
-        elif(file_type=='tex'):
-            try:
-                TexSoup(stream)
-            except ValueError as exc:
-                return False
+    if(file_type=='txt'):
+        return True # formatting of text file is not checked
+    if(file_type not in ['json','yaml','csv','root','tex','npy','npz']):
+        # this type is not supported
+        return False
+    if(sniff):
+        return sniff_file(file_path,file_type)
+    try:
+        if(file_type=='root'):
+            with ROOT_FILE_POOL.open(file_path) as root_file: # yes, it is file_path here
+                root_file.uproot_file
+        elif(file_type=='npz'):
+            get_npz_keys(file_path) # only the zip directory is read, not the arrays
         else:
-            # this type is not supported
-            return False
+            # for npy only the header is read, the data is memory-mapped
+            open_data_file(file_path,file_type) # type: ignore
+    except (ValueError,OSError,yaml.YAMLError,zipfile.BadZipFile) as exc:
+        log.debug(f"File {file_path} could not be read as {file_type}: {exc}")
+        return False
+
+    # If we get that far we were able to read the file fine!
+    return True
+
+def _is_text(head:bytes)->bool:
+    if(b'\x00' in head):
+        return False
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as exc:
+        # multi-byte character cut at the end of the sniffed block is fine
+        return exc.start>=len(head)-3 and exc.reason=='unexpected end of data'
+    return True
+
+def sniff_file(file_path:str,
+               file_type:str)->bool:
+    """
+    Check cheaply (using only the first :py:data:`SNIFF_BYTES` bytes) whether
+    FILE_PATH looks like a file of FILE_TYPE: magic bytes for binary formats (root, npy, npz),
+    text content for the others (json needs to start with an object or an array).
+    The file is not parsed, thus a positive answer does not guarantee that it can be read.
 
-        # If we get that far we were able to read the file fine!
+    Args:
+      file_path: path to the file
+      file_type: expected type of the file
+    """
+    with open(file_path,'rb') as stream:
+        head=stream.read(SNIFF_BYTES)
+    if(file_type=='root'):
+        return head.startswith(b'root')
+    elif(file_type=='npy'):
+        return head.startswith(b'\x93NUMPY')
+    elif(file_type=='npz'):
+        return head.startswith(b'PK\x03\x04') or head.startswith(b'PK\x05\x06') # (empty) zip archive
+    elif(file_type in ['json','yaml','csv','tex','txt']):
+        if(not _is_text(head)):
+            return False
+        if(file_type=='json'):
+            content=head.decode('utf-8',errors='ignore').lstrip('\ufeff \t\r\n')
+            return content.startswith('{') or content.startswith('[')
         return True
+    return False
 
 #
 ##
@@ -76,13 +127,20 @@ def check_if_file_exists_and_readable(file_path:str)->bool:
 ## Since Python 3.7 it is more or less given for dict, however not quaranteed
 ## Therefore we need a bit of extra code to be on the safe side for yaml-loading
 ## code below adopted from Answer #1 in https://www.py4u.net/discuss/12785
-def yaml_ordered_safe_load(stream:TextIO,
-                           object_pairs_hook:Callable=OrderedDict)->OrderedDict:
+## The loaders are built on libyaml (yaml.CSafeLoader) when available as it is
+## an order of magnitude faster than the pure-python yaml.SafeLoader.
+@functools.lru_cache(maxsize=None)
+def get_ordered_safe_loader(object_pairs_hook:Callable=OrderedDict)->type:
     """
-    Load single yaml document safely with loading order ensured to be the same all the times.
-    Adopted from Answer #1 in https://www.py4u.net/discuss/12785
+    Get (and cache) yaml loader class that keeps the order of the mappings.
+    It is based on libyaml (yaml.CSafeLoader) if available and on
+    the pure-python yaml.SafeLoader otherwise.
+
+    Args:
+      object_pairs_hook: mapping type constructed from (key, value) pairs
     """
-    class OrderedLoader(yaml.SafeLoader):
+    base_loader=getattr(yaml,'CSafeLoader',yaml.SafeLoader)
+    class OrderedLoader(base_loader): # type: ignore
         pass
     def construct_mapping(loader, node):
         loader.flatten_mapping(node)
@@ -90,7 +148,15 @@ def yaml_ordered_safe_load(stream:TextIO,
     OrderedLoader.add_constructor(
         yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG,
         construct_mapping)
-    return yaml.load(stream, OrderedLoader)
+    return OrderedLoader
+
+def yaml_ordered_safe_load(stream:TextIO,
+                           object_pairs_hook:Callable=OrderedDict)->OrderedDict:
+    """
+    Load single yaml document safely with loading order ensured to be the same all the times.
+    Adopted from Answer #1 in https://www.py4u.net/discuss/12785
+    """
+    return yaml.load(stream, get_ordered_safe_loader(object_pairs_hook))
 
 def yaml_ordered_safe_load_all(stream:TextIO,
                                object_pairs_hook:Callable=OrderedDict)->OrderedDict:
@@ -98,26 +164,50 @@ def yaml_ordered_safe_load_all(stream:TextIO,
     Load multiple yaml documents safely with loading order ensured to be the same all the times.
     Adopted from Answer #1 in https://www.py4u.net/discuss/12785
     """
-    class OrderedLoader(yaml.SafeLoader):
-        pass
-    def construct_mapping(loader, node):
-        loader.flatten_mapping(node)
-        return object_pairs_hook(loader.construct_pairs(node))
-    OrderedLoader.add_constructor(
-        yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG,
-        construct_mapping)
-    return yaml.load_all(stream, OrderedLoader)
+    return yaml.load_all(stream, get_ordered_safe_loader(object_pairs_hook))
 ##
 #
 
 
-@functools.lru_cache(maxsize=16) 
 def open_data_file(file_path:Union[str,os.PathLike],
-                   file_type:Literal['yaml', 'json', 'csv', 'root','tex']) -> Any:
+                   file_type:Literal['yaml', 'json', 'csv', 'root','tex','npy','npz']) -> Any:
     """
     Opens and caches input file data.
     Please mind that the output has different type
     depending on the file_type of the input file.
+
+    Parsed files are kept in the memory-budgeted reader cache
+    (see :py:mod:`hepdata_maker.reader_cache`) and re-read when they change on disk.
+
+    For ROOT files a new hepdata_lib.RootFileReader is returned (not cached), the caller owns it.
+    Prefer the pool of open ROOT files, holding the file while its reader is used:
+    ``with ROOT_FILE_POOL.open(file_path) as root_file: root_file.reader...``
+    (see :py:mod:`hepdata_maker.root_file_pool`).
+
+    If the disk cache is enabled (see :py:func:`hepdata_maker.disk_cache.enable_disk_cache`)
+    parsed content of yaml, json and csv files is also stored there and reused between runs.
+
+    npy files are returned as read-only memory maps, npz files as a read-only mapping
+    of their array names to arrays, loaded on access (see :py:func:`open_npz_member`).
+    """
+    if(file_type=='root'):
+        with PYROOT_LOCK:
+            return parse_data_file(file_path,file_type)
+    return _open_data_file_cached(file_path,file_type)
+
+@cached
+def _open_data_file_cached(file_path:Union[str,os.PathLike],
+                           file_type:Literal['yaml', 'json', 'csv', 'tex','npy','npz']) -> Any:
+    cache=disk_cache.get_disk_cache()
+    if(cache is not None and file_type in disk_cache.CACHEABLE_FILE_TYPES):
+        return cache.get_or_load(file_path,lambda: parse_data_file(file_path,file_type),'open_data_file',file_type)
+    return parse_data_file(file_path,file_type)
+
+def parse_data_file(file_path:Union[str,os.PathLike],
+                    file_type:Literal['yaml', 'json', 'csv', 'root','tex','npy','npz']) -> Any:
+    """
+    Opens and parses input file data (without any caching).
+    See :py:func:`open_data_file` for the cached version.
     """
     log.debug(f"Opening uncached file {file_path}, type={file_type}.")
     data_loaded:Any=None
@@ -135,6 +225,10 @@ def open_data_file(file_path:Union[str,os.PathLike],
             data_loaded=RootFileReader(file_path)
         elif(file_type=='tex'):
             data_loaded = TexSoup(open(file_path))
+        elif(file_type=='npy'):
+            data_loaded = np.load(file_path,mmap_mode='r',allow_pickle=False)
+        elif(file_type=='npz'):
+            data_loaded = NpzArrays(file_path)
         else:
             raise ValueError(f"Unrecognised argument filetype={file_type}")
         return data_loaded
@@ -143,44 +237,167 @@ def open_data_file(file_path:Union[str,os.PathLike],
         raise err
         
         
+def _csv_column_to_array(values:List[Any])->np.ndarray:
+    """
+    Convert list of csv entries into numpy array.
+    Columns get numeric (integer or float) dtype only if all their entries are numbers
+    written the way numpy writes them back (e.g. '100', '1.5'), i.e. no information is lost.
+    Other columns (e.g. '01', '1e3', '1.50') stay text, use 'data_type' to convert them.
+    """
+    column=np.array(values)
+    if(column.dtype.kind!='U'):
+        # e.g. missing entries (None) present
+        return column
+    for numeric_type in (np.int64,np.float64):
+        try:
+            numeric=column.astype(numeric_type)
+        except (ValueError,OverflowError):
+            continue
+        if(np.array_equal(numeric.astype(str),column)):
+            return numeric
+    return column
+
+@cached
+def open_csv_columns(file_path:Union[str,os.PathLike],
+                     delimiter:str=',') -> Dict[str,np.ndarray]:
+    """
+    Parse (and cache) csv file into columns.
+    The file is tokenised only once, the first row gives the column names.
+    Columns with all entries being numbers get numeric dtype if
+    they can be converted without loss (see :py:func:`_csv_column_to_array`),
+    other are arrays of strings.
+
+    Args:
+      file_path: path to the csv file to read
+      delimiter: what delimiter is used in the csv file -- default ','
+
+    Returns:
+      Ordered dictionary of column name --> 1-D numpy array
+    """
+    log.debug(f"Parsing columns of csv file {file_path} (delimiter '{delimiter}')")
+    with io.StringIO(open_data_file(file_path,"csv")) as csv_file: # type: ignore
+        csv_reader=csv.reader(csv_file,delimiter=delimiter)
+        fieldnames=next(csv_reader,None)
+        if(fieldnames is None):
+            return OrderedDict()
+        n_fields=len(fieldnames)
+        # same as csv.DictReader: skip empty rows, missing entries are None
+        rows=[row+[None]*(n_fields-len(row)) if len(row)<n_fields else row[:n_fields] for row in csv_reader if row!=[]]
+    columns=list(zip(*rows)) if len(rows)>0 else [()]*n_fields
+    return OrderedDict((fieldname,_csv_column_to_array(list(column))) for fieldname,column in zip(fieldnames,columns))
+
+# Cells treated as missing values when text is converted to floats (they become NaN)
+MISSING_VALUE_STRINGS=('','-')
+
+def convert_to_data_type(values:np.ndarray,
+                         data_type:Optional[str])->np.ndarray:
+    """
+    Convert VALUES to numeric DATA_TYPE (e.g. 'float', 'int').
+    Text is converted in a single vectorised step, empty and '-' cells
+    (see :py:data:`MISSING_VALUE_STRINGS`) become NaN for float data types.
+    Values already of DATA_TYPE, as well as non-numeric data types (e.g. 'str'), are returned unchanged.
+
+    Args:
+      values: array to be converted
+      data_type: numpy data type (name) of the result
+    """
+    if(not data_type):
+        return values
+    dtype=np.dtype(data_type)
+    if(dtype.kind not in 'iufc' or values.dtype==dtype):
+        return values
+    if(values.dtype==object and all(isinstance(entry,str) for entry in values.flat)):
+        values=values.astype(str) # e.g. cells of tex tables
+    if(values.dtype.kind in 'US'):
+        text=np.char.strip(values) if values.size>0 else values
+        missing=np.isin(text,MISSING_VALUE_STRINGS if values.dtype.kind=='U' else [entry.encode() for entry in MISSING_VALUE_STRINGS])
+        if(missing.any()):
+            if(dtype.kind not in 'fc'):
+                raise ValueError(f"Empty (or '-') entries cannot be represented with data_type '{data_type}'. Use float data_type to have them read as NaN.")
+            text=np.where(missing,'nan',text)
+        return text.astype(dtype)
+    return values.astype(dtype)
+
 def get_array_from_csv(file_path:Union[str,os.PathLike],
                        decode:str,
-                       delimiter:str=',') -> np.ndarray:
+                       delimiter:str=',',
+                       data_type:Optional[str]=None) -> np.ndarray:
     """
     Read specific column of a csv file given.
+    Columns with all entries being numbers (written without loss of information, e.g. no leading zeros)
+    are returned with numeric dtype, DATA_TYPE converts other columns.
 
     Args:
       file_path: path to the csv file to read
       decod: name of the column to use
       delimiter: what delimiter is used in the csv file -- default ','
+      data_type: optional numeric data type of the result (see :py:func:`convert_to_data_type`)
     """
     log.debug("--------- csv file read -------------")
     log.debug(f"Reading variable information from csv file {file_path}")
     log.debug(f"decode used: '{decode}'")
     log.debug(f"delimiter used: '{delimiter}'")
 
-    with io.StringIO(open_data_file(file_path,"csv")) as csv_file: # type: ignore
-        csv_reader = csv.DictReader(csv_file,delimiter=delimiter)
-        data=[]
-        if(not decode):
-            messages=[f"""You need to specify variable 'decode' which contains the column name you want from your csv file."""]
-            messages.append(f"Available field names: {csv_reader.fieldnames}")
-            raise TypeError("\n".join(messages))
-        if(csv_reader.fieldnames is None or decode not in csv_reader.fieldnames):
-            messages=[f"""Key {decode} not found in the csv table. Check the csv file and 'decode' variable."""]
-            messages.append(f"Available field names: {csv_reader.fieldnames}")
-            raise TypeError("\n".join(messages))
-            
-        for row in csv_reader:
-            data.append(row[decode])
-        return np.array(data)
-
-def decode_json_array(json_array:Union[Dict[str,Any],List[Any]],decode:str)->np.ndarray:
+    columns=open_csv_columns(file_path,delimiter) # type: ignore
+    fieldnames=list(columns.keys())
+    if(not decode):
+        messages=[f"""You need to specify variable 'decode' which contains the column name you want from your csv file."""]
+        messages.append(f"Available field names: {fieldnames}")
+        raise TypeError("\n".join(messages))
+    if(decode not in columns):
+        messages=[f"""Key {decode} not found in the csv table. Check the csv file and 'decode' variable."""]
+        messages.append(f"Available field names: {fieldnames}")
+        raise TypeError("\n".join(messages))
+    column=columns[decode]
+    values=convert_to_data_type(column,data_type)
+    # cached column must not be modified by the user
+    return values.copy() if values is column else values
+
+@functools.lru_cache(maxsize=1024)
+def compile_jq_program(decode:str)->Any:
+    """
+    Compile (and cache) jq program given by DECODE.
+    Single quotes are replaced with double quotes (see :py:func:`decode_json_array`).
+
+    Args:
+      decode: jq command used for decoding.
+    """
+    log.debug(f"Compiling jq program '{decode}'")
+    return jq.compile(decode.replace("'",'"'))
+
+def open_jq_input(file_path:Union[str,os.PathLike],
+                  file_type:Literal['yaml', 'json']) -> Any:
+    """
+    Get parsed content of a yaml/json file to be decoded with jq.
+    The file is parsed once: the content is taken from :py:func:`open_data_file`,
+    thus it is kept in the reader cache (and in the disk cache, if enabled).
+    Several decodes of the same file can be run in one go with :py:func:`decode_json_array_batch`.
+
+    Args:
+      file_path: path to the file
+      file_type: type of the file ('yaml' or 'json')
+    """
+    if(file_type not in ['yaml','json']):
+        raise ValueError(f"Unrecognised argument filetype={file_type}")
+    return open_data_file(file_path,file_type)
+
+def get_jq_cache_info()->Dict[str,Dict[str,int]]:
+    """
+    Get hits and misses of the jq program cache and of the cache of parsed input files.
+    """
+    result={}
+    # both caches report the same fields as functools.lru_cache
+    for cache_name,info in [("compile",CacheInfo(*compile_jq_program.cache_info())),("input",_open_data_file_cached.cache_info())]:
+        result[cache_name]={"hits":info.hits,"misses":info.misses,"size":info.currsize}
+    return result
+
+def decode_json_array(json_array:Union[Dict[str,Any],List[Any]],
+                      decode:str)->np.ndarray:
     """
     Read information from json object using jq decoding.
 
     Args:
-      json_array: json object (dict, or list),
+      json_array: json object (dict, or list), e.g. from :py:func:`open_jq_input`
       decod: jq command used for decoding.
     """
     log.debug(f"inside decode_json_array")
@@ -195,9 +412,34 @@ def decode_json_array(json_array:Union[Dict[str,Any],List[Any]],decode:str)->np.
     #			    "name":"examples/stop0L/rawFiles/hepdata_ACCEFF/AccEff.json",
     #                       "decode":".['SRATT']|keys_unsorted[] | split('_')[1]"
     #                   }
-    # in steering files. The single quotes in decode are replaced with double quotes below. 
-    jq_output=jq.all(decode.replace("'",'"'),json_array)
+    # in steering files. The single quotes in decode are replaced with double quotes (in compile_jq_program). 
+    program=compile_jq_program(decode)
+    jq_output=program.input(value=json_array).all()
+
+    return _jq_output_to_array(jq_output)
+
+def decode_json_array_batch(json_array:Union[Dict[str,Any],List[Any]],
+                            decodes:List[str])->List[np.ndarray]:
+    """
+    Read information from json object using several jq decodings at once.
+    All decodes are combined into a single jq program, thus the input is parsed by jq only once.
+    The result is the same as calling :py:func:`decode_json_array` for each of the decodes.
 
+    Args:
+      json_array: json object (dict, or list), e.g. from :py:func:`open_jq_input`
+      decodes: list of jq commands used for decoding.
+    """
+    if(len(decodes)==0):
+        return []
+    if(not all(decodes)):
+        raise TypeError("All decodes need to be non-empty when decoding json in a batch.")
+    # jq.all('[d]') == [jq.all('d')], so each decode's output is collected into its own array
+    batch_decode="["+",".join([f"[{decode}]" for decode in decodes])+"]"
+    program=compile_jq_program(batch_decode)
+    jq_output=program.input(value=json_array).first()
+    return [_jq_output_to_array(single_output) for single_output in jq_output]
+
+def _jq_output_to_array(jq_output:List[Any])->np.ndarray:
     ## pythonic jq does not have always same behaviour as bash-jq.
     ## One problem is that if jq command returns a (single-) table,
     ##   jq.all we use will give us [table] (so table of tables), e.g `jq 'keys' {"1":1,"2":2}` in bash returns 1,2,
@@ -224,10 +466,158 @@ def get_array_from_json(file_path:Union[str,os.PathLike],
     log.debug(f"Reading variable information from json file {file_path}")
     log.debug(f"decode used: '{decode}'")
 
-    data_loaded=open_data_file(file_path,"json")# type: ignore
-    
+    if(use_json_streaming(file_path)):
+        streamed_values=stream_array_from_json(file_path,decode)
+        if(streamed_values is not None):
+            return streamed_values
+
+    data_loaded=open_jq_input(file_path,"json")# type: ignore
+
     return decode_json_array(data_loaded,decode)
 
+# Minimal size [bytes] of json files read in the streaming mode (None: streaming disabled)
+_JSON_STREAMING_MIN_SIZE:Optional[int]=None
+
+# decodes of the form '.field.field[].field' (any number of fields before and after a single '[]')
+_SIMPLE_JSON_PATH=re.compile(r"^\s*((?:\.[A-Za-z_][A-Za-z0-9_]*)*)\.?\[\]((?:\.[A-Za-z_][A-Za-z0-9_]*)*)\s*$")
+
+def enable_json_streaming(min_file_size:int=0)->None:
+    """
+    Read json files of at least MIN_FILE_SIZE bytes in the streaming mode
+    (see :py:func:`stream_array_from_json`). Requires the `ijson` package.
+
+    Args:
+      min_file_size: smaller files are read (faster) as a whole
+    """
+    global _JSON_STREAMING_MIN_SIZE
+    if(ijson is None):
+        raise ImportError("Streaming of json files requires 'ijson' package. Install it with `pip install hepdata_maker[streaming]`.")
+    _JSON_STREAMING_MIN_SIZE=min_file_size
+    log.debug(f"Streaming enabled for json files of at least {min_file_size} bytes.")
+
+def disable_json_streaming()->None:
+    """
+    Read all json files as a whole.
+    """
+    global _JSON_STREAMING_MIN_SIZE
+    _JSON_STREAMING_MIN_SIZE=None
+
+def use_json_streaming(file_path:Union[str,os.PathLike])->bool:
+    """
+    Check whether FILE_PATH is to be read in the streaming mode.
+    """
+    if(_JSON_STREAMING_MIN_SIZE is None):
+        return False
+    return os.path.getsize(file_path)>=_JSON_STREAMING_MIN_SIZE
+
+def parse_simple_json_path(decode:str)->Optional[Tuple[List[str],List[str]]]:
+    """
+    Split jq DECODE of the form '.a.b[].c.d' into fields before ('a','b') and after ('c','d') the array iteration.
+
+    Returns:
+      None if DECODE is not of that form.
+    """
+    match=_SIMPLE_JSON_PATH.match(decode)
+    if(match is None):
+        return None
+    return ([field for field in match.group(1).split('.') if field],
+            [field for field in match.group(2).split('.') if field])
+
+def stream_array_from_json(file_path:Union[str,os.PathLike],
+                           decode:str)->Optional[np.ndarray]:
+    """
+    Read information from json file with an incremental parser (ijson),
+    without loading the whole file into memory. Only the elements of the selected array
+    are created (one at a time) and only the requested values are kept.
+
+    Only simple jq paths are supported: fields, a single array iteration and fields of its elements,
+    e.g. '.[].xsec' or '.signal.points[].mass'. Missing fields give None (null), as in jq.
+
+    Args:
+      file_path: path to the json file to read
+      decode: jq command used for decoding
+
+    Returns:
+      None if the decode (or the file structure) is not supported by the streaming mode;
+      the file needs then to be read as a whole (see :py:func:`get_array_from_json`).
+    """
+    if(ijson is None):
+        return None
+    json_path=parse_simple_json_path(decode)
+    if(json_path is None):
+        log.debug(f"Decode '{decode}' is not a simple path, it cannot be streamed.")
+        return None
+    array_fields,element_fields=json_path
+    array_prefix=".".join(array_fields)
+    log.debug(f"Streaming values of '{decode}' from json file {file_path}.")
+
+    with open(file_path,'rb') as stream:
+        events=ijson.parse(stream,use_float=True)
+        # find the beginning of the iterated object, '.[]' iterates over values of dictionaries as well, which is not supported here
+        for prefix,event,value in events:
+            if(prefix==array_prefix):
+                break
+        else:
+            log.debug(f"Path '{array_prefix}' not found in {file_path}, it cannot be streamed.")
+            return None
+        if(event!='start_array'):
+            log.debug(f"Path '{array_prefix}' in {file_path} is not an array ({event}), it cannot be streamed.")
+            return None
+
+        item_prefix=(array_prefix+".item").lstrip(".")
+        values=[]
+        for element in ijson.items(itertools.chain([(prefix,event,value)],events),item_prefix):
+            for field in element_fields:
+                if(element is None):
+                    break
+                if(not isinstance(element,dict)):
+                    log.debug(f"Cannot take field '{field}' of {type(element).__name__} in {file_path}, it cannot be streamed.")
+                    return None
+                element=element.get(field)
+            # jq does not distinguish 2.0 from 2
+            if(isinstance(element,float) and element.is_integer()):
+                element=int(element)
+            values.append(element)
+
+    if(tracemalloc.is_tracing()):
+        log.debug(f"Peak memory (python allocations) after streaming {file_path}: {tracemalloc.get_traced_memory()[1]/2**20:.1f} MiB")
+    return _jq_output_to_array(values)
+
+def compare_json_memory_usage(file_path:Union[str,os.PathLike],
+                              decode:str)->Dict[str,int]:
+    """
+    Measure peak memory [bytes] used by reading DECODE from json file FILE_PATH
+    as a whole ('eager', the data is parsed by jq) and in the streaming mode ('streaming').
+    Memory is traced with tracemalloc, thus only python allocations are counted
+    (the data structures jq creates internally are not included in the 'eager' number).
+
+    Args:
+      file_path: path to the json file to read
+      decode: jq command used for decoding
+    """
+    result={}
+    was_tracing=tracemalloc.is_tracing()
+    if(not was_tracing):
+        tracemalloc.start()
+    try:
+        for mode in ['eager','streaming']:
+            if(hasattr(tracemalloc,'reset_peak')): # python>=3.9
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.clear_traces()
+            start_memory=tracemalloc.get_traced_memory()[0]
+            if(mode=='eager'):
+                with open(file_path,'r') as stream:
+                    decode_json_array(json.load(stream,object_pairs_hook=OrderedDict),decode)
+            else:
+                if(stream_array_from_json(file_path,decode) is None):
+                    raise ValueError(f"Decode '{decode}' cannot be read from {file_path} in the streaming mode.")
+            result[mode]=tracemalloc.get_traced_memory()[1]-start_memory
+    finally:
+        if(not was_tracing):
+            tracemalloc.stop()
+    return result
+
 def get_array_from_yaml(file_path:Union[str,os.PathLike],
                         decode:str) -> np.ndarray:
     """
@@ -240,11 +630,11 @@ def get_array_from_yaml(file_path:Union[str,os.PathLike],
     log.debug("--------- yaml file read -------------")
     log.debug(f"Reading variable information from yaml file {file_path}")
     log.debug(f"decode used: '{decode}'")
-    data_loaded=open_data_file(file_path,"yaml")# type: ignore 
-            
+    data_loaded=open_jq_input(file_path,"yaml")# type: ignore
+
     return decode_json_array(data_loaded,decode)
 
-@functools.lru_cache(maxsize=16)
+@cached
 def get_list_of_objects_in_root_file(file_path:Union[str,os.PathLike]) -> Dict[str,str]:
     """
     Get names and class names of objects inside ROOT fie
@@ -257,8 +647,8 @@ def get_list_of_objects_in_root_file(file_path:Union[str,os.PathLike]) -> Dict[s
     """
     log.debug(f"getting list of objects inside ROOT file {file_path}.")
     try:
-        rfile=uproot.open(file_path)
-        return rfile.classnames()
+        with ROOT_FILE_POOL.open(file_path) as root_file:
+            return root_file.uproot_file.classnames()
     except Exception as exc:
         log.debug(f"file 'file_path'({file_path}) does not seem to be a readable root file!!")
         raise exc
@@ -281,7 +671,7 @@ def string_list_available_objects_in_root_file(file_path:Union[str,os.PathLike])
         result.append(f"-- '{name_to_print}' of type {classname}")
     return result
 
-@functools.lru_cache(maxsize=128)
+@cached
 def get_object_class(file_path:Union[str,os.PathLike],
                      root_object_path:str)-> str:
     """
@@ -291,7 +681,8 @@ def get_object_class(file_path:Union[str,os.PathLike],
       file_path: path to the ROOT file
       root_object_path: name of the object
     """
-    object_to_be_loaded=uproot.open(file_path).get(root_object_path)
+    with ROOT_FILE_POOL.open(file_path) as root_file:
+        object_to_be_loaded=root_file.uproot_file.get(root_object_path)
     if(not object_to_be_loaded):
         Error_messages=[f"Cannot find object '{root_object_path}' inside '{file_path}'. Check this file."]+string_list_available_objects_in_root_file(file_path)
         raise TypeError("\n".join(Error_messages))
@@ -299,10 +690,13 @@ def get_object_class(file_path:Union[str,os.PathLike],
     return object_to_be_loaded.classname if hasattr(object_to_be_loaded,'classname') else ''
 
 def get_array_from_root(object_path:str,
-                        decode:str)->np.ndarray:
+                        decode:str,
+                        step_size:Union[int,str,None]=None,
+                        cut:Optional[str]=None)->np.ndarray:
     """
     Obtain a data array from an object inside ROOT file
-    using hepdata_lib.RootFileReader
+    using hepdata_lib.RootFileReader (histograms and graphs)
+    or uproot (TTree branches and RNTuple fields, see :py:func:`get_array_from_root_tree`)
 
     Args:
       object_path: path to the ROOT file & path to the object to read (separated by ':'), e.g.:
@@ -315,8 +709,14 @@ def get_array_from_root(object_path:str,
         - TGraph: ``x`` (x-values), ``y`` (y-values)
         - RooHist: same as TGraph
         - TGraphErrors/TGraphAssymetricErrors: ``x``/``y`` (x/y-values), ``dx``/``dy`` (errors on x/y-values when appropriate)
+        - TTree (and TNtuple): name of the branch (or uproot expression of branches, e.g. ``pt/1000``)
+        - RNTuple: name of the field
 
         See https://github.com/HEPData/hepdata_lib/blob/master/examples/reading_histograms.ipynb for more details.
+
+      step_size: (TTree/RNTuple only) number of entries (int) or memory size (e.g. '50 MB') read at once
+        (default: :py:data:`ROOT_TREE_STEP_SIZE`)
+      cut: (TTree/RNTuple only) expression selecting the entries to be read, e.g. ``njet>=2``
     """
     log.debug("--------- root file read -------------")
     log.debug(f"Reading variable information from root file {object_path}")
@@ -339,25 +739,29 @@ def get_array_from_root(object_path:str,
     file_path=obj_path_split[0]
     root_object_path=obj_path_split[1]
     
-    # Main reader of root files (from hepdata_lib)
-    rreader=open_data_file(file_path,"root") # type: ignore 
-
-    # but, need to get information about object type from uproot:
-    item_classname=get_object_class(file_path,root_object_path)
-
-    loaded_object_hepdata_lib=None    
-    if( "TH1" in item_classname):
-        loaded_object_hepdata_lib=rreader.read_hist_1d(root_object_path)
-    elif( "TH2" in item_classname):
-        loaded_object_hepdata_lib=rreader.read_hist_2d(root_object_path)
-    elif("RooHist" in item_classname or "TGraph" in item_classname):
-        loaded_object_hepdata_lib=rreader.read_graph(root_object_path)
-    else:
-        # TODO come up with way to work with general root objects (this is what is returned here).
-        #loaded_object_hepdata_lib=rreader.retrieve_object(root_object_path)
-        #return loaded_object_hepdata_lib[decode]
-        log.warning(f"Unfortunately class '{item_classname}' of {root_object_path} inside root file {file_path} is unknown to hepdata_maker. Data cannot be read and is left blank!")
-        return np.array([])
+    with ROOT_FILE_POOL.open(file_path) as root_file:
+        # need to get information about object type from uproot:
+        item_classname=get_object_class(file_path,root_object_path)
+
+        # Main reader of root files (from hepdata_lib)
+        loaded_object_hepdata_lib=None    
+        if( "TH1" in item_classname):
+            with PYROOT_LOCK: # PyROOT is not thread-safe
+                loaded_object_hepdata_lib=root_file.reader.read_hist_1d(root_object_path)
+        elif( "TH2" in item_classname):
+            with PYROOT_LOCK:
+                loaded_object_hepdata_lib=root_file.reader.read_hist_2d(root_object_path)
+        elif("RooHist" in item_classname or "TGraph" in item_classname):
+            with PYROOT_LOCK:
+                loaded_object_hepdata_lib=root_file.reader.read_graph(root_object_path)
+        elif(any(tree_class in item_classname for tree_class in ROOT_TREE_CLASSES)):
+            return get_array_from_root_tree(file_path,root_object_path,decode,step_size=step_size,cut=cut)
+        else:
+            # TODO come up with way to work with general root objects (this is what is returned here).
+            #loaded_object_hepdata_lib=rreader.retrieve_object(root_object_path)
+            #return loaded_object_hepdata_lib[decode]
+            log.warning(f"Unfortunately class '{item_classname}' of {root_object_path} inside root file {file_path} is unknown to hepdata_maker. Data cannot be read and is left blank!")
+            return np.array([])
 
     if(not decode or decode not in loaded_object_hepdata_lib):
         Error_messages=[]
@@ -370,6 +774,76 @@ def get_array_from_root(object_path:str,
     return np.array(loaded_object_hepdata_lib[decode])
 
 
+# Default number of entries/memory size of TTree/RNTuple chunks read at once
+ROOT_TREE_STEP_SIZE='100 MB'
+# ROOT classes read with get_array_from_root_tree (TNtuple(D) are TTrees)
+ROOT_TREE_CLASSES=('TTree','TNtuple','RNTuple')
+
+def parse_step_size(step_size:Union[int,str,None])->Union[int,str,None]:
+    """
+    Normalise STEP_SIZE of TTree/RNTuple reading: number of entries given as text (e.g. '1000')
+    is converted to int, memory sizes (e.g. '50 MB') are returned unchanged.
+    """
+    if(isinstance(step_size,str) and step_size.strip().isdigit()):
+        return int(step_size)
+    return step_size
+
+def get_array_from_root_tree(file_path:Union[str,os.PathLike],
+                             root_object_path:str,
+                             decode:str,
+                             step_size:Union[int,str,None]=None,
+                             cut:Optional[str]=None)->np.ndarray:
+    """
+    Read a TTree branch (or RNTuple field) in chunks with uproot.
+    Only the branches needed for DECODE and CUT are read,
+    and at most STEP_SIZE of data (besides the result) is kept in memory at once.
+
+    Args:
+      file_path: path to the ROOT file
+      root_object_path: path of the TTree/RNTuple inside the file
+      decode: branch name or uproot expression (TTree), field name (RNTuple)
+      step_size: number of entries (int) or memory size (e.g. '50 MB') of a chunk
+      cut: expression selecting entries (e.g. 'njet>=2');
+        for RNTuple it is evaluated with numpy on the fields it uses.
+    """
+    step_size=parse_step_size(step_size) if step_size else ROOT_TREE_STEP_SIZE
+    if(not decode):
+        raise TypeError(f"'decode' needs to specify the branch/field of '{root_object_path}' inside the root file '{file_path}' to be read.")
+    with ROOT_FILE_POOL.open(file_path) as root_file:
+        tree=root_file.uproot_file[root_object_path]
+        log.debug(f"Reading '{decode}' from {tree.classname} '{root_object_path}' ({tree.num_entries} entries) of {file_path}, step_size={step_size}, cut='{cut}'.")
+        if("RNTuple" in tree.classname):
+            # uproot does not (yet) apply cuts to RNTuples, this is done here
+            fields=set(tree.keys())
+            if(decode not in fields):
+                raise TypeError(f"'decode' field ({decode}) not found in RNTuple '{root_object_path}' inside the root file '{file_path}'. Available fields: {sorted(fields)}")
+            cut_fields=[name for name in OrderedDict.fromkeys(re.findall(r'[A-Za-z_][A-Za-z0-9_]*',cut)) if name in fields] if cut else []
+            def chunks()->Iterable:
+                for chunk in tree.iterate(list(OrderedDict.fromkeys([decode]+cut_fields)),step_size=step_size,library='np'):
+                    yield chunk[decode][eval(compile_expression(cut),{'np':np},dict(chunk))] if cut else chunk[decode]
+        else:
+            def chunks()->Iterable:
+                for chunk in tree.iterate([decode],cut=cut if cut else None,step_size=step_size,library='np'):
+                    yield chunk[decode]
+        try:
+            if(not cut):
+                # the final size is known, chunks are copied into one preallocated array
+                result=None
+                position=0
+                for values in chunks():
+                    if(result is None):
+                        result=np.empty((tree.num_entries,)+values.shape[1:],dtype=values.dtype)
+                    result[position:position+len(values)]=values
+                    position+=len(values)
+                return result if result is not None else np.array([])
+            selected=list(chunks())
+            return np.concatenate(selected) if len(selected)>0 else np.array([])
+        except TypeError:
+            raise
+        except Exception as exc:
+            branches=sorted(tree.keys())
+            raise TypeError(f"Could not read '{decode}' (cut='{cut}') from '{root_object_path}' inside the root file '{file_path}': {exc}\nAvailable branches: {branches}")
+
 # Just information for users that is used in two places
 tabular_loc_decode_clarification=""" This variable should point to the tabular environment that is desired to be read. It should use information of TexSoup (https://texsoup.alvinwan.com/) object 'latex' 
  created from your input file. In most cases something along this line is sufficient:
@@ -430,7 +904,7 @@ def get_array_from_tex(file_path:Union[str,os.PathLike],
     if(not decode):
         raise TypeError(f"""You need to specify variable 'decode'. {decode_clarification}""")
     try:
-        result=eval(decode,merge_dictionaries({"np":np},{'table':table},{"re":re},{"scipy.stats":scipy.stats},{"scipy.special":scipy.special},{"ufs":ufs}))
+        result=eval(compile_expression(decode),merge_dictionaries({"np":np},{'table':table},{"re":re},{"scipy.stats":scipy.stats},{"scipy.special":scipy.special},{"ufs":ufs}))
     except Exception as exc:
         log.error(f"""Check your 'decode' settings!
         {decode_clarification}""")
@@ -470,25 +944,46 @@ def get_table_from_tex(file_path:Union[str,os.PathLike],
           for regex patterns allowed and
           https://docs.python.org/3/howto/regex.html#the-backslash-plague
           for the need of multiple backslashes.
+
+    The table is parsed once per (file_path, tabular_loc_decode, replace_dict);
+    a copy of the cached table is returned.
     """
+    # replace_dict is applied in order, so its items (not a set of them) define the table
+    replace_items=tuple((key,value) for key,value in replace_dict.items())
+    return _get_table_from_tex_cached(file_path,tabular_loc_decode,replace_items).copy()
+
+@cached
+def _get_table_from_tex_cached(file_path:Union[str,os.PathLike],
+                               tabular_loc_decode:str,
+                               replace_items:Tuple[Tuple[str,str],...])->np.ndarray:
+    cache=disk_cache.get_disk_cache()
+    if(cache is not None):
+        return cache.get_or_load(file_path,lambda: _parse_table_from_tex(file_path,tabular_loc_decode,replace_items),'get_table_from_tex',tabular_loc_decode,replace_items)
+    return _parse_table_from_tex(file_path,tabular_loc_decode,replace_items)
+
+def _parse_table_from_tex(file_path:Union[str,os.PathLike],
+                          tabular_loc_decode:str,
+                          replace_items:Tuple[Tuple[str,str],...])->np.ndarray:
+    log.debug(f"Parsing tabular '{tabular_loc_decode}' of tex file {file_path}.")
 
     # First load .tex file
     soup=open_data_file(file_path,"tex")# type: ignore 
 
     # try to evaluate 'tabular_loc_decode'
     try:
-        tabular_info=eval(tabular_loc_decode,{'latex':soup}).expr
+        tabular_info=eval(compile_expression(tabular_loc_decode),{'latex':soup}).expr
     except Exception as exc:
         log.error(f"File {file_path}: Issue with tabular decoding. Please check your 'tabular_loc_decode' variable!\n{tabular_loc_decode_clarification}")
         raise exc
 
     # Clean the table from comments / separators and user-chosen artifacts
-    tabular_info.string=re.sub('%.*','',tabular_info.string)
-    for key,value in {**replace_dict, **{r'\\hline':'',r'\\n':'',r'\\cline{.?}':''}}.items():
-        tabular_info.string=re.sub(key,value,tabular_info.string)
+    # (working on a copy of the string, the cached TexSoup object is not modified)
+    tabular_string=re.sub('%.*','',tabular_info.string)
+    for key,value in list(replace_items)+[(r'\\hline',''),(r'\\n',''),(r'\\cline{.?}','')]:
+        tabular_string=re.sub(key,value,tabular_string)
 
     # now, data should be easily separable by '&' (columns) and '\\' (rows)
-    table=[[y.rstrip().strip() for y in x.split(r'&')] for x in tabular_info.string.split(r'\\')]
+    table=[[y.rstrip().strip() for y in x.split(r'&')] for x in tabular_string.split(r'\\')]
 
     #
     ## Below we decode information from multirow and multicolumn commands 
@@ -525,6 +1020,173 @@ def get_table_from_tex(file_path:Union[str,os.PathLike],
     return_table=np.array([x for x in new_table if (x!=[] and not all([(y=='' or y==None) for y in x]))],dtype=object)
     return return_table
     
+def parse_array_index(index:str)->Tuple[Any,...]:
+    """
+    Translate numpy basic index given as string (e.g. '[2:10]', '[:,0]', '[...,::2]')
+    into a tuple usable for indexing. The string is parsed, not evaluated.
+    Only integers, slices and ellipsis are allowed, thus indexing with the result
+    gives a view of the array (no data is copied).
+
+    Args:
+      index: index string (with or without the enclosing square brackets)
+    """
+    index_string=index.strip()
+    if(index_string.startswith('[') and index_string.endswith(']')):
+        index_string=index_string[1:-1]
+    if(index_string.strip()==''):
+        return ()
+    result:List[Any]=[]
+    try:
+        for item in index_string.split(','):
+            item=item.strip()
+            if(item=='...'):
+                result.append(Ellipsis)
+            elif(':' in item):
+                slice_parts=item.split(':')
+                if(len(slice_parts)>3):
+                    raise ValueError(f"too many ':' in '{item}'")
+                result.append(slice(*[int(part) if part.strip()!='' else None for part in slice_parts]))
+            else:
+                result.append(int(item))
+    except ValueError as exc:
+        raise ValueError(f"Could not understand array index '{index}' ({exc}). Only integers, slices (start:stop:step) and '...' separated by commas are allowed, e.g. '[:,0]'.")
+    return tuple(result)
+
+def split_array_decode(decode:Optional[str])->Tuple[str,Tuple[Any,...]]:
+    """
+    Split DECODE of npy/npz files into the array key and the index,
+    e.g. 'grid[:,1]' --> ('grid',(slice(None),1)).
+    """
+    if(not decode):
+        return ('',())
+    bracket_position=decode.find('[')
+    if(bracket_position<0):
+        return (decode.strip(),())
+    return (decode[:bracket_position].strip(),parse_array_index(decode[bracket_position:]))
+
+def get_npz_keys(file_path:Union[str,os.PathLike])->List[str]:
+    """
+    Get names of the arrays stored in npz file (without reading them).
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        return [name[:-len('.npy')] for name in archive.namelist() if name.endswith('.npy')]
+
+class NpzArrays(Mapping):
+    """
+    Read-only mapping of array names of npz file to arrays (see :py:func:`open_npz_member`).
+    Only names are read when created, arrays are loaded when accessed.
+    """
+    def __init__(self,file_path:Union[str,os.PathLike]):
+        self.file_path=file_path
+        self._keys=get_npz_keys(file_path)
+    def __getitem__(self,key:str)->np.ndarray:
+        if(key not in self._keys):
+            raise KeyError(key)
+        return open_npz_member(self.file_path,key)
+    def __iter__(self):
+        return iter(self._keys)
+    def __len__(self)->int:
+        return len(self._keys)
+
+def load_npz_member(file_path:Union[str,os.PathLike],
+                    key:str)->np.ndarray:
+    """
+    Load array KEY from npz file FILE_PATH (without caching).
+
+    np.load does not memory-map npz files, therefore arrays stored without
+    compression (np.savez) are memory-mapped directly from the archive;
+    compressed ones (np.savez_compressed) have to be read into memory.
+    The result is read-only in both cases.
+    """
+    member=key+'.npy'
+    with zipfile.ZipFile(file_path) as archive:
+        if(member not in archive.namelist()):
+            raise KeyError(f"Array '{key}' not found in {file_path}. Available arrays: {get_npz_keys(file_path)}")
+        info=archive.getinfo(member)
+    if(info.compress_type==zipfile.ZIP_STORED):
+        with open(file_path,'rb') as stream:
+            # local file header: 30 bytes followed by file name and extra field
+            stream.seek(info.header_offset)
+            local_header=stream.read(30)
+            name_length,extra_length=struct.unpack('<HH',local_header[26:30])
+            stream.seek(info.header_offset+30+name_length+extra_length)
+            version=np.lib.format.read_magic(stream)
+            header=None
+            if(version==(1,0)):
+                header=np.lib.format.read_array_header_1_0(stream)
+            elif(version==(2,0)):
+                header=np.lib.format.read_array_header_2_0(stream)
+            data_offset=stream.tell()
+        if(header is not None):
+            shape,fortran_order,dtype=header
+            if(not dtype.hasobject and int(np.prod(shape))>0):
+                log.debug(f"Memory-mapping array '{key}' of {file_path}.")
+                return np.memmap(file_path,dtype=dtype,mode='r',offset=data_offset,shape=shape,order='F' if fortran_order else 'C')
+    log.debug(f"Array '{key}' of {file_path} cannot be memory-mapped, reading it into memory.")
+    with np.load(file_path,allow_pickle=False) as npz_file:
+        array=npz_file[key]
+    array.flags.writeable=False
+    return array
+
+@cached
+def open_npz_member(file_path:Union[str,os.PathLike],
+                    key:str)->np.ndarray:
+    """
+    Get (and cache) read-only array KEY from npz file FILE_PATH.
+    See :py:func:`load_npz_member`.
+    """
+    return load_npz_member(file_path,key)
+
+def get_array_from_npy(file_path:Union[str,os.PathLike],
+                       decode:Optional[str])->np.ndarray:
+    """
+    Read array from a npy file. The file is memory-mapped and
+    a read-only view of the (selected part of the) array is returned, no data is copied.
+    Data is read from disk only when the values are used (e.g. by transformations).
+    Variables and uncertainties read directly from the file keep the read-only view (see :py:class:`hepdata_maker.Submission.Variable`).
+
+    Args:
+      file_path: path to the npy file to read
+      decode: optional index selecting part of the array, e.g. '[2:10]' or '[:,0]'.
+        Empty decode selects the whole array.
+    """
+    log.debug("--------- npy file read -------------")
+    log.debug(f"Reading variable information from npy file {file_path}")
+    log.debug(f"decode used: '{decode}'")
+    key,index=split_array_decode(decode)
+    if(key):
+        raise ValueError(f"File {file_path}: npy files contain a single array, decode can only be an index (e.g. '[:,0]'), got '{decode}'.")
+    return open_data_file(file_path,'npy')[index] # type: ignore
+
+def get_array_from_npz(file_path:Union[str,os.PathLike],
+                       decode:str)->np.ndarray:
+    """
+    Read array from a npz file. Arrays stored without compression are memory-mapped and
+    a read-only view of the (selected part of the) array is returned, no data is copied.
+
+    Args:
+      file_path: path to the npz file to read
+      decode: name of the array optionally followed by an index, e.g. 'grid' or 'grid[:,1]'
+    """
+    log.debug("--------- npz file read -------------")
+    log.debug(f"Reading variable information from npz file {file_path}")
+    log.debug(f"decode used: '{decode}'")
+    key,index=split_array_decode(decode)
+    if(not key):
+        raise TypeError(f"""You need to specify variable 'decode' which contains the name of the array you want from your npz file (optionally followed by an index, e.g. 'grid[:,1]').
+        Available arrays: {get_npz_keys(file_path)}""")
+    return open_npz_member(file_path,key)[index]
+
+def get_file_type(file_path:str,
+                  file_type:Optional[str]=None)->str:
+    """
+    Get type of the data file. If FILE_TYPE is given it takes precedence,
+    otherwise the type is guessed from the file extention.
+    """
+    if file_type:
+        return file_type
+    return file_path.split(":")[0].lower().split(".")[-1] # split is for ROOT files
+
 def read_data_file(file_path:str,
                    decode:str,
                    **extra_args:Any)->np.ndarray:
@@ -532,7 +1194,7 @@ def read_data_file(file_path:str,
     Get a column of data (1-D numpy array) from a file.
 
     Args:
-      file_path: path to file to be read (types accepted:['json', 'yaml', 'root', 'csv', 'tex'])
+      file_path: path to file to be read (types accepted:['json', 'yaml', 'root', 'csv', 'tex', 'npy', 'npz'])
 
       decode: string selecting information from the input file.
         Required syntax depends on the type of the file read.
@@ -544,6 +1206,8 @@ def read_data_file(file_path:str,
           - :py:func:`hepdata_maker.variable_loading.get_array_from_yaml`
           - :py:func:`hepdata_maker.variable_loading.get_array_from_csv`
           - :py:func:`hepdata_maker.variable_loading.get_array_from_tex`
+          - :py:func:`hepdata_maker.variable_loading.get_array_from_npy`
+          - :py:func:`hepdata_maker.variable_loading.get_array_from_npz`
 
 
       extra_args: extra arguments, which are:
@@ -557,6 +1221,12 @@ def read_data_file(file_path:str,
         - tabular_loc_decode: 'required' if tex file is read (see 'get_array_from_tex' for more details)
 
         - replace_dict:  'optional' if tex file is read (see 'get_array_from_tex' for more details)
+
+        - step_size, cut: 'optional' if TTree/RNTuple is read (see 'get_array_from_root' for more details)
+
+        - data_type: 'optional' numeric type of the data (e.g. 'float'). Values are then converted
+          directly to that type, empty or '-' entries becoming NaN (see :py:func:`convert_to_data_type`).
+          Non-numeric types are ignored here.
     """
     tmp_values=None
     if(not os.path.isfile(file_path.split(":")[0])): # split is for ROOT files
@@ -566,13 +1236,20 @@ def read_data_file(file_path:str,
     replace_dict=extra_args.get('replace_dict',{})
     tabular_loc_decode=extra_args.get('tabular_loc_decode',None)
     file_type=extra_args.get('file_type',None)
-    log.debug(f"reading data file: {file_path} with following options provided:\n file_type='{file_type}', delimiter='{delimiter}', tabular_loc_decode (for .tex file)='{tabular_loc_decode}', replace_dict(for .tex files)='{replace_dict}'.")
+    data_type=extra_args.get('data_type',None)
+    log.debug(f"reading data file: {file_path} with following options provided:\n file_type='{file_type}', delimiter='{delimiter}', tabular_loc_decode (for .tex file)='{tabular_loc_decode}', replace_dict(for .tex files)='{replace_dict}', data_type='{data_type}'.")
 
     if file_type: # file_type is specified. It takes precedence over type-guessing
         log.debug(f"You specified file_type={file_type} for the input file and this will be used.")
     else:
         log.debug(f"You have not specified the type of the input file. It will be guess from the name.")
-        file_type=file_path.split(":")[0].lower().split(".")[-1]
+    file_type=get_file_type(file_path,file_type)
+
+    if(_ACTIVE_READ_PLAN is not None):
+        planned_values=_ACTIVE_READ_PLAN.get(file_path,decode,**extra_args)
+        if(planned_values is not None):
+            log.debug(f"Values of decode '{decode}' on {file_path} taken from the read plan.")
+            return planned_values
 
     if True:
         # Just for visual appeal of the code
@@ -581,18 +1258,335 @@ def read_data_file(file_path:str,
         elif(file_type=='yaml'):
             tmp_values=get_array_from_yaml(file_path,decode)
         elif(file_type=='root'):
-            tmp_values=get_array_from_root(file_path,decode)
+            tmp_values=get_array_from_root(file_path,decode,step_size=extra_args.get('step_size',None),cut=extra_args.get('cut',None))
         elif(file_type=='csv'):
-            tmp_values=get_array_from_csv(file_path,decode,delimiter)
+            tmp_values=get_array_from_csv(file_path,decode,delimiter,data_type)
         elif(file_type=='tex'):
             tmp_values=get_array_from_tex(file_path,decode,tabular_loc_decode=tabular_loc_decode,replace_dict=replace_dict)
+        elif(file_type=='npy'):
+            tmp_values=get_array_from_npy(file_path,decode)
+        elif(file_type=='npz'):
+            tmp_values=get_array_from_npz(file_path,decode)
         else:
             raise TypeError(f"""File {file_path}: unsuported file type (file type: '{file_type}')!
             If the file_type cannot be guest from the filename extention, you can use flag/field 'file_type' to have it set manually.""")            
 
-    return tmp_values
+    return convert_to_data_type(tmp_values,data_type)
 
 
+# Arguments of read_data_file (beside file_path and decode) that change the values read
+READ_EXTRA_ARGS=('delimiter', 'file_type', 'replace_dict', 'tabular_loc_decode', 'step_size', 'cut', 'data_type')
+
+_ACTIVE_READ_PLAN:Optional['ReadPlan']=None
+
+# Default concurrency of ReadPlan.prefetch (see configure_prefetch)
+PREFETCH_THREADS=4
+PREFETCH_PROCESSES=2
+# Smaller yaml/tex files are parsed by threads, starting processes costs more than parsing them
+PREFETCH_PROCESS_MIN_BYTES=2**20
+
+# Pool of processes used by ReadPlan.prefetch, kept between prefetches (see shutdown_prefetch_processes)
+_PREFETCH_PROCESS_POOL:Optional[concurrent.futures.ProcessPoolExecutor]=None
+_PREFETCH_PROCESS_POOL_SIZE=0
+
+def configure_prefetch(max_threads:int=4,
+                       max_processes:int=2,
+                       process_min_bytes:int=2**20)->None:
+    """
+    Set concurrency used when prefetching input files (see :py:meth:`ReadPlan.prefetch`)
+    and when reading several in_files of a variable (see :py:func:`read_in_parallel`).
+
+    Args:
+      max_threads: number of threads reading files, 0 disables prefetching (and parallel reading)
+      max_processes: number of processes parsing yaml and tex files, 0 leaves the parsing to threads
+      process_min_bytes: only yaml and tex files of at least this size are parsed by processes
+    """
+    global PREFETCH_THREADS,PREFETCH_PROCESSES,PREFETCH_PROCESS_MIN_BYTES
+    if(max_threads<0 or max_processes<0 or process_min_bytes<0):
+        raise ValueError(f"Number of threads/processes and file size cannot be negative (got {max_threads}/{max_processes}/{process_min_bytes}).")
+    PREFETCH_THREADS=max_threads
+    PREFETCH_PROCESSES=max_processes
+    PREFETCH_PROCESS_MIN_BYTES=process_min_bytes
+
+def _get_prefetch_process_pool(max_processes:int)->concurrent.futures.ProcessPoolExecutor:
+    """
+    Get the pool of MAX_PROCESSES processes used for prefetching, it is started only once
+    (and again only if MAX_PROCESSES changes). Processes are started when tasks are submitted.
+    """
+    global _PREFETCH_PROCESS_POOL,_PREFETCH_PROCESS_POOL_SIZE
+    if(_PREFETCH_PROCESS_POOL is None or _PREFETCH_PROCESS_POOL_SIZE!=max_processes or getattr(_PREFETCH_PROCESS_POOL,'_broken',False)):
+        shutdown_prefetch_processes()
+        log.debug(f"Starting pool of {max_processes} processes for prefetching.")
+        _PREFETCH_PROCESS_POOL=concurrent.futures.ProcessPoolExecutor(max_workers=max_processes)
+        _PREFETCH_PROCESS_POOL_SIZE=max_processes
+    return _PREFETCH_PROCESS_POOL
+
+def shutdown_prefetch_processes()->None:
+    """
+    Stop the processes used for prefetching (see :py:meth:`ReadPlan.prefetch`), if any were started.
+    """
+    global _PREFETCH_PROCESS_POOL,_PREFETCH_PROCESS_POOL_SIZE
+    if(_PREFETCH_PROCESS_POOL is not None):
+        _PREFETCH_PROCESS_POOL.shutdown()
+        _PREFETCH_PROCESS_POOL=None
+        _PREFETCH_PROCESS_POOL_SIZE=0
+
+def read_in_parallel(read_function:Callable[[Any],np.ndarray],
+                     items:List[Any],
+                     max_threads:Optional[int]=None)->List[np.ndarray]:
+    """
+    Apply READ_FUNCTION to all ITEMS using a pool of threads, keeping the order of ITEMS.
+    The first exception raised by READ_FUNCTION is re-raised.
+    (Readers of ROOT files serialise their PyROOT calls, see :py:data:`hepdata_maker.root_file_pool.PYROOT_LOCK`.)
+
+    Args:
+      read_function: function reading data of a single item (e.g. of one in_files entry)
+      items: list of items to be read
+      max_threads: number of threads (default set by :py:func:`configure_prefetch`), below 2 items are read one by one
+    """
+    max_threads=PREFETCH_THREADS if max_threads is None else max_threads
+    if(len(items)<2 or max_threads<2):
+        return [read_function(item) for item in items]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_threads,len(items))) as pool:
+        return list(pool.map(read_function,items))
+
+def concatenate_arrays(arrays:List[np.ndarray])->np.ndarray:
+    """
+    Join ARRAYS (along the first axis) with a single copy into an array sized from their lengths.
+    Empty arrays are skipped (they do not influence the type of the result).
+    """
+    non_empty=[array for array in arrays if len(array)>0]
+    if(len(non_empty)==0):
+        return arrays[-1] if len(arrays)>0 else np.array([])
+    if(len(non_empty)==1):
+        return non_empty[0]
+    return np.concatenate(non_empty)
+
+def _prefetch_parse(task:Tuple[str,str,List[Any]],
+                    cache_dir:Optional[str]=None)->Any:
+    """
+    Parse yaml file or tex tables of a prefetch TASK=(kind,file_path,tables).
+    When run in a process the result is sent back to the main process; in a thread it lands in the reader cache directly.
+    """
+    kind,file_path,tables=task
+    cache=disk_cache.get_disk_cache()
+    if(cache_dir is not None and (cache is None or cache.cache_dir!=cache_dir)):
+        disk_cache.enable_disk_cache(cache_dir)
+    if(kind=='yaml'):
+        return open_data_file(file_path,'yaml') # type: ignore
+    elif(kind=='tex'):
+        return [_get_table_from_tex_cached(file_path,*table) for table in tables]
+    raise ValueError(f"Unknown prefetch task {kind}.")
+
+class ReadPlan():
+    """
+    Collection of data-file read requests (file, decode, extra_args) that are
+    executed together: each file is opened once and all its (unique) decodes are run in one go.
+
+    While a plan is active (``with plan:``), :py:func:`read_data_file` serves
+    the planned requests with the precomputed values.
+    Values are released once they were served as many times as they were requested.
+    Requests that failed during execution are not served, they are read
+    again (raising the usual errors) when requested.
+    """
+    def __init__(self)->None:
+        # file to read (without ROOT object path), file_type --> ordered requests for the file
+        self._requests:Dict[Tuple[str,str],Dict[Tuple[Any,...],Tuple[str,str,Dict[str,Any]]]]=OrderedDict()
+        self._results:Dict[Tuple[Any,...],np.ndarray]={}
+        # request --> number of reads still expected (values are dropped after the last one)
+        self._consumers:Dict[Tuple[Any,...],int]={}
+        self.n_requested=0
+        self.n_served=0
+        self.n_failed=0
+
+    @staticmethod
+    def request_key(file_path:str,
+                    decode:str,
+                    **extra_args:Any)->Tuple[Any,...]:
+        """
+        Get hashable key of a read request.
+        """
+        return (str(file_path),decode)+tuple(json.dumps(extra_args.get(k,None),sort_keys=True) for k in READ_EXTRA_ARGS)
+
+    def add_request(self,
+                    file_path:str,
+                    decode:str,
+                    **extra_args:Any)->None:
+        """
+        Add request to read DECODE from FILE_PATH (see :py:func:`read_data_file` for arguments).
+        Duplicated requests are only read once.
+        """
+        self.n_requested+=1
+        extra_args={k: extra_args[k] for k in READ_EXTRA_ARGS if k in extra_args}
+        file_type=get_file_type(str(file_path),extra_args.get('file_type',None))
+        group=self._requests.setdefault((str(file_path).split(":")[0],file_type),OrderedDict())
+        key=self.request_key(file_path,decode,**extra_args)
+        group[key]=(str(file_path),decode,extra_args)
+        self._consumers[key]=self._consumers.get(key,0)+1
+
+    def __len__(self)->int:
+        return sum(len(group) for group in self._requests.values())
+
+    def execute(self)->None:
+        """
+        Read all requested data, file by file.
+        """
+        for (data_file,file_type),group in self._requests.items():
+            if(not os.path.isfile(data_file)):
+                continue # will be reported when the data is requested
+            log.debug(f"Reading {len(group)} decodes from file {data_file} in one go.")
+            if(file_type in ['json','yaml']):
+                self._execute_jq_group(data_file,file_type,group)
+            for key,(file_path,decode,extra_args) in group.items():
+                if(key in self._results):
+                    continue
+                try:
+                    self._results[key]=read_data_file(file_path,decode,**extra_args)
+                except Exception as exc:
+                    log.debug(f"Planned read of decode '{decode}' from {file_path} failed ({exc}). It is left to be read on request.")
+                    self.n_failed+=1
+
+    def _execute_jq_group(self,data_file:str,file_type:str,group:Dict[Tuple[Any,...],Tuple[str,str,Dict[str,Any]]])->None:
+        keys=[key for key,(_,decode,_) in group.items() if decode]
+        if(file_type=='json' and use_json_streaming(data_file)):
+            # simple paths are streamed one by one (see get_array_from_json), the rest can still be batched
+            keys=[key for key in keys if parse_simple_json_path(group[key][1]) is None]
+            if(len(keys)==0):
+                return
+        decodes=[group[key][1] for key in keys]
+        try:
+            outputs=decode_json_array_batch(open_jq_input(data_file,file_type),decodes) # type: ignore
+        except Exception as exc:
+            # One of the decodes is faulty, each decode is then read separately
+            log.debug(f"Batched jq decoding of {data_file} failed ({exc}), decoding one by one.")
+            return
+        for key,output in zip(keys,outputs):
+            self._results[key]=convert_to_data_type(output,group[key][2].get('data_type',None))
+
+    def prefetch(self,
+                 max_threads:Optional[int]=None,
+                 max_processes:Optional[int]=None,
+                 process_min_bytes:Optional[int]=None)->None:
+        """
+        Read and parse all files of the plan concurrently, warming the reader cache
+        (see :py:mod:`hepdata_maker.reader_cache`) before the plan is executed.
+        I/O-bound reads (json, csv, ROOT) are done by a pool of threads,
+        CPU-heavy parsing (of large yaml files and tex tables) by a pool of processes.
+        The pool of processes is started only when needed and reused by later prefetches
+        (see :py:func:`shutdown_prefetch_processes`).
+        Failures are ignored here, they are reported when the data is read.
+
+        Args:
+          max_threads: number of threads (default set by :py:func:`configure_prefetch`), 0 disables prefetching
+          max_processes: number of processes (default set by :py:func:`configure_prefetch`),
+            with 0 everything is done by threads
+          process_min_bytes: smaller files are parsed by threads (default set by :py:func:`configure_prefetch`)
+        """
+        max_threads=PREFETCH_THREADS if max_threads is None else max_threads
+        max_processes=PREFETCH_PROCESSES if max_processes is None else max_processes
+        process_min_bytes=PREFETCH_PROCESS_MIN_BYTES if process_min_bytes is None else process_min_bytes
+        if(max_threads<1):
+            return
+        thread_tasks:List[Callable[[],Any]]=[]
+        process_tasks:List[Tuple[str,str,List[Any]]]=[]
+        for (data_file,file_type),group in self._requests.items():
+            if(not os.path.isfile(data_file)):
+                continue
+            requests=list(group.values())
+            if(file_type=='json'):
+                if(not use_json_streaming(data_file)):
+                    thread_tasks.append(functools.partial(open_jq_input,data_file,'json'))
+            elif(file_type=='csv'):
+                for delimiter in OrderedDict.fromkeys(extra_args.get('delimiter',',') for _,_,extra_args in requests):
+                    thread_tasks.append(functools.partial(open_csv_columns,data_file,delimiter))
+            elif(file_type=='root'):
+                for root_object_path in OrderedDict.fromkeys(file_path.split(":")[1] for file_path,_,_ in requests if file_path.count(":")==1):
+                    thread_tasks.append(functools.partial(get_object_class,data_file,root_object_path))
+            elif(file_type=='yaml'):
+                if((_open_data_file_cached.cache_key(data_file,'yaml') not in READER_CACHE)):
+                    process_tasks.append(('yaml',data_file,[]))
+            elif(file_type=='tex'):
+                tables=[(extra_args.get('tabular_loc_decode',None),tuple(extra_args.get('replace_dict',{}).items())) for _,_,extra_args in requests]
+                tables=[table for table in OrderedDict.fromkeys(tables) if table[0] and _get_table_from_tex_cached.cache_key(data_file,*table) not in READER_CACHE]
+                if(len(tables)>0):
+                    process_tasks.append(('tex',data_file,tables))
+        if(len(thread_tasks)+len(process_tasks)==0):
+            return
+        large_tasks=[task for task in process_tasks if os.path.getsize(task[1])>=process_min_bytes]
+        if(max_processes<1 or len(large_tasks)<2):
+            large_tasks=[] # a single file is not worth the transfer of the result between processes
+        for task in [task for task in process_tasks if task not in large_tasks]:
+            if(task[0]=='yaml'):
+                thread_tasks.append(functools.partial(open_jq_input,task[1],'yaml'))
+            else:
+                thread_tasks.append(functools.partial(_prefetch_parse,task))
+        process_tasks=large_tasks
+        log.debug(f"Prefetching input files: {len(thread_tasks)} reads with {max_threads} threads, {len(process_tasks)} parses with {max_processes} processes.")
+
+        process_futures={}
+        if(len(process_tasks)>0):
+            # processes are started (and all tasks submitted) before any thread is, see os.fork
+            process_pool=_get_prefetch_process_pool(max_processes)
+            cache=disk_cache.get_disk_cache()
+            for task in process_tasks:
+                signature=file_signature(task[1]) # taken before parsing, so that a change during parsing is noticed
+                process_futures[process_pool.submit(_prefetch_parse,task,cache.cache_dir if cache else None)]=(task,signature)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as thread_pool:
+            thread_futures=[thread_pool.submit(task) for task in thread_tasks]
+            for future in concurrent.futures.as_completed(process_futures):
+                (kind,data_file,tables),signature=process_futures[future]
+                try:
+                    result=future.result()
+                except Exception as exc:
+                    log.debug(f"Prefetching {data_file} failed ({exc}).")
+                    continue
+                if(kind=='yaml'):
+                    READER_CACHE.put(_open_data_file_cached.cache_namespace,data_file,('yaml',),result,signature=signature)
+                else:
+                    for table,table_array in zip(tables,result):
+                        READER_CACHE.put(_get_table_from_tex_cached.cache_namespace,data_file,table,table_array,signature=signature)
+            for future in thread_futures:
+                error=future.exception()
+                if(error is not None):
+                    log.debug(f"Prefetching failed ({error}).")
+
+    def get(self,
+            file_path:str,
+            decode:str,
+            **extra_args:Any)->Optional[np.ndarray]:
+        """
+        Get precomputed values of the request (None if not available).
+        Writable arrays are copied, so requests sharing the same values
+        do not influence each other. The last expected read gets the values
+        themselves, which are then dropped from the plan (and read again if requested later).
+        """
+        key=self.request_key(file_path,decode,**{k: extra_args[k] for k in READ_EXTRA_ARGS if k in extra_args})
+        values=self._results.get(key)
+        if(values is None):
+            return None
+        self.n_served+=1
+        self._consumers[key]=self._consumers.get(key,1)-1
+        if(self._consumers[key]<=0):
+            del self._results[key]
+            del self._consumers[key]
+            return values
+        return values.copy() if values.flags.writeable else values
+
+    def summary(self)->str:
+        """Human readable statistics of the plan."""
+        return f"Read plan: {self.n_requested} requests, {len(self)} unique decodes in {len(self._requests)} files, {self.n_served} served, {self.n_failed} failed."
+
+    def __enter__(self)->'ReadPlan':
+        global _ACTIVE_READ_PLAN
+        self._previous_plan=_ACTIVE_READ_PLAN
+        _ACTIVE_READ_PLAN=self
+        return self
+
+    def __exit__(self,*exc_info:Any)->None:
+        global _ACTIVE_READ_PLAN
+        _ACTIVE_READ_PLAN=self._previous_plan
+
 def get_variable_steering_snipped(in_file:Union[str,os.PathLike],
                                   decode:str,
                                   data_type:str,
@@ -619,6 +1613,9 @@ def get_variable_steering_snipped(in_file:Union[str,os.PathLike],
         additional_properties['tabular_loc_decode']=extra_args['tabular_loc_decode']
     if('file_type' in extra_args and file_type):
         additional_properties['file_type']=extra_args['file_type']
+    for tree_argument in ['step_size','cut']:
+        if(extra_args.get(tree_argument,None)):
+            additional_properties[tree_argument]=extra_args[tree_argument]
     if(in_file):
         result_json['in_files']=[merge_dictionaries({"name":in_file, "decode":decode},additional_properties)]
     
@@ -0,0 +1,231 @@
+"""
+Multithreaded evaluation of element-wise transformations with numexpr.
+
+Transformations made only of arithmetic, comparisons, ``np.where`` and numpy ufuncs
+(e.g. ``VAR*1000``, ``np.sqrt(a**2+b**2)``, ``np.where(x>0,x,nan)``) are translated to numexpr syntax.
+numexpr evaluates the whole expression in one pass over cache-sized blocks of the input arrays
+(no temporary array per operation) using several threads.
+Anything else (and transformations on small arrays) is evaluated with python's eval.
+Results have the dtype eval would give (found by evaluating the expression on one element of each input),
+transformations for which numexpr cannot give it are evaluated with eval.
+
+The evaluator is opt-in and requires the `numexpr` package; use :py:func:`enable_vectorised_evaluation`
+(or ``--numexpr-above`` option of the ``hepdata_maker`` command) to activate it.
+"""
+from .logs import logging
+log = logging.getLogger(__name__)
+import ast
+import functools
+import numpy as np
+from collections import Counter
+from typing import Any,Dict,List,Mapping,Optional,Tuple
+from .utils import compile_expression
+try:
+    import numexpr # type: ignore
+except ImportError:
+    numexpr=None
+
+# numpy functions (accessed as np.<name>) and builtins with numexpr equivalents
+NUMEXPR_FUNCTIONS={'sqrt':'sqrt','sin':'sin','cos':'cos','tan':'tan',
+                   'arcsin':'arcsin','arccos':'arccos','arctan':'arctan','arctan2':'arctan2',
+                   'sinh':'sinh','cosh':'cosh','tanh':'tanh',
+                   'arcsinh':'arcsinh','arccosh':'arccosh','arctanh':'arctanh',
+                   'exp':'exp','expm1':'expm1','log':'log','log10':'log10','log1p':'log1p',
+                   'abs':'abs','absolute':'abs','fabs':'abs','where':'where',
+                   'real':'real','imag':'imag','conj':'conj','conjugate':'conj',
+                   'floor':'floor','ceil':'ceil'}
+BUILTIN_FUNCTIONS={'abs':'abs'}
+# numpy equivalents of the numexpr functions, used to find the dtype of the result
+_NUMPY_EQUIVALENTS={function:getattr(np,function) for function in set(NUMEXPR_FUNCTIONS.values())}
+
+_BINARY_OPERATORS={ast.Add:'+',ast.Sub:'-',ast.Mult:'*',ast.Div:'/',ast.Pow:'**',ast.Mod:'%'}
+_UNARY_OPERATORS={ast.USub:'-',ast.UAdd:'+'}
+_COMPARE_OPERATORS={ast.Lt:'<',ast.LtE:'<=',ast.Gt:'>',ast.GtE:'>=',ast.Eq:'==',ast.NotEq:'!='}
+
+# Smallest number of elements for which numexpr is used; None: numexpr is not used
+_NUMEXPR_MIN_SIZE:Optional[int]=None
+
+# Which path the transformations took
+EVALUATION_PATHS:Counter=Counter()
+
+def enable_vectorised_evaluation(min_size:int=0,
+                                 n_threads:Optional[int]=None)->None:
+    """
+    Evaluate element-wise transformations on arrays of at least MIN_SIZE elements with numexpr.
+    Requires the `numexpr` package.
+
+    Args:
+      min_size: smaller arrays are evaluated (faster) with eval
+      n_threads: number of threads used by numexpr (numexpr default if not given)
+    """
+    global _NUMEXPR_MIN_SIZE
+    if(numexpr is None):
+        raise ImportError("Vectorised evaluation of transformations requires 'numexpr' package. Install it with `pip install hepdata_maker[numexpr]`.")
+    _NUMEXPR_MIN_SIZE=min_size
+    if(n_threads is not None):
+        numexpr.set_num_threads(n_threads)
+    log.debug(f"numexpr enabled for transformations of arrays of at least {min_size} elements, using {numexpr.get_num_threads()} threads.")
+
+def disable_vectorised_evaluation()->None:
+    """
+    Evaluate all transformations with eval.
+    """
+    global _NUMEXPR_MIN_SIZE
+    _NUMEXPR_MIN_SIZE=None
+
+def _attribute_chain(node:ast.AST)->Optional[Tuple[str,...]]:
+    # 'a.b.c' --> ('a','b','c')
+    if(isinstance(node,ast.Name)):
+        return (node.id,)
+    if(isinstance(node,ast.Attribute)):
+        chain=_attribute_chain(node.value)
+        return None if chain is None else chain+(node.attr,)
+    return None
+
+class _Translator():
+    def __init__(self,source:str):
+        self.source=source # parsed expression, used in error messages
+        self.operands:Dict[Tuple[str,...],str]={} # attribute chain --> numexpr variable name
+
+    def describe(self,node:ast.AST)->str:
+        # (ast.unparse is not available before python 3.9)
+        return ast.get_source_segment(self.source,node) or ast.dump(node)
+
+    def operand(self,chain:Tuple[str,...])->str:
+        if(chain not in self.operands):
+            self.operands[chain]=f"_v{len(self.operands)}"
+        return self.operands[chain]
+
+    def visit(self,node:ast.AST)->str:
+        if(isinstance(node,ast.Constant) and type(node.value) in (int,float,bool)):
+            return repr(node.value)
+        if(isinstance(node,(ast.Name,ast.Attribute))):
+            chain=_attribute_chain(node)
+            if(chain is None):
+                raise ValueError(f"unsupported operand '{self.describe(node)}'")
+            return self.operand(chain)
+        if(isinstance(node,ast.BinOp) and type(node.op) in _BINARY_OPERATORS):
+            return f"({self.visit(node.left)}{_BINARY_OPERATORS[type(node.op)]}{self.visit(node.right)})"
+        if(isinstance(node,ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS):
+            return f"({_UNARY_OPERATORS[type(node.op)]}{self.visit(node.operand)})"
+        if(isinstance(node,ast.Compare) and len(node.ops)==1 and type(node.ops[0]) in _COMPARE_OPERATORS):
+            return f"({self.visit(node.left)}{_COMPARE_OPERATORS[type(node.ops[0])]}{self.visit(node.comparators[0])})"
+        if(isinstance(node,ast.Call) and not node.keywords):
+            chain=_attribute_chain(node.func)
+            function=None
+            if(chain is not None and len(chain)==2 and chain[0]=='np'):
+                function=NUMEXPR_FUNCTIONS.get(chain[1])
+            elif(chain is not None and len(chain)==1):
+                function=BUILTIN_FUNCTIONS.get(chain[0])
+            if(function is not None):
+                return f"{function}({','.join(self.visit(arg) for arg in node.args)})"
+        raise ValueError(f"'{self.describe(node)}' is not supported by numexpr")
+
+@functools.lru_cache(maxsize=None)
+def translate_expression(source:str)->Tuple[Optional[str],Tuple[Tuple[str,Tuple[str,...]],...],str]:
+    """
+    Translate python expression SOURCE to numexpr syntax.
+
+    Args:
+      source: python expression (e.g. a transformation)
+
+    Returns:
+      (numexpr expression or None if it cannot be translated,
+      pairs of (numexpr variable name, python name split on '.'),
+      reason why the expression cannot be translated)
+    """
+    try:
+        tree=ast.parse(source.strip(),mode='eval')
+        translator=_Translator(source.strip())
+        expression=translator.visit(tree.body)
+    except (SyntaxError,ValueError,RecursionError) as exc:
+        return (None,(),str(exc))
+    return (expression,tuple((name,chain) for chain,name in translator.operands.items()),'')
+
+def _resolve(chain:Tuple[str,...],
+             global_vars:Mapping[str,Any],
+             local_vars:Mapping[str,Any])->Any:
+    if(chain[0] in local_vars):
+        value=local_vars[chain[0]]
+    elif(chain[0] in global_vars):
+        value=global_vars[chain[0]]
+    else:
+        raise KeyError(chain[0])
+    for attribute in chain[1:]:
+        value=getattr(value,attribute)
+    return value
+
+def try_vectorised_evaluation(source:str,
+                              global_vars:Mapping[str,Any],
+                              local_vars:Mapping[str,Any])->Tuple[bool,Any]:
+    """
+    Evaluate transformation SOURCE with numexpr if it is enabled and possible.
+    Each call is counted in :py:data:`EVALUATION_PATHS` ('numexpr' or 'eval').
+
+    Args:
+      source: python expression
+      global_vars: global names known to the expression
+      local_vars: local names known to the expression
+
+    Returns:
+      (True, result) if evaluated with numexpr,
+      (False, None) if the expression needs to be evaluated with eval
+    """
+    def fallback(reason:str)->Tuple[bool,Any]:
+        EVALUATION_PATHS['eval']+=1
+        log.debug(f"Transformation '{source}' evaluated with eval ({reason}).")
+        return (False,None)
+    if(_NUMEXPR_MIN_SIZE is None):
+        EVALUATION_PATHS['eval']+=1
+        return (False,None)
+    expression,operands,reason=translate_expression(source)
+    if(expression is None):
+        return fallback(reason)
+    values:Dict[str,Any]={}
+    size=0
+    for name,chain in operands:
+        try:
+            value=_resolve(chain,global_vars,local_vars)
+        except (KeyError,AttributeError):
+            return fallback(f"unknown name '{'.'.join(chain)}'")
+        if(isinstance(value,(bool,int,float,np.number,np.bool_))):
+            values[name]=value
+            continue
+        if(not isinstance(value,np.ndarray) or value.dtype.kind not in 'biufc'):
+            return fallback(f"'{'.'.join(chain)}' is not a numeric array")
+        values[name]=np.asarray(value) # numexpr needs plain ndarrays
+        size=max(size,value.size)
+    if(size==0 or size<_NUMEXPR_MIN_SIZE):
+        return fallback(f"fewer than {_NUMEXPR_MIN_SIZE} elements")
+    if('abs(' in expression and any(isinstance(value,np.ndarray) and value.dtype.kind in 'biu' for value in values.values())):
+        return fallback("numexpr gives float absolute values of integers")
+    try:
+        expected_dtype=result_dtype(expression,values)
+        result=numexpr.evaluate(expression,local_dict=values,global_dict={})
+    except Exception as exc:
+        return fallback(f"numexpr failed: {exc}")
+    if(result.dtype!=expected_dtype):
+        if(not np.can_cast(result.dtype,expected_dtype,casting='same_kind')):
+            return fallback(f"numexpr gives {result.dtype} instead of {expected_dtype}")
+        result=result.astype(expected_dtype)
+    EVALUATION_PATHS['numexpr']+=1
+    log.debug(f"Transformation '{source}' evaluated with numexpr as '{expression}'.")
+    return (True,result)
+
+def result_dtype(expression:str,
+                 values:Dict[str,Any])->np.dtype:
+    """
+    Find dtype of numexpr EXPRESSION evaluated with numpy (as eval would do),
+    using only the first element of each array in VALUES.
+
+    Args:
+      expression: expression in numexpr syntax (see :py:func:`translate_expression`)
+      values: numexpr variable name --> value
+    """
+    probe={name:(value.ravel()[:1] if isinstance(value,np.ndarray) else value) for name,value in values.items()}
+    with np.errstate(all='ignore'):
+        return np.asarray(eval(compile_expression(expression),dict(_NUMPY_EQUIVALENTS),probe)).dtype
+
+def evaluation_summary()->str:
+    """Human readable numbers of transformations evaluated with numexpr and eval."""
+    return f"Transformations evaluated: {EVALUATION_PATHS['numexpr']} with numexpr, {EVALUATION_PATHS['eval']} with eval."
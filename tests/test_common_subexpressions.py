@@ -0,0 +1,74 @@
+import pytest
+import numpy as np
+from hepdata_maker.common_subexpressions import SubexpressionCache
+from hepdata_maker.Submission import EvaluationNamespace,Table
+
+def test_shared_subexpressions():
+    expressions=["np.abs(nominal-up)*2","np.abs(nominal-up)/nominal","VAR*lumi","VAR*lumi","[x for x in np.abs(nominal-up)]"]
+    cache=SubexpressionCache(expressions)
+    # np.abs(nominal-up) (5 nodes saved, with nominal-up inside it) and VAR*lumi (2 nodes saved);
+    # comprehensions are left alone
+    assert len(cache)==3
+    assert cache.nodes_removed==7
+    namespace=EvaluationNamespace({"lumi":2.})
+    local_vars={"nominal":np.array([1.,2.]),"up":np.array([2.,5.]),"VAR":np.array([3.])}
+    for expression in expressions:
+        assert np.allclose(cache.evaluate(expression,namespace,local_vars),eval(expression,dict(namespace),local_vars))
+    assert cache.evaluations==3
+    assert cache.reuses==3
+    # the same expression in another scope is evaluated again
+    assert np.allclose(cache.evaluate("VAR*lumi",namespace,{"VAR":np.array([4.])}),[8.])
+    assert cache.evaluations==4
+
+def test_whole_expression_results_are_not_shared():
+    cache=SubexpressionCache(["x*2","x*2"])
+    local_vars={"x":np.arange(3)}
+    first=cache.evaluate("x*2",{},local_vars)
+    second=cache.evaluate("x*2",{},local_vars)
+    assert np.all(first==second)
+    assert not np.shares_memory(first,second)
+
+def test_shared_subexpressions_without_unparse(monkeypatch):
+    import ast
+    # python<3.9 has no ast.unparse, rewritten expressions are evaluated from their trees
+    monkeypatch.delattr(ast,"unparse",raising=False)
+    expressions=["np.abs(nominal-up)*2","np.abs(nominal-up)/nominal","x*2","x*2"]
+    cache=SubexpressionCache(expressions)
+    namespace=EvaluationNamespace({})
+    local_vars={"nominal":np.array([1.,2.]),"up":np.array([2.,5.]),"x":np.arange(3)}
+    for expression in expressions:
+        assert np.allclose(cache.evaluate(expression,namespace,local_vars),eval(expression,dict(namespace),local_vars))
+    assert cache.reuses==3
+
+def test_table_shares_subexpressions(caplog):
+    tab_steering={"name":"table",
+                  "variables":[{"name":"nominal","transformations":["np.array([1.,2.,3.])"]},
+                               {"name":"up","transformations":["nominal*1.1"]},
+                               {"name":"var","transformations":["nominal"],
+                                "errors":[{"name":f"syst{index}","transformations":[f"np.abs(nominal-up)*{index}"]} for index in range(1,4)]}]}
+    with caplog.at_level("DEBUG",logger="hepdata_maker.Submission"):
+        table=Table(tab_steering=tab_steering)
+    assert np.allclose(table.var.syst3,3*np.abs(table.nominal-table.up))
+    assert "2 shared subexpressions, 10 expression-tree nodes removed, 2 evaluated, 4 reused" in caplog.text
+
+def test_slices_are_not_shared():
+    expressions=["np.arange(6).reshape(3,2)[:,0]","np.arange(6.).reshape(3,2)[:,0]*2"]
+    cache=SubexpressionCache(expressions)
+    results=[cache.evaluate(expression,EvaluationNamespace(),{}) for expression in expressions]
+    assert results[0].tolist()==[0,2,4]
+    assert results[1].tolist()==[0.,4.,8.]
+
+def test_views_of_shared_values_are_copied():
+    expressions=["np.zeros(3)[1:]","np.zeros(3)[:2]"]
+    cache=SubexpressionCache(expressions)
+    first,second=[cache.evaluate(expression,EvaluationNamespace(),{}) for expression in expressions]
+    assert cache.reuses==1
+    assert not np.shares_memory(first,second)
+
+def test_impure_calls_are_not_shared():
+    expressions=["np.random.rand(3)*2","np.random.rand(3)*2","x.sum()+1","x.sum()*2"]
+    cache=SubexpressionCache(expressions)
+    assert len(cache)==1 # only x.sum()
+    first=cache.evaluate(expressions[0],EvaluationNamespace(),{})
+    second=cache.evaluate(expressions[1],EvaluationNamespace(),{})
+    assert not np.allclose(first,second)
@@ -0,0 +1,80 @@
+import pytest
+import os
+import numpy as np
+from hepdata_maker.Submission import Submission,Variable,Uncertainty
+from hepdata_maker.construction_cache import ConstructionCache,canonical_steering
+
+def test_canonical_steering():
+    assert canonical_steering({"b":[1,{"d":2,"c":3}],"a":"x"})==canonical_steering({"a":"x","b":[1,{"c":3,"d":2}]})
+    assert canonical_steering({"a":1})!=canonical_steering({"a":2})
+
+@pytest.fixture
+def shared_definitions(tmpdir):
+    data_file=tmpdir.join("mass.yaml")
+    data_file.write("mass: [100, 200, 300]\n")
+    mass={"name":"mass","in_files":[{"name":str(data_file),"decode":".mass[]"}],"data_type":"float"}
+    lumi={"name":"lumi","transformations":["np.full(3,0.017)"]}
+    xsec={"name":"xsec","transformations":["mass*2"],"errors":[lumi]}
+    tables=[{"name":f"table{index}","variables":[dict(mass),dict(xsec)]} for index in range(3)]
+    return data_file,tables
+
+def test_identical_definitions_are_built_once(shared_definitions):
+    data_file,tables=shared_definitions
+    submission=Submission()
+    submission.config={"type":"submission","tables":tables}
+    submission.load_table_config()
+    cache=submission.construction_cache
+    # mass and xsec (depending on the shared mass) are built only for the first table
+    assert (cache.hits,cache.misses)==(4,3)
+    assert "4 hits, 3 misses" in cache.summary()
+    table0,table2=submission.table0,submission.table2
+    assert np.all(table2.xsec==[200,400,600])
+    assert np.all(table2.xsec.lumi==table0.xsec.lumi)
+    # objects built once are not shared, changing one of them leaves the others unchanged
+    assert not np.shares_memory(table0.mass,table2.mass)
+    table0.mass[0]=150
+    assert np.all(table2.mass==[100,200,300])
+    table0.xsec.lumi[:]=0.
+    assert np.all(table2.xsec.lumi==0.017)
+    table0.xsec.add_uncertainty(Uncertainty(np.full(3,0.1),"extra"))
+    assert "extra" not in table2.xsec.get_uncertainty_names()
+    assert len(table2.xsec.steering_file_snippet()['errors'])==1
+    assert table2.xsec.uncertainties is not table0.xsec.uncertainties
+
+def test_changed_inputs_are_not_reused(shared_definitions):
+    data_file,tables=shared_definitions
+    cache=ConstructionCache()
+    mass=tables[0]['variables'][0]
+    build=lambda: Variable(var_steering=mass)
+    def key():
+        return cache.key('variable',mass,[],[mass['in_files'][0]['name']],{},{})
+    first=cache.get_or_build(key(),build)
+    assert cache.get_or_build(key(),build) is not first
+    assert cache.hits==1
+    data_file.write("mass: [100, 200, 300, 400]\n")
+    os.utime(str(data_file),ns=(0,0))
+    assert len(cache.get_or_build(key(),build))==4
+    assert cache.misses==2
+    # referenced objects are compared by identity, unknown names are not cached
+    assert cache.key('variable',{"name":"v"},["a*2"],[],{},{"a":np.arange(3)})!=cache.key('variable',{"name":"v"},["a*2"],[],{},{"a":np.arange(3)})
+    assert cache.key('variable',{"name":"v"},["unknown*2"],[],{},{}) is None
+
+def test_lazy_variables_from_cache(shared_definitions):
+    from hepdata_maker.Submission import LazyObject
+    data_file,tables=shared_definitions
+    submission=Submission()
+    submission.config={"type":"submission","tables":tables}
+    submission.load_table_config(lazy=True)
+    table0,table1=submission.table0,submission.table1
+    assert np.all(table1.xsec==[200,400,600])
+    table1.load_variables()
+    assert all(isinstance(unc,Uncertainty) for unc in table1.xsec.uncertainties)
+    assert isinstance(table1.xsec.lumi,Uncertainty)
+    # the uncertainty is built once, for both tables, each gets its own copy
+    misses=submission.construction_cache.misses
+    table0.xsec.load_uncertainties()
+    assert submission.construction_cache.misses==misses
+    assert isinstance(table0.xsec.lumi,Uncertainty)
+    assert table0.xsec.lumi is not table1.xsec.lumi
+    assert np.all(table0.xsec.lumi==table1.xsec.lumi)
+    assert submission.construction_cache.hits==2
@@ -0,0 +1,79 @@
+import pytest
+import os
+import multiprocessing
+from collections import OrderedDict
+from hepdata_maker import disk_cache
+from hepdata_maker import variable_loading
+import numpy as np
+
+@pytest.fixture
+def json_file(tmpdir):
+    path=tmpdir.join("input.json")
+    path.write('{"b":[1,2,3],"a":[4,5,6]}')
+    return str(path)
+
+def test_get_or_load_hits(tmpdir,json_file):
+    cache=disk_cache.DiskCache(tmpdir.join("cache"))
+    calls=[]
+    def loader():
+        calls.append(1)
+        return OrderedDict([("b",[1,2,3])])
+    first=cache.get_or_load(json_file,loader,'json')
+    second=cache.get_or_load(json_file,loader,'json')
+    assert first==second
+    assert list(second.keys())==["b"]
+    assert len(calls)==1
+    assert cache.stats()['hits']==1
+    assert cache.stats()['misses']==1
+    assert cache.hit_rate==pytest.approx(0.5)
+
+def test_content_change_invalidates(tmpdir,json_file):
+    cache=disk_cache.DiskCache(tmpdir.join("cache"))
+    cache.get_or_load(json_file,lambda: "old",'json')
+    with open(json_file,'w') as stream:
+        stream.write('{"b":[1,2,3,4]}')
+    assert cache.get_or_load(json_file,lambda: "new",'json')=="new"
+    # extra key parts are part of the key too
+    assert cache.get_or_load(json_file,lambda: "other",'yaml')=="other"
+
+def test_broken_entry_is_a_miss(tmpdir,json_file):
+    cache=disk_cache.DiskCache(tmpdir.join("cache"))
+    key=cache.key(json_file,'json')
+    cache.put(key,[1,2,3])
+    with open(cache._entry_path(key),'wb') as stream:
+        stream.write(b"not a pickle")
+    assert cache.get(key)==(False,None)
+    assert cache.get_or_load(json_file,lambda: [4],'json')==[4]
+    assert cache.get(key)==(True,[4])
+
+def _fill_cache(cache_dir,json_file):
+    cache=disk_cache.DiskCache(cache_dir)
+    for _ in range(20):
+        cache.get_or_load(json_file,lambda: list(range(1000)),'json')
+
+def test_concurrent_processes(tmpdir,json_file):
+    cache_dir=str(tmpdir.join("cache"))
+    processes=[multiprocessing.Process(target=_fill_cache,args=(cache_dir,json_file)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode==0
+    cache=disk_cache.DiskCache(cache_dir)
+    assert cache.get(cache.key(json_file,'json'))==(True,list(range(1000)))
+    assert not any(name.startswith('.tmp-') for _,_,files in os.walk(cache_dir) for name in files)
+
+def test_open_data_file_uses_disk_cache(tmpdir,json_file):
+    cache=disk_cache.enable_disk_cache(tmpdir.join("cache"))
+    try:
+        variable_loading._open_data_file_cached.cache_clear()
+        data=variable_loading.open_data_file(json_file,'json')
+        variable_loading._open_data_file_cached.cache_clear()
+        data_cached=variable_loading.open_data_file(json_file,'json')
+        assert data==data_cached
+        assert list(data_cached.keys())==["b","a"]
+        assert cache.hits==1
+        assert np.all(variable_loading.get_array_from_json(json_file,".a[]")==[4,5,6])
+    finally:
+        disk_cache.disable_disk_cache()
+        variable_loading._open_data_file_cached.cache_clear()
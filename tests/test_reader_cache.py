@@ -0,0 +1,71 @@
+import pytest
+import os
+import numpy as np
+from hepdata_maker import reader_cache
+from hepdata_maker import variable_loading
+
+@pytest.fixture
+def data_files(tmpdir):
+    paths=[]
+    for index in range(3):
+        path=tmpdir.join(f"input_{index}.json")
+        path.write(f'{{"values":[{index},{index+1}]}}')
+        paths.append(str(path))
+    return paths
+
+def test_hits_and_misses(data_files):
+    cache=reader_cache.ReaderCache(budget=10**6)
+    calls=[]
+    def loader():
+        calls.append(1)
+        return np.zeros(10)
+    for _ in range(3):
+        cache.get_or_load("test",data_files[0],(),loader)
+    assert len(calls)==1
+    assert cache.hits==2 and cache.misses==1
+    assert cache.resident_bytes>=80
+    assert cache.cache_info("test").currsize==1
+    # other extra arguments give a separate entry
+    cache.get_or_load("test",data_files[0],("other",),loader)
+    assert len(calls)==2
+
+def test_budget_eviction(data_files):
+    array_size=reader_cache.estimate_size(np.zeros(1000))
+    cache=reader_cache.ReaderCache(budget=int(2.5*array_size))
+    for path in data_files:
+        cache.get_or_load("test",path,(),lambda: np.zeros(1000))
+    assert len(cache)==2
+    assert cache.evictions==1
+    assert cache.resident_bytes<=cache.budget
+    # least recently used (first) file was evicted
+    cache.get_or_load("test",data_files[0],(),lambda: np.zeros(1000))
+    assert cache.misses==4
+    # objects larger than the budget are not cached
+    cache.get_or_load("test",data_files[0],("big",),lambda: np.zeros(10000))
+    assert cache.cache_info("test").currsize==2
+    cache.set_budget(0)
+    assert len(cache)==0 and cache.resident_bytes==0
+
+def test_invalidation_on_change(data_files):
+    cache=reader_cache.ReaderCache()
+    assert cache.get_or_load("test",data_files[0],(),lambda: "old")=="old"
+    with open(data_files[0],'a') as stream:
+        stream.write(" ")
+    assert cache.get_or_load("test",data_files[0],(),lambda: "new")=="new"
+    assert cache.invalidations==1
+
+def test_estimate_size():
+    array=np.zeros(1000)
+    assert reader_cache.estimate_size(array)>=8000
+    # views do not count the data twice
+    assert reader_cache.estimate_size([array,array[10:]])<reader_cache.estimate_size(array)+1000
+    assert reader_cache.estimate_size({"a":[1,2,3],"b":"text"})>0
+
+def test_open_data_file_sees_file_changes(data_files):
+    assert variable_loading.open_data_file(data_files[1],'json')["values"]==[1,2]
+    stat=os.stat(data_files[1])
+    with open(data_files[1],'w') as stream:
+        stream.write('{"values":[10,20,30]}')
+    os.utime(data_files[1],ns=(stat.st_atime_ns,stat.st_mtime_ns+10**9))
+    assert variable_loading.open_data_file(data_files[1],'json')["values"]==[10,20,30]
+    assert variable_loading._open_data_file_cached.cache_info().misses>=2
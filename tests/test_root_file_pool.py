@@ -0,0 +1,80 @@
+import pytest
+from hepdata_maker.root_file_pool import RootFilePool
+from hepdata_maker import root_file_pool
+from hepdata_maker import variable_loading
+
+def test_pool_reuses_open_files(datadir):
+    pool=RootFilePool(max_open_files=1)
+    file_path=str(datadir.join("input_example4.root"))
+    with pool.open(file_path) as root_file:
+        first=root_file.uproot_file
+    with pool.open(file_path) as root_file:
+        assert root_file.uproot_file is first
+    assert pool.stats()['opens']==1
+    assert pool.stats()['hits']==1
+
+def test_pool_eviction_and_refcount(datadir):
+    pool=RootFilePool(max_open_files=1)
+    file1=str(datadir.join("input_example4.root"))
+    file2=str(datadir.join("input_example4_copy.root"))
+    entry1=pool.acquire(file1)
+    entry1.uproot_file
+    with pool.open(file2) as entry2:
+        entry2.uproot_file
+        # file1 is still in use, so both need to stay open
+        assert len(pool)==2
+        assert pool.evictions==0
+    assert len(pool)==1 # file2 released and evicted as the least recently used not in use
+    assert pool.evictions==1
+    pool.release(file1)
+    assert entry1.is_open
+    pool.close_all()
+    assert not entry1.is_open
+    assert len(pool)==0
+    with pytest.raises(ValueError):
+        RootFilePool(max_open_files=0)
+
+def test_root_helpers_share_the_pool(datadir,monkeypatch):
+    pool=RootFilePool()
+    monkeypatch.setattr(variable_loading,'ROOT_FILE_POOL',pool)
+    variable_loading.get_list_of_objects_in_root_file.cache_clear()
+    variable_loading.get_object_class.cache_clear()
+    file_path=str(datadir.join("input_example4.root"))
+    assert variable_loading.check_if_file_exists_and_readable(file_path)
+    assert 'test_histo1;1' in variable_loading.get_list_of_objects_in_root_file(file_path)
+    assert variable_loading.get_object_class(file_path,'test_histo1')=='TH1F'
+    assert pool.stats()['opens']==1
+    assert pool.stats()['hits']==2
+
+def test_lazy_open_is_thread_safe(datadir):
+    from concurrent.futures import ThreadPoolExecutor
+    pool=RootFilePool()
+    file_path=str(datadir.join("input_example4.root"))
+    with pool.open(file_path) as root_file:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            files=list(executor.map(lambda _: root_file.uproot_file,range(32)))
+    assert all(f is files[0] for f in files)
+    assert pool.stats()['opens']==1
+
+def test_changed_files_get_new_handles(datadir):
+    import os
+    import shutil
+    pool=RootFilePool()
+    file_path=str(datadir.join("input_example4.root"))
+    entry=pool.acquire(file_path)
+    entry.uproot_file
+    # file replaced on disk while in use
+    shutil.copyfile(str(datadir.join("input_example4_copy.root")),file_path)
+    os.utime(file_path,ns=(0,0))
+    with pool.open(file_path) as new_entry:
+        assert new_entry is not entry
+        new_entry.uproot_file
+    assert entry.is_open and len(pool)==2
+    pool.release(entry)
+    # the old handle is closed once it is not used
+    assert not entry.is_open and len(pool)==1
+    with pool.open(file_path) as root_file:
+        assert root_file is new_entry
+    assert pool.stats()['opens']==2
+    pool.close_all()
+    assert len(pool)==0
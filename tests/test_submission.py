@@ -328,3 +328,148 @@ def test_create_hepdata_record(datadir,tmp_path,sub_ex1,submission_file):
         assert (tmp_path/'submission_files').is_dir()
         assert (tmp_path/'submission.tar.gz').is_file()
     """
+
+@pytest.fixture
+def shared_input_config(tmpdir):
+    data_file=tmpdir.join("shared_input.yaml")
+    data_file.write("values: [1, 2, 3]\nerr_up: [0.1, 0.2, 0.3]\nerr_down: [0.2, 0.2, 0.2]\n")
+    in_file={"name":str(data_file),"decode":".values[]"}
+    errors=[{"name":"sym","in_files":[{"name":str(data_file),"decode":".err_up[]"}]},
+            {"name":"asym","in_files":[{"name":str(data_file),"decode_up":".err_up[]","decode_down":".err_down[]"}]}]
+    return {"tables":[{"name":"table1","variables":[{"name":"var1","in_files":[in_file],"errors":errors},
+                                                      {"name":"var2","in_files":[in_file]}]},
+                      {"name":"table2","variables":[{"name":"var1","in_files":[in_file]}]}]}
+
+def test_plan_table_reads(shared_input_config):
+    from hepdata_maker.Submission import plan_table_reads
+    read_plan=plan_table_reads(shared_input_config['tables'])
+    assert read_plan.n_requested==6
+    assert len(read_plan)==3 # only unique decodes are kept
+    read_plan.execute()
+    data_file=shared_input_config['tables'][0]['variables'][0]['in_files'][0]['name']
+    for _ in range(3): # '.values[]' is requested by three variables
+        assert np.all(read_plan.get(data_file,".values[]")==[1,2,3])
+    # values are released after their last planned read
+    assert read_plan.get(data_file,".values[]") is None
+    assert len(read_plan._results)==2
+    read_plan=plan_table_reads(shared_input_config['tables'],selected_table_names=[('table2',True)])
+    assert read_plan.n_requested==1
+
+def test_plan_table_reads_uncertainty_data_type(shared_input_config):
+    from hepdata_maker.Submission import plan_table_reads
+    variable=shared_input_config['tables'][0]['variables'][0]
+    variable['data_type']='float'
+    variable['errors'][0]['data_type']='float'
+    read_plan=plan_table_reads(shared_input_config['tables'])
+    read_plan.execute()
+    data_file=variable['in_files'][0]['name']
+    # uncertainties are read as they are (data_type is applied later), as requested by Uncertainty
+    assert np.all(read_plan.get(data_file,".err_up[]")==[0.1,0.2,0.3])
+    assert np.all(read_plan.get(data_file,".values[]",data_type='float')==[1,2,3])
+
+def test_load_table_config_uses_read_plan(shared_input_config,sub_ex1):
+    from hepdata_maker import variable_loading
+    sub_ex1._config=shared_input_config # decode_up/decode_down are not (yet) part of the schema
+    variable_loading._open_data_file_cached.cache_clear()
+    sub_ex1.load_table_config()
+    assert variable_loading._open_data_file_cached.cache_info().misses==1
+    var1=sub_ex1.table1.var1
+    assert np.all(var1==[1,2,3])
+    assert np.all(var1.asym==[[0.1,0.2],[0.2,0.2],[0.3,0.2]])
+    # Variables sharing the same decode do not share memory
+    assert not np.shares_memory(sub_ex1.table1.var1,sub_ex1.table2.var1)
+
+def test_config_raises_on_invalid_expressions(sub_ex1):
+    variable={"name":"var1","transformations":["[1,2]","np.array([1,2]"],
+              "errors":[{"name":"err","transformations":["var1*0.1"]},
+                        {"name":"err2","transformations":["var1*"]}]}
+    with pytest.raises(SyntaxError) as exc_info:
+        sub_ex1.config={"type":"submission","tables":[{"name":"table1","variables":[variable]}]}
+    message=str(exc_info.value)
+    assert "np.array([1,2]" in message
+    assert "error 'err2'" in message
+    assert "var1*0.1" not in message # valid expressions are not reported
+
+def test_transformations_are_compiled_once(sub_ex1):
+    from hepdata_maker import utils
+    tables=[{"name":f"table{index}","variables":[{"name":"var","transformations":["np.arange(3)*2"]}]} for index in range(3)]
+    utils.compile_expression.cache_clear()
+    sub_ex1.config={"type":"submission","tables":tables}
+    sub_ex1.load_table_config()
+    cache_info=utils.compile_expression.cache_info()
+    assert cache_info.misses==1
+    assert cache_info.hits>=3
+    assert np.all(sub_ex1.table2.var==[0,2,4])
+
+def test_evaluation_namespace(sub_ex1):
+    variables=[{"name":"var1","transformations":["np.array([1.,2.])"],
+                "errors":[{"name":f"err{index}","transformations":[f"var1*0.{index+1}" if index==0 else f"err{index-1}*2"]} for index in range(5)]},
+               {"name":"var2","transformations":["var1+var1.err4"]}]
+    sub_ex1.config={"type":"submission","tables":[{"name":"table1","variables":variables},
+                                                  {"name":"table2","variables":[{"name":"var1","transformations":["table1.var2*2"]}]}]}
+    namespace=sub_ex1.namespace
+    sub_ex1.load_table_config()
+    # the namespace is the same object, updated as tables are added
+    assert sub_ex1.namespace is namespace
+    assert namespace['table1'] is sub_ex1.table1
+    assert namespace['np'] is np
+    assert np.allclose(sub_ex1.table1.var1.err4,[1.6,3.2])
+    assert np.allclose(sub_ex1.table2.var1,[5.2,10.4])
+    sub_ex1.delete_table("table2")
+    assert "table2" not in namespace
+
+def test_fix_zero_error():
+    from hepdata_maker.Submission import fix_zero_error,fixed_zero_error_values
+    var=Variable(np.array([0.,1.,0.,0.]),"var")
+    sym=Uncertainty(np.array([0.,0.,0.,0.1]),"sym")
+    asym=Uncertainty(np.array([[0.,0.],[0.,0.],[0.2,0.],[0.,0.]]),"asym")
+    var.add_uncertainty(sym)
+    var.add_uncertainty(asym)
+    need_fix=fix_zero_error(var)
+    assert need_fix.dtype==bool
+    assert need_fix.tolist()==[True,False,False,False]
+    assert fixed_zero_error_values(sym,need_fix)==['',0.,0.,0.1]
+    assert fixed_zero_error_values(asym,need_fix)==[('',''),[0.,0.],[0.2,0.],[0.,0.]]
+    # non-numeric variables are left alone
+    assert not fix_zero_error(Variable(np.array(['0','a']),"labels")).any()
+
+def test_lazy_forward_reference(sub_ex1):
+    variables=[{"name":"var1","transformations":["var2*2"]},
+               {"name":"var2","transformations":["np.array([1.,2.])"]}]
+    sub_ex1.config={"type":"submission","tables":[{"name":"table1","variables":variables}]}
+    # a variable cannot use one defined after it
+    with pytest.raises(NameError):
+        sub_ex1.load_table_config()
+    sub_ex1.load_table_config(lazy=True)
+    # the same holds when the variables are built lazily (later variables are not visible)
+    with pytest.raises(NameError):
+        sub_ex1.table1.var1.load()
+    assert np.all(sub_ex1.table1.var2==[1.,2.])
+
+def test_lazy_load_table_config(sub_ex1):
+    from hepdata_maker.Submission import LazyObject,get_load_state,add_rich_state_tree_from_table
+    variables=[{"name":"var1","transformations":["np.array([1.,2.])"],
+                "errors":[{"name":"err1","transformations":["var1*0.1"]},
+                          {"name":"err2","transformations":["err1*2"]}]},
+               {"name":"var2","transformations":["var1+var1.err2"]},
+               {"name":"broken","transformations":["unknown_name*2"]}]
+    sub_ex1.config={"type":"submission","tables":[{"name":"table1","variables":variables},
+                                                  {"name":"table2","variables":[{"name":"var1","transformations":["table1.var2*2"]}]}]}
+    sub_ex1.load_table_config(lazy=True)
+    table1=sub_ex1.table1
+    assert table1.get_variable_names()==["var1","var2","broken"]
+    assert all(get_load_state(var)=='pending' for var in table1.variables)
+    # another table's variable builds only what it needs
+    assert np.allclose(sub_ex1.table2.var1,[2.4,4.8])
+    assert [get_load_state(var) for var in table1.variables]==['loaded','loaded','pending']
+    assert isinstance(table1.var1,Variable)
+    assert [get_load_state(unc) for unc in table1.var1.uncertainties]==['loaded','loaded']
+    with pytest.raises(NameError):
+        table1.broken.load()
+    assert table1.broken.state=='failed'
+    assert isinstance(table1.variables[2],LazyObject)
+    tree=add_rich_state_tree_from_table(table1)
+    assert "failed" in str(tree.children[2].label)
+    # building everything re-raises the failure
+    with pytest.raises(NameError):
+        table1.load_variables()
@@ -115,3 +115,23 @@ def test_uncertainty_constructor_steering_file(datadir,unc_steering,global_varia
 def test_uncertainty_constructor_raise_TypeError(error_data,error_name):
     with pytest.raises(TypeError):
         Uncertainty(error_data,error_name)
+
+def test_uncertainty_glob_in_files(tmpdir):
+    for index in (1,2):
+        tmpdir.join(f"unc_{index}.csv").write(f"up,down\n{index},-{index}\n")
+    unc=Uncertainty(unc_steering={"name":"test_unc",
+                                  "in_files":[{"name":str(tmpdir.join("unc_?.csv")),
+                                               "decode_up":"up",
+                                               "decode_down":"down"}],
+                                  "data_type":"float"})
+    assert unc.is_symmetric==False
+    assert np.all(unc==[[1,-1],[2,-2]])
+
+def test_uncertainty_missing_entries_with_data_type(tmpdir):
+    json_file=tmpdir.join("errors.json")
+    json_file.write('{"stat": [1, null, 2]}')
+    unc=Uncertainty(unc_steering={"name":"stat",
+                                  "in_files":[{"name":str(json_file),"decode":".stat[]"}],
+                                  "data_type":"float"})
+    assert unc.dtype==np.float64
+    assert unc.tolist()==[1.,0.,2.]
@@ -0,0 +1,45 @@
+import pytest
+import json
+from hepdata_maker import utils
+
+def make_tables():
+    return [{"name":"base","variables":[{"name":"x","transformations":["np.arange(3)"]}]},
+            {"name":"derived","variables":[{"name":"y","transformations":["base.x*2"],
+                                            "errors":[{"name":"stat","transformations":["np.sqrt(y)"]}]}]},
+            {"name":"other","variables":[{"name":"z","transformations":["[v*2 for v in derived.y]"],
+                                          "regions":[{"name":"SR","matching":["z>1"]}]}]},
+            {"name":"unused","variables":[{"name":"u","transformations":["[1,2,3]"]}]}]
+
+def test_get_expression_names():
+    assert utils.get_expression_names("np.where(VAR>0,VAR,nan)")=={"np","VAR","nan"}
+    assert utils.get_expression_names("[x*scale for x in table.var]")=={"scale","table"}
+    assert utils.get_expression_names("(lambda a: a+b)(c)")=={"b","c"}
+
+def test_table_dependencies():
+    dependencies=utils.get_table_dependencies(make_tables())
+    assert dependencies=={"base":[],"derived":["base"],"other":["derived"],"unused":[]}
+    assert utils.resolve_table_dependencies(dependencies,["other"])==["base","derived","other"]
+    assert utils.resolve_table_dependencies(dependencies,["unused","derived"])==["unused","base","derived"]
+
+def test_table_dependencies_raise(caplog):
+    tables=make_tables()
+    tables[0]["variables"][0]["transformations"]=["other.z+1"]
+    with pytest.raises(ValueError,match="derived -> base -> other -> derived"):
+        utils.resolve_table_dependencies(utils.get_table_dependencies(tables),["derived","base"])
+    tables[3]["variables"][0]["transformations"]=["missing*2"]
+    # unknown names are only reported
+    dependencies=utils.get_table_dependencies(tables)
+    assert dependencies["unused"]==[]
+    assert "unknown name 'missing'" in caplog.text
+
+def test_requested_table_list_with_dependencies(tmpdir):
+    steering_file=tmpdir.join("steering.json")
+    tables=make_tables()
+    tables[3]["should_be_processed"]=False
+    steering_file.write(json.dumps({"type":"submission","tables":tables}))
+    assert utils.get_requested_table_list(str(steering_file),False,[],["other"])==[("other",True),("base",True),("derived",True)]
+    assert utils.get_requested_table_list(str(steering_file),False,[],["other"],include_dependencies=False)==[("other",True)]
+    tables[1]["variables"][0]["transformations"]=["missing.y*2"]
+    steering_file.write(json.dumps({"type":"submission","tables":tables}))
+    assert utils.get_requested_table_list(str(steering_file),True,[],[])==[(table["name"],table.get("should_be_processed",True)) for table in tables]
+    assert utils.get_requested_table_list(str(steering_file),False,[],["derived"])==[("derived",True)]
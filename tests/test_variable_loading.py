@@ -15,3 +15,270 @@ def test_jq_behaviour_modification(datadir):
     yaml_out_1=get_array_from_yaml(submission_file,"keys")
     yaml_out_2=get_array_from_yaml(submission_file,"keys | .[]")
     assert np.all(yaml_out_1==yaml_out_2)
+
+def test_jq_program_and_input_caches(datadir):
+    from hepdata_maker import variable_loading
+    variable_loading.compile_jq_program.cache_clear()
+    variable_loading._open_data_file_cached.cache_clear()
+    for file_name,reader in [("jq_mod_test.json",get_array_from_json),("jq_mod_test.yaml",get_array_from_yaml)]:
+        submission_file=datadir.join(file_name)
+        first=reader(submission_file,"keys | .[]")
+        second=reader(submission_file,"keys | .[]")
+        assert np.all(first==second)
+    info=variable_loading.get_jq_cache_info()
+    assert info['compile']['misses']==1
+    assert info['compile']['hits']==3
+    assert info['input']['misses']==2
+    assert info['input']['hits']==2
+
+def test_csv_columns(tmpdir):
+    from hepdata_maker import variable_loading
+    from hepdata_maker.variable_loading import get_array_from_csv
+    csv_file=tmpdir.join("columns.csv")
+    csv_file.write("mass;xsec;label;partial\n100;1.5;SRA;1\n200;2e-3;SRB\n")
+    variable_loading.open_csv_columns.cache_clear()
+    mass=get_array_from_csv(csv_file,"mass",delimiter=";")
+    xsec=get_array_from_csv(csv_file,"xsec",delimiter=";",data_type="float")
+    label=get_array_from_csv(csv_file,"label",delimiter=";")
+    partial=get_array_from_csv(csv_file,"partial",delimiter=";")
+    assert mass.dtype.kind=='i' and np.all(mass==[100,200])
+    assert xsec.dtype.kind=='f' and np.all(xsec==[1.5,2e-3])
+    assert np.all(label==['SRA','SRB'])
+    assert partial.tolist()==['1',None]
+    # text changed by conversion is kept without data_type
+    assert get_array_from_csv(csv_file,"xsec",delimiter=";").tolist()==['1.5','2e-3']
+    assert variable_loading._csv_column_to_array(['01','2']).tolist()==['01','2']
+    assert variable_loading._csv_column_to_array(['1e3','-0.5']).tolist()==['1e3','-0.5']
+    assert variable_loading._csv_column_to_array(['1000.0','-0.5']).tolist()==[1000.,-0.5]
+    info=variable_loading.open_csv_columns.cache_info()
+    assert info.misses==1 and info.hits==4
+    with pytest.raises(TypeError):
+        get_array_from_csv(csv_file,"not_a_column",delimiter=";")
+
+def test_yaml_ordered_safe_load():
+    import io
+    import yaml
+    from collections import OrderedDict
+    from hepdata_maker.variable_loading import yaml_ordered_safe_load, yaml_ordered_safe_load_all, get_ordered_safe_loader
+    if(yaml.__with_libyaml__):
+        assert issubclass(get_ordered_safe_loader(),yaml.CSafeLoader)
+    text="zeta: 1\nalpha:\n  beta: [1, 2]\n  aaa: 3\n"
+    loaded=yaml_ordered_safe_load(io.StringIO(text))
+    assert isinstance(loaded,OrderedDict)
+    assert list(loaded.keys())==["zeta","alpha"]
+    assert list(loaded["alpha"].keys())==["beta","aaa"]
+    assert loaded==yaml.safe_load(text)
+    documents=list(yaml_ordered_safe_load_all(io.StringIO(text+"---\nb: 2\na: 1\n")))
+    assert len(documents)==2
+    assert list(documents[1].keys())==["b","a"]
+    with pytest.raises(yaml.constructor.ConstructorError):
+        yaml_ordered_safe_load(io.StringIO("!!python/object:os.system {}"))
+
+def test_tex_table_cache(tmpdir):
+    from hepdata_maker import variable_loading
+    tex_file=tmpdir.join("table.tex")
+    tex_file.write("\\begin{tabular}{cc}\n\\hline\na & b \\\\\n% comment\n1.0 & 2.0 \\\\\n\\hline\n\\end{tabular}\n")
+    decode="latex.find_all(['tabular'])[0]"
+    variable_loading._get_table_from_tex_cached.cache_clear()
+    soup=variable_loading.open_data_file(tex_file,"tex")
+    tabular_string=str(soup.find_all(['tabular'])[0].expr.string)
+    table=variable_loading.get_table_from_tex(tex_file,decode,{'b':'c'})
+    assert table.tolist()==[['a','c'],['1.0','2.0']]
+    # cached soup is not modified
+    assert str(soup.find_all(['tabular'])[0].expr.string)==tabular_string
+    # returned table is a copy of the cached one
+    table[0,0]='changed'
+    table_again=variable_loading.get_table_from_tex(tex_file,decode,{'b':'c'})
+    assert table_again[0,0]=='a'
+    assert variable_loading._get_table_from_tex_cached.cache_info().hits==1
+    # different replace_dict gives different table
+    assert variable_loading.get_table_from_tex(tex_file,decode,{})[0,1]=='b'
+
+def test_json_streaming(tmpdir):
+    pytest.importorskip("ijson")
+    from hepdata_maker import variable_loading
+    json_file=tmpdir.join("grid.json")
+    json_file.write('{"grid":{"points":[{"m":100,"xsec":1.5,"info":{"name":"a"}},{"m":200.0,"xsec":0.25,"info":{"name":"b"}},{"m":300}]},"other":[1,2]}')
+    assert variable_loading.parse_simple_json_path(".grid.points[].info.name")==(["grid","points"],["info","name"])
+    assert variable_loading.parse_simple_json_path(".[]")==([],[])
+    assert variable_loading.parse_simple_json_path(".grid.points[] | .m") is None
+    for decode in [".grid.points[].m",".grid.points[].xsec",".grid.points[].info.name",".other[]"]:
+        streamed=variable_loading.stream_array_from_json(json_file,decode)
+        eager=get_array_from_json(json_file,decode)
+        assert streamed.dtype==eager.dtype
+        assert streamed.tolist()==eager.tolist()
+    # objects are not iterated in the streaming mode
+    assert variable_loading.stream_array_from_json(json_file,".grid[]") is None
+    assert variable_loading.stream_array_from_json(json_file,".grid.points[] | .m") is None
+    variable_loading.enable_json_streaming(0)
+    try:
+        assert variable_loading.use_json_streaming(json_file)
+        assert get_array_from_json(json_file,".grid.points[].m").tolist()==[100,200,300]
+        assert get_array_from_json(json_file,".grid.points | length").tolist()==[3]
+    finally:
+        variable_loading.disable_json_streaming()
+    memory=variable_loading.compare_json_memory_usage(json_file,".grid.points[].m")
+    assert set(memory.keys())=={"eager","streaming"}
+
+def test_npy_npz_files(tmpdir):
+    from hepdata_maker import variable_loading
+    from hepdata_maker.variable_loading import read_data_file, check_if_file_exists_and_readable
+    grid=np.arange(12,dtype=float).reshape(4,3)
+    npy_file=str(tmpdir.join("grid.npy"))
+    np.save(npy_file,grid)
+    values=read_data_file(npy_file,"[:,1]")
+    assert values.tolist()==[1.,4.,7.,10.]
+    assert not values.flags.writeable
+    assert np.shares_memory(values,variable_loading.open_data_file(npy_file,'npy'))
+    assert read_data_file(npy_file,"").shape==(4,3)
+    assert read_data_file(npy_file,"[1:3,...]").tolist()==grid[1:3].tolist()
+    assert check_if_file_exists_and_readable(npy_file)
+
+    for save in [np.savez,np.savez_compressed]:
+        npz_file=str(tmpdir.join(f"arrays_{save.__name__}.npz"))
+        save(npz_file,grid=grid,labels=np.array(["a","b","c"]))
+        assert variable_loading.get_npz_keys(npz_file)==["grid","labels"]
+        assert read_data_file(npz_file,"grid[::2, -1]").tolist()==[2.,8.]
+        assert read_data_file(npz_file,"labels").tolist()==["a","b","c"]
+        assert not read_data_file(npz_file,"grid").flags.writeable
+        assert check_if_file_exists_and_readable(npz_file)
+        with pytest.raises(KeyError):
+            read_data_file(npz_file,"not_there")
+    # uncompressed arrays are memory-mapped
+    assert isinstance(variable_loading.load_npz_member(str(tmpdir.join("arrays_savez.npz")),"grid"),np.memmap)
+    # arrays of npz files are loaded only when accessed
+    npz_file=str(tmpdir.join("arrays_savez.npz"))
+    variable_loading.open_npz_member.cache_clear()
+    assert check_if_file_exists_and_readable(npz_file)
+    arrays=variable_loading.parse_data_file(npz_file,'npz')
+    assert list(arrays)==["grid","labels"]
+    assert variable_loading.open_npz_member.cache_info().misses==0
+    assert arrays["grid"].shape==(4,3)
+    with pytest.raises(KeyError):
+        arrays["not_there"]
+
+    assert variable_loading.parse_array_index("[1:, 0, ...]")==(slice(1,None),0,Ellipsis)
+    with pytest.raises(ValueError):
+        variable_loading.parse_array_index("[__import__('os')]")
+
+@pytest.mark.parametrize("max_processes",[0,2])
+def test_read_plan_prefetch(tmpdir,max_processes):
+    from hepdata_maker import variable_loading
+    from hepdata_maker.reader_cache import READER_CACHE
+    READER_CACHE.clear()
+    read_plan=variable_loading.ReadPlan()
+    for index in range(2):
+        yaml_file=tmpdir.join(f"input_{index}.yaml")
+        yaml_file.write(f"values: [{index}, 2]\n")
+        read_plan.add_request(str(yaml_file),".values[]")
+        tex_file=tmpdir.join(f"table_{index}.tex")
+        tex_file.write(f"\\begin{{tabular}}{{cc}}\na & b \\\\\n{index} & 2 \\\\\n\\end{{tabular}}\n")
+        read_plan.add_request(str(tex_file),"table[1:,0]",tabular_loc_decode="latex.find_all(['tabular'])[0]")
+    csv_file=tmpdir.join("input.csv")
+    csv_file.write("a;b\n1;2\n")
+    read_plan.add_request(str(csv_file),"a",delimiter=";")
+    read_plan.add_request(str(tmpdir.join("missing.json")),".a")
+    variable_loading.shutdown_prefetch_processes()
+    read_plan.prefetch(max_threads=2,max_processes=max_processes,process_min_bytes=0)
+    for index in range(2):
+        assert variable_loading._open_data_file_cached.cache_key(str(tmpdir.join(f"input_{index}.yaml")),'yaml') in READER_CACHE
+    assert variable_loading._get_table_from_tex_cached.cache_info().currsize==2
+    assert variable_loading.open_csv_columns.cache_info().currsize==1
+    misses=READER_CACHE.misses
+    read_plan.execute()
+    assert READER_CACHE.misses==misses
+    assert read_plan.get(str(tmpdir.join("input_1.yaml")),".values[]").tolist()==[1,2]
+    assert read_plan.get(str(tmpdir.join("table_1.tex")),"table[1:,0]",tabular_loc_decode="latex.find_all(['tabular'])[0]").tolist()==['1']
+    # the pool of processes is kept for later prefetches
+    started=variable_loading._PREFETCH_PROCESS_POOL
+    assert (started is not None)==(max_processes>0)
+    if(started is not None):
+        assert variable_loading._get_prefetch_process_pool(max_processes) is started
+    variable_loading.shutdown_prefetch_processes()
+    # small files are parsed by threads, no processes are started for them
+    READER_CACHE.clear()
+    read_plan.prefetch(max_threads=2,max_processes=2)
+    assert variable_loading._PREFETCH_PROCESS_POOL is None
+    assert variable_loading._open_data_file_cached.cache_key(str(tmpdir.join("input_0.yaml")),'yaml') in READER_CACHE
+
+def test_check_file_sniff(tmpdir,datadir):
+    from hepdata_maker import variable_loading
+    from hepdata_maker.variable_loading import check_if_file_exists_and_readable
+    json_file=str(datadir.join("jq_mod_test.json"))
+    yaml_file=str(datadir.join("jq_mod_test.yaml"))
+    for sniff in [True,False]:
+        assert check_if_file_exists_and_readable(json_file,sniff=sniff)
+        assert check_if_file_exists_and_readable(yaml_file,sniff=sniff)
+    npy_file=str(tmpdir.join("array.npy"))
+    np.save(npy_file,np.arange(3))
+    assert check_if_file_exists_and_readable(npy_file,sniff=True)
+    not_json=tmpdir.join("not_json.json")
+    not_json.write("just some text")
+    assert not check_if_file_exists_and_readable(str(not_json),sniff=True)
+    assert not check_if_file_exists_and_readable(str(not_json))
+    binary=tmpdir.join("binary.root")
+    binary.write_binary(b"\x00\x01\x02")
+    assert not check_if_file_exists_and_readable(str(binary),sniff=True)
+    binary_tex=tmpdir.join("binary.tex")
+    binary_tex.write_binary(b"\\begin{tabular}\x00")
+    assert not check_if_file_exists_and_readable(str(binary_tex),sniff=True)
+    assert not check_if_file_exists_and_readable(str(tmpdir.join("missing.json")),sniff=True)
+    assert not check_if_file_exists_and_readable(str(tmpdir.join("missing.png")))
+    # full check parses the file into the reader cache
+    variable_loading._open_data_file_cached.cache_clear()
+    assert check_if_file_exists_and_readable(yaml_file)
+    variable_loading.open_data_file(yaml_file,'yaml')
+    assert variable_loading._open_data_file_cached.cache_info().hits==1
+
+def test_typed_reading(tmpdir):
+    from hepdata_maker.variable_loading import read_data_file, convert_to_data_type
+    csv_file=tmpdir.join("missing.csv")
+    csv_file.write("a,b,c\n1,-,x\n2,,y\n3,0.5,z\n")
+    assert read_data_file(str(csv_file),"a").dtype==np.int64
+    values=read_data_file(str(csv_file),"b",data_type="float")
+    assert values.dtype==np.float64
+    assert np.isnan(values[:2]).all() and values[2]==0.5
+    # cached column is not shared
+    values_a=read_data_file(str(csv_file),"a",data_type="int64")
+    values_a[0]=100
+    assert read_data_file(str(csv_file),"a",data_type="int64")[0]==1
+    with pytest.raises(ValueError):
+        read_data_file(str(csv_file),"b",data_type="int")
+    # non-numeric data types are left for the caller
+    assert read_data_file(str(csv_file),"c",data_type="str").tolist()==["x","y","z"]
+    tex_file=tmpdir.join("table.tex")
+    tex_file.write("\\begin{tabular}{cc}\na & b \\\\\n1.5 & - \\\\\n\\end{tabular}\n")
+    tex_values=read_data_file(str(tex_file),"table[1,:]",tabular_loc_decode="latex.find_all(['tabular'])[0]",data_type="float")
+    assert tex_values[0]==1.5 and np.isnan(tex_values[1])
+    assert convert_to_data_type(np.array([" 1 ","2"]),"float").tolist()==[1.,2.]
+
+def test_root_tree_reading(tmpdir):
+    uproot=pytest.importorskip("uproot")
+    from hepdata_maker import variable_loading
+    from hepdata_maker.variable_loading import read_data_file
+    root_file=str(tmpdir.join("ntuples.root"))
+    with uproot.recreate(root_file) as output:
+        output.mktree("tree",{"pt":np.float64,"njet":np.int64})
+        output["tree"].extend({"pt":np.arange(10.),"njet":np.arange(10)%4})
+    assert read_data_file(root_file+":tree","pt",step_size=3).tolist()==list(np.arange(10.))
+    # number of entries given as text in the steering file
+    assert read_data_file(root_file+":tree","pt",step_size="3").tolist()==list(np.arange(10.))
+    assert variable_loading.parse_step_size(" 3")==3 and variable_loading.parse_step_size("50 MB")=="50 MB"
+    assert read_data_file(root_file+":tree","pt",step_size=4,cut="njet>=2").tolist()==[2.,3.,6.,7.]
+    assert read_data_file(root_file+":tree","pt*2",cut="njet==0").tolist()==[0.,8.,16.]
+    with pytest.raises(TypeError):
+        read_data_file(root_file+":tree","not_a_branch")
+
+def test_root_rntuple_reading(tmpdir):
+    uproot=pytest.importorskip("uproot")
+    from hepdata_maker.variable_loading import read_data_file
+    root_file=str(tmpdir.join("ntuples.root"))
+    try:
+        with uproot.recreate(root_file) as output:
+            output.mkrntuple("ntuple",{"pt":np.arange(6.),"njet":np.arange(6)%3})
+    except Exception as exc:
+        pytest.skip(f"uproot {uproot.__version__} cannot write RNTuples ({exc})")
+    assert read_data_file(root_file+":ntuple","pt",step_size=2).tolist()==list(np.arange(6.))
+    assert read_data_file(root_file+":ntuple","pt",step_size=2,cut="(njet==1) | (pt>4)").tolist()==[1.,4.,5.]
+    with pytest.raises(TypeError):
+        read_data_file(root_file+":ntuple","not_a_field")
@@ -237,3 +237,83 @@ def test_add_unc_to_dict_safely_raise(variable_ex1):
     with pytest.raises(TypeError):
         variable_ex1._add_unc_to_dict_safely(variable_ex1)
 
+
+def test_variable_glob_in_files(tmpdir):
+    for index in (10,2,1):
+        tmpdir.join(f"mass_{index}.csv").write(f"mass,other\n{index},0\n{index+0.5},0\n")
+    var=Variable(var_steering={"name":"test_var",
+                               "in_files":[{"name":str(tmpdir.join("mass_*.csv")),
+                                            "decode":"mass"}],
+                               "data_type":"float"})
+    # files are read in natural order: mass_1, mass_2, mass_10
+    assert np.all(var==[1,1.5,2,2.5,10,10.5])
+    assert var.steering_file_snippet()['in_files'][0]['name']==str(tmpdir.join("mass_*.csv"))
+
+def test_variable_from_memory_mapped_file(tmpdir):
+    npy_file=str(tmpdir.join("mass.npy"))
+    np.save(npy_file,np.array([100.,200.]))
+    var=Variable(var_steering={"name":"mass","in_files":[{"name":npy_file,"decode":""}]})
+    unc=Uncertainty(unc_steering={"name":"stat","in_files":[{"name":npy_file,"decode":""}]})
+    # the data is not copied, the file cannot be changed through the objects
+    assert not var.flags.writeable and not unc.flags.writeable
+    with pytest.raises(ValueError):
+        var[0]=150.
+    changed=var.copy()
+    changed[0]=150.
+    assert np.all(changed==[150,200]) and np.all(var==[100,200]) and np.all(unc==[100,200])
+    assert np.all(np.load(npy_file)==[100,200])
+    # transformations give arrays that can be changed
+    var=Variable(var_steering={"name":"mass","in_files":[{"name":npy_file,"decode":""}],"transformations":["mass*2"]})
+    var[0]=150.
+    assert np.all(var==[150,400])
+
+def test_get_matching_based_variables():
+    from hepdata_maker.Submission import get_matching_based_variables
+    local_vars={"MET":np.array([50,150,250,350]),"mt2":np.array([300,400,500,100])}
+    definitions=[{"name":"SRB","matching":["np.logical_and(MET>100,mt2<450)"]},
+                 {"name":"SRA","matching":["MET>200",0]}]
+    result=get_matching_based_variables(definitions,{},local_vars,var_lenght=4)
+    assert result.labels==["SRB","SRA"]
+    assert result.codes.tolist()==[1,0,1,0] # first matching definition wins
+    assert result.codes.dtype==np.int8
+    assert result.to_labels().tolist()==["SRA","SRB","SRA","SRB"]
+    assert get_matching_based_variables([{"name":"none","matching":["MET>1000"]}],{},local_vars,var_lenght=4).to_labels().tolist()==[None]*4
+    with pytest.raises(ValueError):
+        get_matching_based_variables([{"name":"SRC","matching":[4]}],{},local_vars,var_lenght=4)
+
+def test_variable_regions():
+    var=Variable(var_steering={"name":"MET",
+                               "transformations":["np.array([50,150,250])"],
+                               "regions":[{"name":"low","matching":["MET<100"]},
+                                          {"name":"high","matching":["MET>200"]}]})
+    assert var.regions.to_labels().tolist()==["low",None,"high"]
+
+def test_pack_uncertainties():
+    from hepdata_maker.Submission import fix_zero_error
+    var=Variable(np.array([0.,1.,0.]),"var")
+    var.add_uncertainty(Uncertainty(np.array([0.,3.,0.]),"sym"))
+    var.add_uncertainty(Uncertainty(np.array([[0.,0.],[4.,-2.],[1.,0.]]),"asym"))
+    expected_lists=[unc.tolist() for unc in var.uncertainties]
+    assert var.uncertainty_matrix is None
+    matrix=var.pack_uncertainties()
+    assert matrix.values.shape==(2,3,2)
+    assert matrix.is_symmetric.tolist()==[True,False]
+    # uncertainties are views into the matrix
+    assert var.sym is var.uncertainties[0] and np.shares_memory(var.sym,matrix.values)
+    assert var.asym.name=="asym" and not var.asym.is_symmetric
+    var.sym[0]=0.5
+    assert matrix.values[0,0,0]==0.5
+    var.sym[0]=0.
+    np.testing.assert_allclose(matrix.quadrature_sum(),[[0.,0.],[5.,np.sqrt(13)],[1.,0.]])
+    assert matrix.zero_mask().tolist()==[True,False,False]
+    assert fix_zero_error(var).tolist()==[True,False,False]
+    assert matrix.to_lists()==expected_lists
+    assert matrix.to_lists(fix_zero_error(var))[1][0]==('','')
+    # changing uncertainties invalidates the matrix
+    var.add_uncertainty(Uncertainty(np.array([1.,1.,1.]),"other"))
+    assert var.uncertainty_matrix is None
+    # only float uncertainties can be packed
+    int_var=Variable([1,2],"int_var")
+    int_var.add_uncertainty(Uncertainty([1,2],"int_unc"))
+    with pytest.raises(ValueError):
+        int_var.pack_uncertainties()
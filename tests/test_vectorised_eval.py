@@ -0,0 +1,74 @@
+import pytest
+import numpy as np
+from hepdata_maker import vectorised_eval
+from hepdata_maker.Submission import Variable,EvaluationNamespace,perform_transformation
+
+@pytest.mark.parametrize("source,translated",
+                         [("VAR*1000","(_v0*1000)"),
+                          ("np.sqrt(a**2+b**2)","sqrt(((_v0**2)+(_v1**2)))"),
+                          ("np.where(x>0,x,nan)","where((_v0>0),_v0,_v1)"),
+                          ("-abs(tab.var.err)/2","((-abs(_v0))/2)")])
+def test_translate_expression(source,translated):
+    expression,operands,reason=vectorised_eval.translate_expression(source)
+    assert expression==translated
+    assert reason==''
+
+@pytest.mark.parametrize("source",["[1,2,3]",
+                                   "np.array(VAR)",
+                                   "VAR[1:]",
+                                   "0<VAR<1",
+                                   "ufs.poisson_interval_RooFit_style(VAR)",
+                                   "np.where(VAR>0,VAR,other=0)"])
+def test_translate_expression_unsupported(source):
+    expression,operands,reason=vectorised_eval.translate_expression(source)
+    assert expression is None
+    assert reason!=''
+
+def test_translate_expression_reason_without_unparse(monkeypatch):
+    import ast
+    monkeypatch.delattr(ast,"unparse",raising=False) # python<3.9
+    expression,operands,reason=vectorised_eval.translate_expression(" VAR*[1, 2]")
+    assert expression is None
+    assert reason=="'[1, 2]' is not supported by numexpr"
+
+@pytest.fixture
+def numexpr_enabled():
+    pytest.importorskip("numexpr")
+    vectorised_eval.enable_vectorised_evaluation(min_size=10,n_threads=2)
+    vectorised_eval.EVALUATION_PATHS.clear()
+    yield
+    vectorised_eval.disable_vectorised_evaluation()
+
+def test_try_vectorised_evaluation(numexpr_enabled):
+    x=np.linspace(-1,1,101)
+    var=Variable(x,"var")
+    namespace=EvaluationNamespace({"tab":{"var":var}})
+    transformations=["np.where(var>0,var,nan)*1000",
+                     "np.sqrt(var**2+x**2)",
+                     "var/2+np.pi"]
+    for transformation in transformations:
+        result=perform_transformation(transformation,namespace,{"var":var,"x":x})
+        expected=eval(transformation,dict(namespace),{"var":x,"x":x})
+        np.testing.assert_allclose(result,expected)
+    assert vectorised_eval.EVALUATION_PATHS['numexpr']==3
+    # not supported/too small/non numeric inputs are evaluated with eval
+    assert perform_transformation("var[:2]",namespace,{"var":var}).tolist()==[-1,-0.98]
+    assert perform_transformation("var*2",namespace,{"var":var[:5]}).size==5
+    assert perform_transformation("var+'a'",namespace,{"var":np.array(['b']*20,dtype=object)}).tolist()==['ba']*20
+    assert vectorised_eval.EVALUATION_PATHS['eval']==3
+    assert "3 with numexpr, 3 with eval" in vectorised_eval.evaluation_summary()
+
+def test_vectorised_evaluation_disabled():
+    vectorised_eval.disable_vectorised_evaluation()
+    assert vectorised_eval.try_vectorised_evaluation("var*2",{},{"var":np.arange(100)})==(False,None)
+
+def test_vectorised_evaluation_keeps_dtype(numexpr_enabled):
+    namespace=EvaluationNamespace()
+    local_vars={"i":np.arange(-10,10,dtype=np.int64),"f":np.linspace(0,1,20,dtype=np.float32)}
+    for transformation in ["np.abs(i)","abs(i)","f*0.5","np.sqrt(f)+f","i*2","i/2","np.where(i>0,f,0)"]:
+        result=perform_transformation(transformation,namespace,local_vars)
+        expected=eval(transformation,dict(namespace),local_vars)
+        assert result.dtype==expected.dtype,transformation
+        np.testing.assert_allclose(result,expected,rtol=1e-6)
+    # absolute values of integers are computed by numpy
+    assert vectorised_eval.EVALUATION_PATHS['eval']==2